@@ -0,0 +1,9 @@
+# app/__init__.py
+"""Microsserviço de equipamentos do bicicletário."""
+
+import os
+
+# Perfil de inicialização (ver app/startup.py): precisa começar antes de qualquer outro módulo do app
+if os.getenv("EQUIPAMENTO_PERFIL_INICIO", "0") != "0":
+    from .startup import perfil
+    perfil.cronometrar_imports()
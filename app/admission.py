@@ -0,0 +1,260 @@
+# app/admission.py
+"""Módulo contendo o controle de admissão das requisições (limites de taxa e de concorrência).
+
+Protege as requisições dos usuários quando muitos totens reconectam ao mesmo tempo e
+passam a consultar suas trancas e a trancar/destrancar sem parar:
+
+- baldes de fichas (token buckets) limitam a taxa por cliente e por totem, recusando
+  o excesso com 429 e Retry-After;
+- cada classe de rota tem um limite de requisições em execução e uma fila limitada;
+  quando a fila enche ou a espera passa do limite, a resposta é 503 com Retry-After,
+  em vez de acumular requisições sem fim;
+- ao liberar uma vaga, a fila de maior prioridade é atendida primeiro: comandos de
+  trancar/destrancar, depois escritas, leituras e, por último, as consultas dos totens.
+"""
+
+import asyncio
+import math
+import random
+import re
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, Iterable, NamedTuple, Optional, Tuple
+
+import pydantic_core
+
+from .metrics import Contador, registro
+
+class ClasseRota(NamedTuple):
+    """Classe de rota: prioridade (0 = mais alta), fração do limite total que pode ocupar e tamanho da fila."""
+    nome: str
+    prioridade: int
+    fracao: float
+    fila: int
+
+CLASSES_ROTA = {classe.nome: classe for classe in (
+    ClasseRota("comando", 0, 1.0, 512),
+    ClasseRota("escrita", 1, 0.75, 256),
+    ClasseRota("leitura", 2, 0.75, 256),
+    ClasseRota("dispositivo", 3, 0.5, 128),
+)}
+# Rotas fora do controle de concorrência (conexões longas e as da própria operação do serviço)
+ROTAS_ISENTAS = {"/metrics", "/docs", "/redoc", "/openapi.json", "/rede/eventos"}
+COMANDO_TRANCA = re.compile(r"^/tranca/(\d+)/(?:trancar|destrancar)/?$")
+CONSULTA_TOTEM = re.compile(r"^/totem/(\d+)/(?:trancas|bicicletas)/?$")
+# Retry-After (em segundos) sugerido quando a recusa é por fila cheia ou espera longa
+ESPERA_SOBRECARGA = 1
+# Segundos aleatórios somados ao Retry-After dos 429, para que os totens recusados juntos
+# (ex.: todos os que reconectaram no mesmo instante) não voltem todos juntos
+DISPERSAO_RETRY = 2.0
+
+recusas_admissao = registro.registrar(Contador(
+    "equipamento_admissao_recusas_total", "Requisições recusadas pelo controle de admissão", ("classe", "motivo")))
+
+class Sobrecarga(Exception):
+    """Requisição recusada pelo controle de admissão, com o status e o Retry-After da resposta."""
+    def __init__(self, status_code: int, espera: float, motivo: str):
+        """Guarda o status HTTP, a espera sugerida (em segundos) e o motivo da recusa."""
+        super().__init__(motivo)
+        self.status_code = status_code
+        self.espera = espera
+        self.motivo = motivo
+
+class BaldeFichas:
+    """Balde de fichas: admite rajadas de até `capacidade` e, em média, `taxa` requisições por segundo."""
+    __slots__ = ("taxa", "capacidade", "fichas", "atualizado")
+
+    def __init__(self, taxa: float, capacidade: float):
+        """Cria o balde cheio."""
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.atualizado = time.monotonic()
+
+    def consumir(self, agora: float) -> float:
+        """Consome uma ficha; retorna 0 se conseguiu ou, se não, quantos segundos faltam para haver uma."""
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        if self.fichas >= 1:
+            self.fichas -= 1
+            return 0.0
+        return (1 - self.fichas) / self.taxa
+
+class LimiteTaxa:
+    """Um balde de fichas por chave (cliente ou totem); acima de `max_chaves`, os menos usados são descartados."""
+    def __init__(self, taxa: float, rajada: Optional[float] = None, max_chaves: int = 100_000):
+        """Define a taxa (requisições por segundo), a rajada (padrão: 2x a taxa) e o número máximo de chaves."""
+        self.taxa = taxa
+        self.rajada = rajada if rajada is not None else max(1.0, 2 * taxa)
+        self.max_chaves = max_chaves
+        self._baldes: "OrderedDict[Hashable, BaldeFichas]" = OrderedDict()
+
+    def consumir(self, chave: Hashable) -> float:
+        """Consome uma ficha do balde da chave; retorna 0 ou a espera até a próxima ficha."""
+        balde = self._baldes.get(chave)
+        if balde is None:
+            balde = self._baldes[chave] = BaldeFichas(self.taxa, self.rajada)
+            if len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        else:
+            self._baldes.move_to_end(chave)
+        return balde.consumir(time.monotonic())
+
+class ControleConcorrencia:
+    """Limita as requisições em execução, no total e por classe; as excedentes esperam em filas por prioridade.
+
+    Só é usado a partir do loop de eventos, então não precisa de lock.
+    """
+    def __init__(self, limite_total: int = 64, classes: Iterable[ClasseRota] = CLASSES_ROTA.values(),
+                 espera_maxima: float = 1.0):
+        """Define o limite total, as classes e quanto tempo (em segundos) uma requisição pode esperar na fila."""
+        self.limite_total = limite_total
+        self.classes = sorted(classes, key=lambda classe: classe.prioridade)
+        self.limites = {classe.nome: max(1, int(limite_total * classe.fracao)) for classe in self.classes}
+        self.espera_maxima = espera_maxima
+        self.total = 0
+        self.em_execucao: Counter = Counter()
+        self._filas: Dict[str, Deque[asyncio.Future]] = {classe.nome: deque() for classe in self.classes}
+        self.aguardando: Counter = Counter()
+
+    def _cabe(self, classe: ClasseRota) -> bool:
+        return self.total < self.limite_total and self.em_execucao[classe.nome] < self.limites[classe.nome]
+
+    def _ocupar(self, classe: ClasseRota) -> None:
+        self.total += 1
+        self.em_execucao[classe.nome] += 1
+
+    def _ha_prioritaria(self, classe: ClasseRota) -> bool:
+        """Indica se alguma requisição de prioridade igual ou maior espera e poderia ocupar a vaga."""
+        return any(self.aguardando[outra.nome] and self._cabe(outra)
+                   for outra in self.classes if outra.prioridade <= classe.prioridade)
+
+    async def entrar(self, classe: ClasseRota) -> None:
+        """Ocupa uma vaga da classe, esperando na fila se preciso; lança Sobrecarga se não conseguir."""
+        if self._ha_prioritaria(classe):
+            self._distribuir()
+        if self._cabe(classe) and not self._ha_prioritaria(classe):
+            self._ocupar(classe)
+            return
+        if self.aguardando[classe.nome] >= classe.fila:
+            raise Sobrecarga(503, ESPERA_SOBRECARGA, "fila cheia")
+        vaga = asyncio.get_running_loop().create_future()
+        self._filas[classe.nome].append(vaga)
+        self.aguardando[classe.nome] += 1
+        try:
+            await asyncio.wait((vaga,), timeout=self.espera_maxima)
+        except BaseException:
+            self._desistir(classe, vaga)
+            raise
+        if not vaga.done():
+            self._desistir(classe, vaga)
+            raise Sobrecarga(503, ESPERA_SOBRECARGA, "espera esgotada")
+
+    def _desistir(self, classe: ClasseRota, vaga: asyncio.Future) -> None:
+        """Retira a requisição da fila; se a vaga já lhe tinha sido dada, devolve-a."""
+        if vaga.done():
+            self.sair(classe)
+        else:
+            vaga.cancel()  # continua na fila, mas é ignorada ao distribuir as vagas
+            self.aguardando[classe.nome] -= 1
+
+    def sair(self, classe: ClasseRota) -> None:
+        """Libera a vaga e a entrega às requisições na fila."""
+        self.total -= 1
+        self.em_execucao[classe.nome] -= 1
+        self._distribuir()
+
+    def _distribuir(self) -> None:
+        """Entrega as vagas livres às requisições na fila, por ordem de prioridade."""
+        for proxima in self.classes:
+            fila = self._filas[proxima.nome]
+            while fila and self._cabe(proxima):
+                vaga = fila.popleft()
+                if vaga.cancelled():
+                    continue
+                self.aguardando[proxima.nome] -= 1
+                if vaga.get_loop().is_closed():  # requisição de um loop já encerrado (ex.: testes)
+                    continue
+                self._ocupar(proxima)
+                vaga.set_result(None)
+            if self.total >= self.limite_total:
+                break
+
+def classificar(metodo: str, caminho: str) -> Tuple[Optional[ClasseRota], Optional[int], Optional[int]]:
+    """Retorna a classe da rota (None se isenta) e o id do totem ou da tranca a que ela se refere."""
+    if caminho in ROTAS_ISENTAS:
+        return None, None, None
+    if metodo == "POST":
+        comando = COMANDO_TRANCA.match(caminho)
+        if comando:
+            return CLASSES_ROTA["comando"], None, int(comando.group(1))
+    elif metodo in ("GET", "HEAD"):
+        consulta = CONSULTA_TOTEM.match(caminho)
+        if consulta:
+            return CLASSES_ROTA["dispositivo"], int(consulta.group(1)), None
+        return CLASSES_ROTA["leitura"], None, None
+    return CLASSES_ROTA["escrita"], None, None
+
+class AdmissaoMiddleware:
+    """Middleware ASGI que aplica os limites de taxa (por cliente e por totem) e de concorrência (por classe)."""
+    def __init__(self, app, taxa_cliente: float = 0.0, taxa_totem: float = 20.0, concorrencia: int = 64,
+                 espera_maxima: float = 1.0,
+                 totens_da_tranca: Optional[Callable[[int], Tuple[int, ...]]] = None):
+        """Envolve a aplicação; taxas em requisições por segundo (0 = sem limite).
+
+        `totens_da_tranca` permite que os comandos de uma tranca contem no balde do seu totem.
+        """
+        self.app = app
+        self.por_cliente = LimiteTaxa(taxa_cliente) if taxa_cliente > 0 else None
+        self.por_totem = LimiteTaxa(taxa_totem) if taxa_totem > 0 else None
+        self.concorrencia = ControleConcorrencia(concorrencia, espera_maxima=espera_maxima)
+        self.totens_da_tranca = totens_da_tranca
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        classe, id_totem, id_tranca = classificar(scope["method"], scope["path"])
+        if classe is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            self._verificar_taxas(scope, id_totem, id_tranca)
+            await self.concorrencia.entrar(classe)
+        except Sobrecarga as recusa:
+            recusas_admissao.incrementar(classe.nome, recusa.motivo)
+            await self._recusar(send, recusa)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concorrencia.sair(classe)
+
+    def _verificar_taxas(self, scope, id_totem: Optional[int], id_tranca: Optional[int]) -> None:
+        """Consome as fichas do cliente e do totem (ou da tranca fora de totens); lança Sobrecarga se faltar."""
+        if self.por_cliente is not None:
+            cliente = scope.get("client")
+            espera = self.por_cliente.consumir(cliente[0] if cliente else None)
+            if espera:
+                raise Sobrecarga(429, espera + random.uniform(0, DISPERSAO_RETRY), "taxa do cliente")
+        if self.por_totem is None or (id_totem is None and id_tranca is None):
+            return
+        if id_tranca is not None:
+            totens = self.totens_da_tranca(id_tranca) if self.totens_da_tranca is not None else ()
+            chaves = [("totem", totem) for totem in totens] or [("tranca", id_tranca)]
+        else:
+            chaves = [("totem", id_totem)]
+        espera = max(self.por_totem.consumir(chave) for chave in chaves)
+        if espera:
+            raise Sobrecarga(429, espera + random.uniform(0, DISPERSAO_RETRY), "taxa do totem")
+
+    @staticmethod
+    async def _recusar(send, recusa: Sobrecarga) -> None:
+        """Responde a recusa com o status e o Retry-After (em segundos inteiros, ao menos 1)."""
+        corpo = pydantic_core.to_json({"detail": f"Requisição recusada: {recusa.motivo}"})
+        await send({"type": "http.response.start", "status": recusa.status_code, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+            (b"retry-after", str(max(1, math.ceil(recusa.espera))).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": corpo})
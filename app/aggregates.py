@@ -0,0 +1,194 @@
+# app/aggregates.py
+"""Módulo contendo os contadores agregados da rede (status globais e por totem)."""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from .models import Bicicleta, StatusBicicleta, StatusTranca, Totem, Tranca
+
+class AgregadosRede:
+    """Contadores de trancas e bicicletas por status, globais e por totem.
+
+    São atualizados a cada alteração notificada pelos serviços, em tempo proporcional
+    à alteração (e não ao tamanho da frota). As bicicletas de um totem são as que
+    estão presas em alguma de suas trancas.
+    """
+    def __init__(self):
+        """Inicializa os contadores vazios."""
+        self._lock = threading.Lock()
+        # Chaves: ("trancas", status), ("bicicletas", status),
+        # (id_totem, "trancas", status) e (id_totem, "bicicletas", status)
+        self.contagens: Counter = Counter()
+        # Último estado conhecido de cada item, usado para desfazer sua contribuição
+        self._status_bicicleta: Dict[int, StatusBicicleta] = {}
+        self._trancas: Dict[int, Tuple[StatusTranca, Optional[int]]] = {}
+        self._trancas_do_totem: Dict[int, Tuple[int, ...]] = {}
+        self._totens_da_tranca: Dict[int, Set[int]] = {}
+        self._trancas_da_bicicleta: Dict[int, Set[int]] = {}
+
+    def bicicleta_alterada(self, item_id: int, bicicleta: Optional[Bicicleta]) -> None:
+        """Atualiza os contadores após a gravação (ou remoção, se None) de uma bicicleta."""
+        with self._lock:
+            trancas = self._trancas_da_bicicleta.get(item_id, ())
+            for id_tranca in trancas:
+                self._contar_tranca(id_tranca, -1, apenas_totens=True)
+            antigo = self._status_bicicleta.pop(item_id, None)
+            if antigo is not None:
+                self._somar(("bicicletas", antigo), -1)
+            if bicicleta is not None:
+                self._status_bicicleta[item_id] = bicicleta.status
+                self._somar(("bicicletas", bicicleta.status), 1)
+            for id_tranca in trancas:
+                self._contar_tranca(id_tranca, 1, apenas_totens=True)
+
+    def tranca_alterada(self, item_id: int, tranca: Optional[Tranca]) -> None:
+        """Atualiza os contadores após a gravação (ou remoção, se None) de uma tranca."""
+        with self._lock:
+            self._contar_tranca(item_id, -1)
+            antiga = self._trancas.pop(item_id, None)
+            if antiga is not None and antiga[1] is not None:
+                self._desvincular(self._trancas_da_bicicleta, antiga[1], item_id)
+            if tranca is not None:
+                self._trancas[item_id] = (tranca.status, tranca.bicicleta)
+                if tranca.bicicleta is not None:
+                    self._trancas_da_bicicleta.setdefault(tranca.bicicleta, set()).add(item_id)
+            self._contar_tranca(item_id, 1)
+
+    def totem_alterado(self, item_id: int, totem: Optional[Totem]) -> None:
+        """Atualiza os contadores do totem conforme as trancas que entraram ou saíram dele."""
+        with self._lock:
+            antigas = self._trancas_do_totem.pop(item_id, ())
+            novas = tuple(dict.fromkeys(totem.trancas)) if totem is not None else ()
+            if totem is not None:
+                self._trancas_do_totem[item_id] = novas
+            for id_tranca in set(antigas) - set(novas):
+                self._contar_no_totem(item_id, id_tranca, -1)
+                self._desvincular(self._totens_da_tranca, id_tranca, item_id)
+            for id_tranca in set(novas) - set(antigas):
+                self._totens_da_tranca.setdefault(id_tranca, set()).add(item_id)
+                self._contar_no_totem(item_id, id_tranca, 1)
+
+    def resumo(self, totens: bool = True) -> Dict[str, Any]:
+        """Retorna as contagens globais por status e, opcionalmente, as de cada totem."""
+        with self._lock:
+            resumo: Dict[str, Any] = {
+                "trancas": {s.value: self.contagens[("trancas", s)] for s in StatusTranca},
+                "bicicletas": {s.value: self.contagens[("bicicletas", s)] for s in StatusBicicleta},
+            }
+            if totens:
+                resumo["totens"] = {str(id_totem): self._resumo_totem(id_totem)
+                                    for id_totem in sorted(self._trancas_do_totem)}
+            return resumo
+
+    def resumo_totem(self, id_totem: int) -> Optional[Dict[str, Dict[str, int]]]:
+        """Retorna as contagens por status de um totem, ou None se ele não existir."""
+        with self._lock:
+            if id_totem not in self._trancas_do_totem:
+                return None
+            return self._resumo_totem(id_totem)
+
+    def disponibilidade(self, id_totem: int) -> Tuple[int, int]:
+        """Retorna quantas bicicletas disponíveis e trancas livres o totem tem."""
+        with self._lock:
+            return (self.contagens.get((id_totem, "bicicletas", StatusBicicleta.DISPONIVEL), 0),
+                    self.contagens.get((id_totem, "trancas", StatusTranca.LIVRE), 0))
+
+    def totens_da_tranca(self, id_tranca: int) -> Tuple[int, ...]:
+        """Retorna os totens em que a tranca está instalada."""
+        with self._lock:
+            return tuple(self._totens_da_tranca.get(id_tranca, ()))
+
+    def totens_da_bicicleta(self, id_bicicleta: int) -> Tuple[int, ...]:
+        """Retorna os totens cujas trancas prendem a bicicleta."""
+        with self._lock:
+            return tuple({id_totem for id_tranca in self._trancas_da_bicicleta.get(id_bicicleta, ())
+                          for id_totem in self._totens_da_tranca.get(id_tranca, ())})
+
+    def divergencias(self, esperado: Counter) -> Dict[Hashable, Tuple[int, int]]:
+        """Compara os contadores com uma contagem feita do zero; retorna {chave: (atual, esperado)}."""
+        with self._lock:
+            chaves = set(self.contagens) | set(esperado)
+            return {chave: (self.contagens[chave], esperado[chave])
+                    for chave in chaves if self.contagens[chave] != esperado[chave]}
+
+    def copiar(self) -> "AgregadosRede":
+        """Retorna uma cópia independente dos contadores e vínculos (usada nos snapshots)."""
+        copia = AgregadosRede()
+        with self._lock:
+            copia.contagens = Counter(self.contagens)
+            copia._status_bicicleta = dict(self._status_bicicleta)
+            copia._trancas = dict(self._trancas)
+            copia._trancas_do_totem = dict(self._trancas_do_totem)
+            copia._totens_da_tranca = {chave: set(valores) for chave, valores in self._totens_da_tranca.items()}
+            copia._trancas_da_bicicleta = {chave: set(valores) for chave, valores in self._trancas_da_bicicleta.items()}
+        return copia
+
+    def restaurar(self, origem: "AgregadosRede") -> None:
+        """Substitui o estado pelo de uma cópia, sem alterá-la."""
+        copia = origem.copiar()
+        with self._lock:
+            self.contagens = copia.contagens
+            self._status_bicicleta = copia._status_bicicleta
+            self._trancas = copia._trancas
+            self._trancas_do_totem = copia._trancas_do_totem
+            self._totens_da_tranca = copia._totens_da_tranca
+            self._trancas_da_bicicleta = copia._trancas_da_bicicleta
+
+    def _resumo_totem(self, id_totem: int) -> Dict[str, Dict[str, int]]:
+        return {
+            "trancas": {s.value: self.contagens[(id_totem, "trancas", s)] for s in StatusTranca},
+            "bicicletas": {s.value: self.contagens[(id_totem, "bicicletas", s)] for s in StatusBicicleta},
+        }
+
+    def _somar(self, chave: Hashable, sinal: int) -> None:
+        self.contagens[chave] += sinal
+        if not self.contagens[chave]:
+            del self.contagens[chave]
+
+    def _contar_tranca(self, id_tranca: int, sinal: int, apenas_totens: bool = False) -> None:
+        """Soma (ou subtrai) a contribuição de uma tranca, global e em cada totem em que está."""
+        estado = self._trancas.get(id_tranca)
+        if estado is None:
+            return
+        if not apenas_totens:
+            self._somar(("trancas", estado[0]), sinal)
+        for id_totem in self._totens_da_tranca.get(id_tranca, ()):
+            self._contar_no_totem(id_totem, id_tranca, sinal)
+
+    def _contar_no_totem(self, id_totem: int, id_tranca: int, sinal: int) -> None:
+        """Soma (ou subtrai) a contribuição de uma tranca (e da bicicleta presa nela) a um totem."""
+        estado = self._trancas.get(id_tranca)
+        if estado is None:
+            return
+        status, id_bicicleta = estado
+        self._somar((id_totem, "trancas", status), sinal)
+        if id_bicicleta is not None and id_bicicleta in self._status_bicicleta:
+            self._somar((id_totem, "bicicletas", self._status_bicicleta[id_bicicleta]), sinal)
+
+    @staticmethod
+    def _desvincular(mapa: Dict[int, Set[int]], chave: int, valor: int) -> None:
+        valores = mapa.get(chave)
+        if valores is not None:
+            valores.discard(valor)
+            if not valores:
+                del mapa[chave]
+
+def contar_do_zero(bicicletas: Iterable[Bicicleta], trancas: Iterable[Tranca], totens: Iterable[Totem]) -> Counter:
+    """Recalcula os contadores percorrendo todos os itens (usado para conferir os agregados)."""
+    contagens: Counter = Counter()
+    status_bicicleta = {b.id: b.status for b in bicicletas}
+    trancas_por_id = {t.id: t for t in trancas}
+    for status in status_bicicleta.values():
+        contagens[("bicicletas", status)] += 1
+    for tranca in trancas_por_id.values():
+        contagens[("trancas", tranca.status)] += 1
+    for totem in totens:
+        for id_tranca in dict.fromkeys(totem.trancas):
+            tranca = trancas_por_id.get(id_tranca)
+            if tranca is None:
+                continue
+            contagens[(totem.id, "trancas", tranca.status)] += 1
+            if tranca.bicicleta in status_bicicleta:
+                contagens[(totem.id, "bicicletas", status_bicicleta[tranca.bicicleta])] += 1
+    return contagens
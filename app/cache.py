@@ -0,0 +1,129 @@
+# app/cache.py
+"""Módulo contendo o cache de respostas serializadas, os ETags derivados das gerações e os caches com validade (idempotência, consultas externas)."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+# Distingue as gerações deste processo das de processos anteriores (ou de outros workers)
+EPOCA_PROCESSO = f"{time.time_ns():x}{os.getpid():x}"
+
+def etag_colecao(geracao: int) -> str:
+    """Retorna o ETag forte de uma listagem, derivado da geração da coleção."""
+    return f'"{EPOCA_PROCESSO}-{geracao}"'
+
+def corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Indica se o header If-None-Match contém o ETag (comparação fraca, RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidatos = (valor.strip() for valor in if_none_match.split(","))
+    return any(c == "*" or c.removeprefix("W/") == etag for c in candidatos)
+
+class CacheRespostas:
+    """Cache LRU de respostas já serializadas.
+
+    Cada entrada guarda a geração (ou versão) do dado que a produziu; uma leitura só
+    é atendida se essa geração ainda for a atual, então qualquer escrita invalida
+    exatamente as entradas que dependem do dado alterado.
+    """
+    def __init__(self, capacidade: int = 10_000):
+        """Inicializa o cache com o número máximo de entradas."""
+        self.capacidade = capacidade
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, geracao: int) -> Optional[Any]:
+        """Retorna o valor guardado para a chave se ele for da geração informada."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if entrada[0] != geracao:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1]
+
+    def guardar(self, chave: Hashable, geracao: int, valor: Any) -> None:
+        """Guarda o valor produzido a partir da geração informada."""
+        with self._lock:
+            self._entradas[chave] = (geracao, valor)
+            self._entradas.move_to_end(chave)
+            if len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def limpar(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entradas.clear()
+
+cache_respostas = CacheRespostas()
+
+class CacheTTL:
+    """Cache LRU com prazo de validade por entrada, seguro entre threads."""
+    def __init__(self, capacidade: int = 10_000, validade: float = 300.0):
+        """Inicializa o cache com o número máximo de entradas e a validade padrão (em segundos) de cada uma."""
+        self.capacidade = capacidade
+        self.validade = validade
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor guardado para a chave, se ainda válido."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if entrada[0] <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1]
+
+    def guardar(self, chave: Hashable, valor: Any, validade: Optional[float] = None) -> None:
+        """Guarda o valor da chave, descartando as entradas vencidas ou menos usadas se preciso."""
+        agora = time.monotonic()
+        with self._lock:
+            self._entradas[chave] = (agora + (self.validade if validade is None else validade), valor)
+            self._entradas.move_to_end(chave)
+            # As menos usadas ficam no início; remove o excesso e as vencidas que estiverem lá
+            while self._entradas:
+                primeira = next(iter(self._entradas.values()))
+                if len(self._entradas) <= self.capacidade and primeira[0] > agora:
+                    break
+                self._entradas.popitem(last=False)
+
+    def remover(self, chave: Hashable) -> None:
+        """Remove a entrada da chave, se houver."""
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+    def limpar(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+class CacheIdempotencia(CacheTTL):
+    """Cache dos resultados de operações com Idempotency-Key.
+
+    Cada entrada guarda um resumo do corpo da requisição original, para que a mesma
+    chave usada com outro corpo seja recusada em vez de devolver um resultado alheio.
+    """
+    def __init__(self, capacidade: int = 10_000, validade: float = 24 * 3600):
+        """Inicializa o cache com o número máximo de entradas e a validade (em segundos) de cada uma."""
+        super().__init__(capacidade, validade)
+
+    def obter(self, chave: Hashable) -> Optional[Tuple[str, Any]]:
+        """Retorna (resumo do corpo, valor) guardados para a chave, se ainda válidos."""
+        return super().obter(chave)
+
+    def guardar(self, chave: Hashable, resumo: str, valor: Any) -> None:  # type: ignore[override]
+        """Guarda o valor da chave junto com o resumo do corpo que o produziu."""
+        super().guardar(chave, (resumo, valor))
+
+cache_idempotencia = CacheIdempotencia()
@@ -0,0 +1,283 @@
+# app/clients.py
+"""Módulo contendo os clientes HTTP dos outros microsserviços (aluguel, que responde pelos funcionários, e externo).
+
+Todos os clientes usam um único httpx.AsyncClient (pool de conexões com keep-alive),
+limitam as chamadas simultâneas a cada serviço, repetem as falhas transitórias com
+espera exponencial aleatória (jitter) e deixam de chamar por um tempo o serviço que
+falha seguidamente (disjuntor). Consultas GET idênticas em andamento são unificadas
+numa só chamada, e as consultas de funcionários ficam num cache com validade.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+import httpx
+
+from .cache import CacheTTL
+from .errors import ErroOperacao, ServicoIndisponivel
+from .metrics import chamadas_externas
+
+logger = logging.getLogger(__name__)
+
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Respostas que indicam sobrecarga ou indisponibilidade momentânea do outro serviço
+STATUS_TRANSITORIOS = {429, 502, 503, 504}
+
+class Disjuntor:
+    """Disjuntor (circuit breaker) de um serviço.
+
+    Após `limite_falhas` falhas seguidas o circuito abre e as chamadas são recusadas
+    por `tempo_aberto` segundos; depois disso uma única chamada de teste passa
+    (meio-aberto): se der certo o circuito fecha, se falhar abre de novo.
+    """
+    def __init__(self, limite_falhas: int = 5, tempo_aberto: float = 30.0):
+        """Define quantas falhas seguidas abrem o circuito e por quanto tempo ele fica aberto."""
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self._aberto_ate = 0.0
+        self._testando = False
+
+    @property
+    def estado(self) -> str:
+        """Retorna "fechado", "aberto" ou "meio-aberto"."""
+        if self.falhas < self.limite_falhas:
+            return "fechado"
+        return "aberto" if time.monotonic() < self._aberto_ate or self._testando else "meio-aberto"
+
+    def permitir(self) -> bool:
+        """Indica se uma chamada pode ser feita agora (reservando a chamada de teste, se for o caso)."""
+        estado = self.estado
+        if estado == "meio-aberto":
+            self._testando = True
+        return estado != "aberto"
+
+    def sucesso(self) -> None:
+        """Registra uma chamada bem-sucedida, fechando o circuito."""
+        self.falhas = 0
+        self._testando = False
+
+    def falha(self) -> None:
+        """Registra uma falha; ao atingir o limite (ou se a chamada de teste falhar), abre o circuito."""
+        self.falhas += 1
+        self._testando = False
+        if self.falhas >= self.limite_falhas:
+            self._aberto_ate = time.monotonic() + self.tempo_aberto
+
+    def liberar(self) -> None:
+        """Libera a chamada de teste interrompida sem resultado (ex.: cancelada)."""
+        self._testando = False
+
+class PoolConexoes:
+    """httpx.AsyncClient compartilhado pelos clientes dos serviços.
+
+    O cliente fica preso ao loop em que foi criado, então é recriado quando usado a
+    partir de outro loop (ex.: os testes, que abrem um loop por requisição).
+    """
+    def __init__(self, max_conexoes: int = 100, timeout: float = 2.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Define o total de conexões, o timeout (em segundos) e, opcionalmente, o transporte (para testes)."""
+        self.limites = httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes,
+                                    keepalive_expiry=30.0)
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 1.0))
+        self.transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cliente: Optional[httpx.AsyncClient] = None
+
+    def cliente(self) -> httpx.AsyncClient:
+        """Retorna o cliente do loop atual, criando-o se preciso."""
+        loop = asyncio.get_running_loop()
+        if self._cliente is None or self._loop is not loop:
+            self._cliente = httpx.AsyncClient(limits=self.limites, timeout=self.timeout, transport=self.transport)
+            self._loop = loop
+        return self._cliente
+
+    async def fechar(self) -> None:
+        """Fecha as conexões abertas, se o cliente for do loop atual."""
+        cliente, self._cliente = self._cliente, None
+        if cliente is not None and self._loop is asyncio.get_running_loop():
+            await cliente.aclose()
+
+class ClienteServico:
+    """Cliente de um microsserviço, com limite de chamadas simultâneas, repetições e disjuntor."""
+    def __init__(self, nome: str, url_base: str, pool: PoolConexoes, concorrencia: int = 20,
+                 tentativas: int = 3, espera_base: float = 0.05, espera_maxima: float = 1.0,
+                 disjuntor: Optional[Disjuntor] = None):
+        """Define o serviço (nome e URL base; vazia = não configurado) e a política de chamadas."""
+        self.nome = nome
+        self.url_base = url_base.rstrip("/")
+        self.pool = pool
+        self.concorrencia = concorrencia
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.disjuntor = disjuntor or Disjuntor()
+        # Por loop: semáforo das chamadas simultâneas e consultas GET em andamento (por caminho)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaforo = asyncio.Semaphore(concorrencia)
+        self._em_andamento: Dict[str, asyncio.Future] = {}
+
+    @property
+    def configurado(self) -> bool:
+        """Indica se o serviço tem URL configurada."""
+        return bool(self.url_base)
+
+    def _estado_loop(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaforo = asyncio.Semaphore(self.concorrencia)
+            self._em_andamento = {}
+        return self._semaforo, self._em_andamento
+
+    async def requisitar(self, metodo: str, caminho: str, **kwargs) -> httpx.Response:
+        """Faz a chamada, repetindo as falhas transitórias; lança ServicoIndisponivel se não houver resposta útil.
+
+        Respostas 4xx (exceto 429) e 500 são devolvidas ao chamador. Métodos não idempotentes
+        só são repetidos quando a conexão nem chegou a ser aberta.
+        """
+        if not self.configurado:
+            raise ServicoIndisponivel(self.nome)
+        semaforo, _ = self._estado_loop()
+        for tentativa in range(self.tentativas):
+            if not self.disjuntor.permitir():
+                chamadas_externas.observar(0.0, self.nome, "circuito_aberto")
+                raise ServicoIndisponivel(self.nome)
+            resposta: Optional[httpx.Response] = None
+            inicio = time.perf_counter()
+            try:
+                async with semaforo:
+                    resposta = await self.pool.cliente().request(metodo, self.url_base + caminho, **kwargs)
+            except httpx.TransportError as erro:
+                chamadas_externas.observar(time.perf_counter() - inicio, self.nome, "erro")
+                self.disjuntor.falha()
+                logger.warning("Falha ao chamar %s %s%s: %r", metodo, self.nome, caminho, erro)
+                repetivel = metodo in METODOS_IDEMPOTENTES or isinstance(erro, (httpx.ConnectError, httpx.ConnectTimeout))
+            except BaseException:
+                self.disjuntor.liberar()
+                raise
+            else:
+                chamadas_externas.observar(time.perf_counter() - inicio, self.nome, str(resposta.status_code))
+                if resposta.status_code not in STATUS_TRANSITORIOS and resposta.status_code < 500:
+                    self.disjuntor.sucesso()
+                    return resposta
+                self.disjuntor.falha()
+                if resposta.status_code not in STATUS_TRANSITORIOS:
+                    return resposta
+                repetivel = metodo in METODOS_IDEMPOTENTES or resposta.status_code == 429
+            if not repetivel or tentativa + 1 == self.tentativas:
+                break
+            espera = self._espera(tentativa, resposta)
+            if espera is None:
+                break
+            await asyncio.sleep(espera)
+        raise ServicoIndisponivel(self.nome)
+
+    def _espera(self, tentativa: int, resposta: Optional[httpx.Response]) -> Optional[float]:
+        """Espera antes da próxima tentativa: exponencial com jitter total, ou o Retry-After do serviço.
+
+        Retorna None se o serviço pedir uma espera maior que `espera_maxima`.
+        """
+        pedido = resposta.headers.get("Retry-After") if resposta is not None else None
+        if pedido is not None and pedido.isdigit():
+            return float(pedido) if float(pedido) <= self.espera_maxima else None
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+
+    async def obter_json(self, caminho: str) -> Optional[Any]:
+        """Faz um GET e retorna o JSON (None se 404); GETs do mesmo caminho em andamento são unificados."""
+        _, em_andamento = self._estado_loop()
+        pendente = em_andamento.get(caminho)
+        if pendente is not None:
+            return await asyncio.shield(pendente)
+        pendente = em_andamento[caminho] = asyncio.get_running_loop().create_future()
+        try:
+            resposta = await self.requisitar("GET", caminho)
+            if resposta.status_code == 404:
+                resultado = None
+            elif resposta.is_success:
+                resultado = resposta.json()
+            else:
+                raise ServicoIndisponivel(self.nome)
+        except BaseException as erro:
+            pendente.set_exception(erro)
+            pendente.exception()  # marca como lida, mesmo que ninguém esteja aguardando
+            raise
+        finally:
+            del em_andamento[caminho]
+        pendente.set_result(resultado)
+        return resultado
+
+pool = PoolConexoes()
+aluguel = ClienteServico("aluguel", "", pool)
+externo = ClienteServico("externo", "", pool)
+# Funcionários encontrados (ou False, se não existirem, com validade menor)
+cache_funcionarios = CacheTTL(capacidade=10_000, validade=300.0)
+VALIDADE_FUNCIONARIO_INEXISTENTE = 30.0
+_notificacoes: Set[asyncio.Task] = set()
+
+def configurar_clientes(url_aluguel: str = "", url_externo: str = "", max_conexoes: int = 100,
+                        concorrencia: int = 20, timeout: float = 2.0,
+                        transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+    """Define as URLs dos serviços (vazia = não configurado) e os limites; descarta o estado anterior."""
+    global pool, aluguel, externo
+    pool = PoolConexoes(max_conexoes, timeout, transport)
+    aluguel = ClienteServico("aluguel", url_aluguel, pool, concorrencia)
+    externo = ClienteServico("externo", url_externo, pool, concorrencia)
+    cache_funcionarios.limpar()
+
+async def fechar_clientes() -> None:
+    """Aguarda as notificações pendentes e fecha as conexões."""
+    await aguardar_notificacoes()
+    await pool.fechar()
+
+async def obter_funcionario(id_funcionario: int) -> Optional[Dict[str, Any]]:
+    """Consulta um funcionário no serviço de aluguel (com cache); retorna None se ele não existir."""
+    em_cache = cache_funcionarios.obter(id_funcionario)
+    if em_cache is not None:
+        return em_cache or None
+    funcionario = await aluguel.obter_json(f"/funcionario/{id_funcionario}")
+    if funcionario is None:
+        cache_funcionarios.guardar(id_funcionario, False, VALIDADE_FUNCIONARIO_INEXISTENTE)
+    else:
+        cache_funcionarios.guardar(id_funcionario, funcionario)
+    return funcionario
+
+async def validar_funcionario(id_funcionario: int) -> Optional[Dict[str, Any]]:
+    """Confere se o funcionário existe e o retorna; sem serviço de aluguel configurado, não valida (None)."""
+    if not aluguel.configurado:
+        return None
+    funcionario = await obter_funcionario(id_funcionario)
+    if funcionario is None:
+        raise ErroOperacao(422, "Funcionário não encontrado")
+    return funcionario
+
+async def enviar_email(email: str, assunto: str, mensagem: str) -> None:
+    """Envia um email pelo serviço externo."""
+    resposta = await externo.requisitar("POST", "/enviarEmail",
+                                        json={"email": email, "assunto": assunto, "mensagem": mensagem})
+    if not resposta.is_success:
+        raise ServicoIndisponivel(externo.nome)
+
+def notificar(funcionario: Optional[Dict[str, Any]], assunto: str, mensagem: str) -> None:
+    """Envia em segundo plano um email ao funcionário, se houver serviço externo e email; falhas só são registradas."""
+    email = (funcionario or {}).get("email")
+    if not email or not externo.configurado:
+        return
+    tarefa = asyncio.get_running_loop().create_task(enviar_email(email, assunto, mensagem))
+    _notificacoes.add(tarefa)
+    tarefa.add_done_callback(_notificacao_concluida)
+
+def _notificacao_concluida(tarefa: asyncio.Task) -> None:
+    _notificacoes.discard(tarefa)
+    if not tarefa.cancelled() and tarefa.exception() is not None:
+        logger.error("Falha ao enviar email: %s", tarefa.exception())
+
+async def aguardar_notificacoes() -> None:
+    """Aguarda os emails em envio neste loop."""
+    loop = asyncio.get_running_loop()
+    pendentes = [tarefa for tarefa in _notificacoes if tarefa.get_loop() is loop]
+    if pendentes:
+        await asyncio.gather(*pendentes, return_exceptions=True)
@@ -0,0 +1,220 @@
+# app/columnar_store.py
+"""Módulo contendo o armazenamento colunar compacto, para frotas com milhões de itens."""
+
+import math
+import threading
+import types
+import typing
+import weakref
+from array import array
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from pydantic import BaseModel
+from .storage import MemoryStore
+
+# Valor que representa None nas colunas de inteiros opcionais
+NULO = -(2 ** 63)
+
+_UNIOES = (typing.Union, getattr(types, "UnionType", typing.Union))
+
+class _ColunaInteiros:
+    """Coluna de inteiros de 64 bits; None é guardado como NULO."""
+    def __init__(self):
+        self.valores = array("q")
+
+    def anexar(self, valor: Optional[int]) -> None:
+        self.valores.append(NULO if valor is None else valor)
+
+    def definir(self, linha: int, valor: Optional[int]) -> None:
+        self.valores[linha] = NULO if valor is None else valor
+
+    def obter(self, linha: int) -> Optional[int]:
+        valor = self.valores[linha]
+        return None if valor == NULO else valor
+
+class _ColunaReais:
+    """Coluna de números de ponto flutuante de 64 bits; None é guardado como NaN."""
+    def __init__(self):
+        self.valores = array("d")
+
+    def anexar(self, valor: Optional[float]) -> None:
+        self.valores.append(math.nan if valor is None else valor)
+
+    def definir(self, linha: int, valor: Optional[float]) -> None:
+        self.valores[linha] = math.nan if valor is None else valor
+
+    def obter(self, linha: int) -> Optional[float]:
+        valor = self.valores[linha]
+        return None if math.isnan(valor) else valor
+
+class _ColunaEnum:
+    """Coluna de membros de um Enum, guardados como códigos de um byte."""
+    def __init__(self, enum: Type[Enum]):
+        self.membros = list(enum)
+        self.codigos = {membro: codigo for codigo, membro in enumerate(self.membros)}
+        self.valores = array("B")
+
+    def anexar(self, valor: Enum) -> None:
+        self.valores.append(self.codigos[valor])
+
+    def definir(self, linha: int, valor: Enum) -> None:
+        self.valores[linha] = self.codigos[valor]
+
+    def obter(self, linha: int) -> Enum:
+        return self.membros[self.valores[linha]]
+
+class _ColunaTextos:
+    """Coluna de strings internadas: cada texto distinto é guardado uma vez e referenciado por código."""
+    def __init__(self):
+        self.textos: List[Optional[str]] = [None]
+        self.codigos: Dict[Optional[str], int] = {None: 0}
+        self.valores = array("I")
+
+    def _codigo(self, valor: Optional[str]) -> int:
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.textos)
+            self.textos.append(valor)
+        return codigo
+
+    def anexar(self, valor: Optional[str]) -> None:
+        self.valores.append(self._codigo(valor))
+
+    def definir(self, linha: int, valor: Optional[str]) -> None:
+        self.valores[linha] = self._codigo(valor)
+
+    def obter(self, linha: int) -> Optional[str]:
+        return self.textos[self.valores[linha]]
+
+class _ColunaObjetos:
+    """Coluna genérica, para campos sem representação compacta (ex.: listas)."""
+    def __init__(self):
+        self.valores: List[Any] = []
+
+    def anexar(self, valor: Any) -> None:
+        self.valores.append(valor)
+
+    def definir(self, linha: int, valor: Any) -> None:
+        self.valores[linha] = valor
+
+    def obter(self, linha: int) -> Any:
+        return self.valores[linha]
+
+def _criar_coluna(anotacao: Any):
+    """Escolhe a coluna mais compacta para o tipo de um campo (Optional[X] usa a coluna de X)."""
+    opcional = False
+    argumentos = [arg for arg in typing.get_args(anotacao) if arg is not type(None)]
+    if typing.get_origin(anotacao) in _UNIOES and len(argumentos) == 1:
+        anotacao, opcional = argumentos[0], True
+    if anotacao is int:
+        return _ColunaInteiros()
+    if anotacao is float:
+        return _ColunaReais()
+    if anotacao is str:
+        return _ColunaTextos()
+    if isinstance(anotacao, type) and issubclass(anotacao, Enum) and len(anotacao) <= 256 and not opcional:
+        return _ColunaEnum(anotacao)
+    return _ColunaObjetos()
+
+class ColumnarStore(MemoryStore):
+    """Armazenamento em memória organizado em colunas, uma por campo do modelo.
+
+    Inteiros e reais ficam em arrays tipados, enums em códigos de um byte e strings são
+    internadas, então cada item ocupa dezenas de bytes em vez de um objeto Pydantic
+    inteiro. Os modelos são montados apenas na leitura (`get`/`values`); enquanto
+    alguém mantém uma referência a eles, `get` devolve o mesmo objeto, como o
+    MemoryStore. As linhas de itens removidos são reaproveitadas.
+    """
+    def __init__(self, model: Type[BaseModel]):
+        """Cria uma coluna para cada campo do modelo."""
+        super().__init__()
+        self.model = model
+        self._campos = list(model.model_fields)
+        self._campos_definidos = set(self._campos)
+        self._colunas = [_criar_coluna(info.annotation) for info in model.model_fields.values()]
+        self._linhas: Dict[int, int] = {}
+        self._livres: List[int] = []
+        # Modelos já montados e ainda referenciados por alguém
+        self._vivos: "weakref.WeakValueDictionary[int, BaseModel]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, item_id: int) -> Optional[BaseModel]:
+        """Busca um item pelo ID, montando o modelo a partir das colunas se necessário."""
+        with self._lock:
+            item = self._vivos.get(item_id)
+            if item is not None:
+                return item
+            linha = self._linhas.get(item_id)
+            if linha is None:
+                return None
+            return self._montar(item_id, linha)
+
+    def put(self, item: BaseModel) -> None:
+        """Grava (insere ou substitui) um item nas colunas."""
+        with self._lock:
+            self._gravar(item)
+
+    def put_many(self, itens: List[BaseModel]) -> None:
+        """Grava vários itens de uma vez."""
+        with self._lock:
+            for item in itens:
+                self._gravar(item)
+
+    def delete(self, item_id: int) -> bool:
+        """Remove um item. Retorna True se ele existia."""
+        with self._lock:
+            linha = self._linhas.pop(item_id, None)
+            if linha is None:
+                return False
+            self._vivos.pop(item_id, None)
+            self._livres.append(linha)
+            return True
+
+    def values(self) -> Iterable[BaseModel]:
+        """Retorna os itens armazenados, montando os modelos."""
+        with self._lock:
+            return [self._vivos.get(item_id) or self._montar(item_id, linha)
+                    for item_id, linha in self._linhas.items()]
+
+    def clear(self) -> None:
+        """Remove todos os itens e libera as colunas."""
+        with self._lock:
+            self._colunas = [_criar_coluna(info.annotation) for info in self.model.model_fields.values()]
+            self._linhas.clear()
+            self._livres.clear()
+            self._vivos.clear()
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._linhas
+
+    def __len__(self) -> int:
+        return len(self._linhas)
+
+    def _gravar(self, item: BaseModel) -> None:
+        """Escreve os campos do item na sua linha. Deve ser chamado com o lock adquirido."""
+        valores = [getattr(item, nome) for nome in self._campos]
+        linha = self._linhas.get(item.id)
+        if linha is None and self._livres:
+            linha = self._livres.pop()
+        if linha is None:
+            self._linhas[item.id] = len(self._linhas) + len(self._livres)
+            for coluna, valor in zip(self._colunas, valores):
+                coluna.anexar(valor)
+        else:
+            self._linhas[item.id] = linha
+            for coluna, valor in zip(self._colunas, valores):
+                coluna.definir(linha, valor)
+        self._vivos[item.id] = item
+
+    def _montar(self, item_id: int, linha: int) -> BaseModel:
+        """Monta o modelo de uma linha sem revalidá-lo. Deve ser chamado com o lock adquirido."""
+        # Equivalente a model_construct com todos os campos, sem o custo de tratar defaults
+        item = object.__new__(self.model)
+        object.__setattr__(item, "__dict__", {nome: coluna.obter(linha)
+                                              for nome, coluna in zip(self._campos, self._colunas)})
+        object.__setattr__(item, "__pydantic_fields_set__", self._campos_definidos)
+        object.__setattr__(item, "__pydantic_extra__", None)
+        object.__setattr__(item, "__pydantic_private__", None)
+        self._vivos[item_id] = item
+        return item
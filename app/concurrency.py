@@ -0,0 +1,233 @@
+# app/concurrency.py
+"""Módulo contendo as primitivas de concorrência usadas pelos serviços."""
+
+import threading
+import time
+import weakref
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import espera_locks
+
+class LocksListrados:
+    """Conjunto fixo de locks reentrantes; cada ID sempre usa o mesmo lock (ID módulo N).
+
+    Itens diferentes só disputam o mesmo lock quando caem na mesma listra. O tempo
+    de espera de cada `travar` é registrado na métrica de espera, rotulado por `nome`.
+    """
+    def __init__(self, quantidade: int = 64, nome: str = ""):
+        """Cria `quantidade` locks."""
+        self.nome = nome
+        self._locks = [threading.RLock() for _ in range(quantidade)]
+
+    def lock(self, item_id: int) -> threading.RLock:
+        """Retorna o lock responsável pelo ID."""
+        return self._locks[item_id % len(self._locks)]
+
+    @contextmanager
+    def travar(self, *item_ids: int) -> Iterator[None]:
+        """Adquire os locks dos IDs em ordem fixa (evitando deadlock) e os libera ao sair."""
+        listras = sorted({item_id % len(self._locks) for item_id in item_ids})
+        inicio = time.perf_counter()
+        for listra in listras:
+            self._locks[listra].acquire()
+        espera_locks.observar(time.perf_counter() - inicio, self.nome)
+        try:
+            yield
+        finally:
+            for listra in reversed(listras):
+                self._locks[listra].release()
+
+# --- Leituras consistentes (MVCC) ---
+# Quantidade de escritas confirmadas guardadas por coleção a partir da qual as antigas são descartadas
+LIMITE_PODA = 1024
+
+class RegistroDesfazer:
+    """Versão anterior de um item alterado e o carimbo da escrita (None enquanto ela não é confirmada)."""
+    __slots__ = ("versoes", "item_id", "anterior", "carimbo")
+
+    def __init__(self, versoes: "VersoesAnteriores", item_id: int, anterior: Any):
+        self.versoes = versoes
+        self.item_id = item_id
+        self.anterior = anterior
+        self.carimbo: Optional[int] = None
+
+class RelogioVersoes:
+    """Relógio global de versões: carimba as escritas confirmadas e registra as leituras abertas."""
+    def __init__(self):
+        """Inicia o relógio sem escritas nem leituras."""
+        self.atual = 0
+        self._leituras: Dict[int, int] = {}  # carimbo -> quantidade de leituras abertas nele
+        self._lock = threading.Lock()
+
+    def abrir(self) -> int:
+        """Abre uma leitura no instante atual e retorna esse instante."""
+        with self._lock:
+            instante = self.atual
+            self._leituras[instante] = self._leituras.get(instante, 0) + 1
+            return instante
+
+    def fechar(self, instante: int) -> None:
+        """Fecha uma leitura aberta com `abrir`."""
+        with self._lock:
+            restantes = self._leituras.pop(instante) - 1
+            if restantes:
+                self._leituras[instante] = restantes
+
+    def mais_antigo(self) -> int:
+        """Retorna o instante da leitura aberta mais antiga (ou o atual, sem leituras abertas)."""
+        with self._lock:
+            return min(self._leituras, default=self.atual)
+
+    def confirmar(self, registros: Iterable[RegistroDesfazer]) -> int:
+        """Carimba os registros de uma escrita com um único carimbo novo, tornando-a visível de uma vez."""
+        with self._lock:
+            carimbo = self.atual + 1
+            for registro in registros:
+                registro.carimbo = carimbo
+                registro.versoes.confirmado(registro)
+            # Só depois de carimbar tudo: quem abrir uma leitura neste instante já vê a escrita inteira
+            self.atual = carimbo
+            return carimbo
+
+relogio = RelogioVersoes()
+_instante_leitura: ContextVar[Optional[int]] = ContextVar("instante_leitura", default=None)
+
+def instante_leitura() -> Optional[int]:
+    """Retorna o instante da leitura consistente em andamento, ou None fora de uma."""
+    return _instante_leitura.get()
+
+@contextmanager
+def leitura_consistente() -> Iterator[int]:
+    """Context manager em que as leituras dos serviços veem todas as coleções num mesmo instante.
+
+    Não toma locks de escrita: os itens alterados depois do instante são lidos dos
+    registros de desfazer. Leituras aninhadas usam o instante da mais externa. Só para
+    leitura: as escritas feitas dentro dele continuam partindo da versão atual dos itens.
+    """
+    instante = _instante_leitura.get()
+    if instante is not None:
+        yield instante
+        return
+    instante = relogio.abrir()
+    _instante_leitura.set(instante)
+    try:
+        yield instante
+    finally:
+        _instante_leitura.set(None)
+        relogio.fechar(instante)
+
+class LeituraAberta:
+    """Leitura consistente que fica aberta entre vários blocos `ler()`, como num gerador consumido aos poucos.
+
+    É fechada com `fechar()` ou, se for descartada antes disso, pelo coletor de lixo.
+    """
+    def __init__(self, relogio_versoes: RelogioVersoes = relogio):
+        """Abre a leitura no instante atual do relógio."""
+        self.instante = relogio_versoes.abrir()
+        self.fechar = weakref.finalize(self, relogio_versoes.fechar, self.instante)
+
+    @contextmanager
+    def ler(self) -> Iterator[int]:
+        """Context manager em que as leituras dos serviços veem o instante desta leitura."""
+        anterior = _instante_leitura.get()
+        _instante_leitura.set(self.instante)
+        try:
+            yield self.instante
+        finally:
+            _instante_leitura.set(anterior)
+
+class VersoesAnteriores:
+    """Registros de desfazer dos itens de uma coleção.
+
+    Antes de gravar um item, o serviço registra a versão anterior dele (pendente);
+    depois de gravar, o relógio carimba o registro. Quem lê no instante T vê, de cada
+    item, a versão anterior à primeira escrita pendente ou carimbada depois de T, ou
+    a atual, se não houver. As escritas confirmadas ficam também numa lista em ordem
+    de carimbo, então achar o que mudou depois de T custa só o que mudou; as mais
+    antigas que a leitura aberta mais antiga são descartadas junto com seus registros.
+    """
+    def __init__(self, relogio_versoes: RelogioVersoes = relogio):
+        """Define o relógio (compartilhado entre as coleções, para as leituras valerem entre elas)."""
+        self.relogio = relogio_versoes
+        self._registros: Dict[int, List[RegistroDesfazer]] = {}  # por item, do mais antigo ao mais recente
+        self._pendentes: Dict[int, int] = {}  # item -> escritas ainda não confirmadas
+        self._confirmadas: List[Tuple[int, int]] = []  # (carimbo, item), em ordem de carimbo
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._registros)
+
+    def preparar(self, anteriores: Iterable[Tuple[int, Any]]) -> List[RegistroDesfazer]:
+        """Registra, pendente, a versão anterior (ou None) de cada item prestes a ser gravado."""
+        mais_antigo = self.relogio.mais_antigo()
+        novos = []
+        with self._lock:
+            if len(self._confirmadas) >= LIMITE_PODA:
+                self._podar(mais_antigo)
+            for item_id, anterior in anteriores:
+                registro = RegistroDesfazer(self, item_id, anterior)
+                # Listas só recebem acréscimos (a poda troca a lista inteira): quem as percorre não é afetado
+                self._registros.setdefault(item_id, []).append(registro)
+                self._pendentes[item_id] = self._pendentes.get(item_id, 0) + 1
+                novos.append(registro)
+        return novos
+
+    def confirmado(self, registro: RegistroDesfazer) -> None:
+        """Chamado pelo relógio, em ordem de carimbo, ao confirmar a escrita do registro."""
+        with self._lock:
+            self._confirmadas.append((registro.carimbo, registro.item_id))
+            restantes = self._pendentes.pop(registro.item_id) - 1
+            if restantes:
+                self._pendentes[registro.item_id] = restantes
+            elif not self._pendentes:
+                # Um dicionário esvaziado mantém a tabela do tamanho que chegou a ter, e percorrê-lo em
+                # `alterados` custaria isso; depois de um lote grande, troca por um novo
+                self._pendentes = {}
+
+    def _podar(self, mais_antigo: int) -> None:
+        """Descarta as escritas confirmadas até `mais_antigo`, que nenhuma leitura aberta (ou futura) vê como alteradas."""
+        corte = bisect_right(self._confirmadas, (mais_antigo, float("inf")))
+        for _carimbo, item_id in self._confirmadas[:corte]:
+            registros = self._registros.get(item_id)
+            if registros is None:
+                continue
+            restantes = [r for r in registros if r.carimbo is None or r.carimbo > mais_antigo]
+            if restantes:
+                self._registros[item_id] = restantes
+            else:
+                del self._registros[item_id]
+        if corte:
+            self._confirmadas = self._confirmadas[corte:]
+
+    def visivel(self, item_id: int, atual: Any, instante: int) -> Any:
+        """Retorna a versão do item no instante, dada a versão atual (lida antes de chamar)."""
+        for registro in self._registros.get(item_id, ()):
+            carimbo = registro.carimbo
+            if carimbo is None or carimbo > instante:
+                return registro.anterior
+        return atual
+
+    def alterados(self, instante: int) -> Dict[int, Any]:
+        """Retorna a versão no instante (ou None) de cada item alterado depois dele ou com escrita pendente."""
+        # Pendentes antes das confirmadas: uma escrita confirmada no meio aparece em uma das duas
+        ids = list(self._pendentes)
+        confirmadas = self._confirmadas
+        posicao = len(confirmadas) - 1
+        while posicao >= 0 and confirmadas[posicao][0] > instante:
+            ids.append(confirmadas[posicao][1])
+            posicao -= 1
+        alterados = {}
+        for item_id in ids:
+            if item_id not in alterados:
+                alterados[item_id] = self.visivel(item_id, None, instante)
+        return alterados
+
+    def limpar(self) -> None:
+        """Descarta os registros confirmados (ao substituir a coleção inteira)."""
+        with self._lock:
+            self._registros = {item_id: registros for item_id, registros in self._registros.items()
+                               if item_id in self._pendentes}
+            self._confirmadas = []
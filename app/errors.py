@@ -0,0 +1,24 @@
+# app/errors.py
+"""Módulo contendo as exceções de negócio da aplicação."""
+
+class ErroOperacao(Exception):
+    """Erro de regra de negócio, com o status HTTP que o representa na API."""
+    def __init__(self, status_code: int, detail: str):
+        """Guarda o status HTTP e a mensagem do erro."""
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class ConflitoVersao(Exception):
+    """Erro lançado quando a versão esperada de um item não é a versão atual."""
+    def __init__(self, versao_atual: int):
+        """Guarda a versão atual do item para ser informada ao cliente."""
+        super().__init__(f"Versão atual do item é {versao_atual}")
+        self.versao_atual = versao_atual
+
+class ServicoIndisponivel(ErroOperacao):
+    """Erro lançado quando um microsserviço externo não responde (ou está com o circuito aberto)."""
+    def __init__(self, servico: str):
+        """Guarda o nome do serviço indisponível."""
+        super().__init__(503, f"Serviço {servico} indisponível")
+        self.servico = servico
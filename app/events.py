@@ -0,0 +1,145 @@
+# app/events.py
+"""Módulo contendo o feed de alterações da rede, assinável por SSE ou WebSocket."""
+
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Callable, Deque, List, Optional, Set, Tuple
+
+import pydantic_core
+from pydantic import BaseModel
+
+class Evento:
+    """Alteração de um item (gravado ou removido), com número de sequência crescente."""
+    __slots__ = ("seq", "tipo", "operacao", "item_id", "status", "totens", "item")
+
+    def __init__(self, seq: int, tipo: str, operacao: str, item_id: Optional[int] = None,
+                 status: Optional[str] = None, totens: Tuple[int, ...] = (), item: Optional[BaseModel] = None):
+        self.seq = seq
+        self.tipo = tipo
+        self.operacao = operacao
+        self.item_id = item_id
+        self.status = status
+        self.totens = totens
+        self.item = item
+
+    def json(self) -> bytes:
+        """Serializa o evento (o item é serializado só aqui, na entrega)."""
+        return pydantic_core.to_json({
+            "seq": self.seq, "tipo": self.tipo, "operacao": self.operacao, "id": self.item_id,
+            "status": self.status, "totens": self.totens, "item": self.item,
+        })
+
+FiltroEventos = Callable[[Evento], bool]
+
+def filtro_eventos(tipos: Optional[Set[str]] = None, totem: Optional[int] = None,
+                   status: Optional[Set[str]] = None) -> FiltroEventos:
+    """Cria um filtro por tipo de item, totem relacionado e status (None = sem restrição)."""
+    def filtrar(evento: Evento) -> bool:
+        return ((tipos is None or evento.tipo in tipos)
+                and (totem is None or totem in evento.totens)
+                and (status is None or evento.status in status))
+    return filtrar
+
+class FeedAlteracoes:
+    """Buffer circular com as últimas alterações, lido por quantos assinantes houver.
+
+    Os assinantes não têm fila própria: cada um guarda apenas o último número de
+    sequência entregue e relê o buffer a partir dele. Quem fica mais de `capacidade`
+    eventos para trás (ou reconecta com um `since` antigo demais) recebe um evento
+    "perdido" e segue a partir do mais antigo disponível, então a memória usada não
+    depende da velocidade dos clientes.
+    """
+    def __init__(self, capacidade: int = 10_000):
+        """Inicializa o buffer vazio."""
+        self.capacidade = capacidade
+        self._eventos: Deque[Evento] = deque(maxlen=capacidade)
+        self._seq = 0
+        self._lock = threading.Lock()
+        # Assinantes aguardando novos eventos, cada um com o loop em que está
+        self._esperando: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def seq(self) -> int:
+        """Retorna o número de sequência do último evento publicado."""
+        return self._seq
+
+    def publicar(self, tipo: str, item_id: int, item: Optional[BaseModel], totens: Tuple[int, ...] = ()) -> None:
+        """Acrescenta a gravação (ou remoção, se `item` for None) de um item ao feed."""
+        with self._lock:
+            self._seq += 1
+            self._eventos.append(Evento(self._seq, tipo, "removido" if item is None else "gravado", item_id,
+                                        getattr(item, "status", None), totens, item))
+            esperando, self._esperando = self._esperando, set()
+        self._acordar(esperando)
+
+    def avisar(self, operacao: str) -> None:
+        """Publica um aviso do próprio feed (ex.: "restaurado"), entregue a todos os assinantes."""
+        with self._lock:
+            self._seq += 1
+            self._eventos.append(Evento(self._seq, "feed", operacao))
+            esperando, self._esperando = self._esperando, set()
+        self._acordar(esperando)
+
+    @staticmethod
+    def _acordar(esperando: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]) -> None:
+        """Acorda os assinantes; pode ser chamado de qualquer thread, então usa o loop de cada um."""
+        for loop, evento in esperando:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:  # loop já encerrado
+                pass
+
+    def ler(self, apos: int, limite: int = 1000) -> Tuple[List[Evento], bool]:
+        """Retorna até `limite` eventos com seq maior que `apos` e se algum deles já foi descartado."""
+        with self._lock:
+            if apos > self._seq:  # cursor de uma execução anterior do servidor
+                return [], True
+            primeiro = self._eventos[0].seq if self._eventos else self._seq + 1
+            perdidos = apos < primeiro - 1
+            # Lê a partir do fim, pois os assinantes costumam estar perto dele
+            eventos = list(islice(reversed(self._eventos), self._seq - max(apos, primeiro - 1)))
+        eventos.reverse()
+        return eventos[:limite], perdidos
+
+    async def assinar(self, desde: Optional[int] = None, filtro: Optional[FiltroEventos] = None,
+                      intervalo_ping: float = 15.0) -> AsyncIterator[Optional[Evento]]:
+        """Gera os eventos posteriores a `desde` (por padrão, só os novos) que passam no filtro.
+
+        Gera None após `intervalo_ping` segundos sem eventos, para manter a conexão viva.
+        """
+        cursor = self._seq if desde is None else desde
+        while True:
+            eventos, perdidos = self.ler(cursor)
+            if perdidos:
+                ultimo = eventos[0].seq - 1 if eventos else self._seq
+                yield Evento(ultimo, "feed", "perdido")
+                cursor = ultimo
+                continue
+            for evento in eventos:
+                cursor = evento.seq
+                if filtro is None or evento.tipo == "feed" or filtro(evento):
+                    yield evento
+            if eventos:
+                # Cede o loop mesmo quando o filtro descarta todos os eventos lidos
+                await asyncio.sleep(0)
+            elif not await self._aguardar(cursor, intervalo_ping):
+                yield None
+
+    async def _aguardar(self, cursor: int, limite: float) -> bool:
+        """Espera um evento posterior a `cursor`. Retorna False se o tempo se esgotar."""
+        sinal = asyncio.Event()
+        espera = (asyncio.get_running_loop(), sinal)
+        with self._lock:
+            if self._seq > cursor:
+                return True
+            self._esperando.add(espera)
+        try:
+            await asyncio.wait_for(sinal.wait(), limite)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._esperando.discard(espera)
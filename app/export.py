@@ -0,0 +1,134 @@
+# app/export.py
+"""Módulo contendo a exportação da frota em NDJSON ou CSV, em streaming e opcionalmente com gzip.
+
+Os registros seguem o formato das fixtures (campo/coluna `tipo` mais os campos do item),
+então um arquivo exportado pode ser carregado de volta com EQUIPAMENTO_FIXTURES.
+
+Uso (lê o armazenamento configurado por EQUIPAMENTO_STORAGE/EQUIPAMENTO_DADOS):
+    python -m app.export --formato csv --tipos bicicleta tranca --gzip -o frota.csv.gz
+"""
+
+import argparse
+import csv
+import io
+import sys
+import zlib
+from enum import Enum
+from typing import Any, Iterable, Iterator, List, Optional
+
+import pydantic_core
+
+from .concurrency import LeituraAberta
+from .services import SERVICOS
+
+FORMATOS = ("ndjson", "csv")
+TIPOS_MIDIA = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Tamanho aproximado de cada bloco entregue pelo gerador
+TAMANHO_BLOCO = 64 * 1024
+# Itens lidos de cada vez (uma página da listagem por cursor)
+TAMANHO_PAGINA = 1000
+
+def _itens(tipos: List[str], leitura: LeituraAberta) -> Iterator[tuple]:
+    """Gera (tipo, item) de cada coleção, em ordem de ID, lendo uma página por vez no instante da leitura."""
+    try:
+        for tipo in tipos:
+            servico = SERVICOS[tipo]
+            cursor: Optional[int] = 0
+            while cursor is not None:
+                # Só a leitura da página fica no instante: o gerador pode seguir em outra thread
+                with leitura.ler():
+                    pagina, cursor = servico.get_page(cursor, TAMANHO_PAGINA)
+                for item in pagina:
+                    yield tipo, item
+    finally:
+        leitura.fechar()
+
+def _blocos_ndjson(tipos: List[str], leitura: LeituraAberta) -> Iterator[bytes]:
+    """Gera blocos de linhas NDJSON `{"tipo": ..., <campos do item>}`."""
+    prefixos = {tipo: b'{"tipo":' + pydantic_core.to_json(tipo) + b"," for tipo in tipos}
+    bloco = bytearray()
+    for tipo, item in _itens(tipos, leitura):
+        # O JSON do item começa com "{"; o tipo entra como primeiro campo
+        bloco += prefixos[tipo] + pydantic_core.to_json(item)[1:] + b"\n"
+        if len(bloco) >= TAMANHO_BLOCO:
+            yield bytes(bloco)
+            bloco.clear()
+    if bloco:
+        yield bytes(bloco)
+
+def _celula(valor: Any) -> Any:
+    """Converte um valor para uma célula de CSV (None vazio, listas separadas por ";")."""
+    if valor is None:
+        return ""
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, list):
+        return ";".join(str(v) for v in valor)
+    return valor
+
+def _blocos_csv(tipos: List[str], leitura: LeituraAberta) -> Iterator[bytes]:
+    """Gera blocos de CSV com a coluna `tipo` e a união dos campos das coleções exportadas."""
+    colunas = list(dict.fromkeys(nome for tipo in tipos for nome in SERVICOS[tipo].model.model_fields))
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(["tipo", *colunas])
+    for tipo, item in _itens(tipos, leitura):
+        escritor.writerow([tipo, *(_celula(getattr(item, nome, None)) for nome in colunas)])
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _gzip(blocos: Iterable[bytes]) -> Iterator[bytes]:
+    """Compacta os blocos em um único fluxo gzip, sem acumulá-los."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        saida = compressor.compress(bloco)
+        if saida:
+            yield saida
+    yield compressor.flush()
+
+def exportar(formato: str = "ndjson", tipos: Optional[List[str]] = None, gzip: bool = False) -> Iterator[bytes]:
+    """Retorna um gerador com a exportação das coleções no estado do momento da chamada.
+
+    Abre aqui uma leitura consistente (ver app/concurrency.py) e percorre as coleções
+    em páginas por cursor, à medida que o gerador é consumido: nada é copiado e as
+    escritas não esperam a exportação. Os itens alterados depois são lidos na versão
+    do início; os modelos são serializados um a um, então a memória de pico não
+    depende do tamanho da frota.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    tipos = tipos or list(SERVICOS)
+    leitura = LeituraAberta()
+    blocos = _blocos_csv(tipos, leitura) if formato == "csv" else _blocos_ndjson(tipos, leitura)
+    return _gzip(blocos) if gzip else blocos
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Exporta o armazenamento configurado para um arquivo ou para a saída padrão."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formato", choices=FORMATOS, default="ndjson")
+    parser.add_argument("--tipos", nargs="+", choices=list(SERVICOS), default=list(SERVICOS))
+    parser.add_argument("--gzip", action="store_true", help="Compacta a saída com gzip")
+    parser.add_argument("-o", "--saida", help="Arquivo de saída (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    from .main import configurar_storage
+    from .services import fechar_armazenamento
+    configurar_storage()
+    try:
+        destino = open(args.saida, "wb") if args.saida else sys.stdout.buffer
+        try:
+            for bloco in exportar(args.formato, args.tipos, args.gzip):
+                destino.write(bloco)
+        finally:
+            if args.saida:
+                destino.close()
+    finally:
+        fechar_armazenamento()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
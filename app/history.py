@@ -0,0 +1,166 @@
+# app/history.py
+"""Módulo contendo o histórico compacto das transições de status das trancas e bicicletas.
+
+O histórico é um log só de acréscimo guardado em colunas (instante, id do item, status
+de origem e de destino, item relacionado), em blocos de arrays pré-alocados: cada
+transição ocupa cerca de 34 bytes, contando o índice por item. O índice guarda, para
+cada item, as posições globais dos seus eventos, então consultar o histórico de um
+item não percorre os dos demais. Os blocos mais antigos que a retenção são descartados
+inteiros.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from enum import Enum
+from typing import Callable, Dict, List, NamedTuple, Optional, Type
+
+from .columnar_store import NULO
+
+# Código do status de origem de um item recém-criado (ou cujo evento anterior já foi descartado)
+SEM_STATUS = -1
+TAMANHO_BLOCO = 8192
+RETENCAO_PADRAO = 30 * 24 * 3600.0
+
+class Transicao(NamedTuple):
+    """Transição de status de um item: instante (epoch, em segundos), origem, destino e item relacionado."""
+    instante: float
+    de: Optional[Enum]
+    para: Enum
+    relacionado: Optional[int]
+
+class _Bloco:
+    """Bloco de colunas pré-alocadas com até TAMANHO_BLOCO eventos; `base` é a posição global do primeiro."""
+    __slots__ = ("base", "tamanho", "instantes", "ids", "de", "para", "relacionados")
+
+    def __init__(self, base: int, capacidade: int):
+        self.base = base
+        self.tamanho = 0
+        self.instantes = array("d", bytes(8 * capacidade))
+        self.ids = array("q", bytes(8 * capacidade))
+        self.de = array("b", bytes(capacidade))
+        self.para = array("b", bytes(capacidade))
+        self.relacionados = array("q", bytes(8 * capacidade))
+
+class HistoricoTransicoes:
+    """Log de transições de status de uma coleção, consultável por item e intervalo de tempo.
+
+    É alimentado como observador do serviço: registra um evento quando o status (ou o
+    item relacionado, como a bicicleta presa numa tranca) muda em relação ao último
+    evento do item. Remoções não geram eventos, então a reconstrução dos índices após
+    trocar o armazenamento (que remove e regrava tudo) não polui o histórico.
+    """
+    def __init__(self, enum: Type[Enum], relacionado: Optional[str] = None, retencao: float = RETENCAO_PADRAO,
+                 tamanho_bloco: int = TAMANHO_BLOCO, relogio: Callable[[], float] = time.time):
+        """Define o enum dos status, o campo do item relacionado (opcional), a retenção em segundos e o relógio."""
+        self.status = list(enum)
+        self._codigos = {status: codigo for codigo, status in enumerate(self.status)}
+        self.relacionado = relacionado
+        self.retencao = retencao
+        self.tamanho_bloco = tamanho_bloco
+        self.relogio = relogio
+        self._blocos: List[_Bloco] = []
+        self._inicio = 0  # posição global do primeiro evento retido
+        self._fim = 0  # posição global do próximo evento
+        self._ultimo_instante = 0.0
+        self._por_item: Dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._fim - self._inicio
+
+    def item_alterado(self, item_id: int, item) -> None:
+        """Observador do serviço: registra a transição se o status ou o item relacionado mudou."""
+        if item is None:
+            return
+        para = self._codigos[item.status]
+        relacionado = getattr(item, self.relacionado) if self.relacionado else None
+        relacionado = NULO if relacionado is None else relacionado
+        with self._lock:
+            posicoes = self._por_item.get(item_id)
+            de = SEM_STATUS
+            if posicoes:
+                bloco, linha = self._localizar(posicoes[-1])
+                if bloco.para[linha] == para and bloco.relacionados[linha] == relacionado:
+                    return
+                de = bloco.para[linha]
+            self._anexar(item_id, de, para, relacionado)
+
+    def _anexar(self, item_id: int, de: int, para: int, relacionado: int) -> None:
+        # Instantes não decrescentes, para que as consultas por intervalo possam usar busca binária
+        instante = self._ultimo_instante = max(self._ultimo_instante, self.relogio())
+        if not self._blocos or self._blocos[-1].tamanho == self.tamanho_bloco:
+            self._expurgar(instante)
+            self._blocos.append(_Bloco(self._fim, self.tamanho_bloco))
+        bloco = self._blocos[-1]
+        linha = bloco.tamanho
+        bloco.instantes[linha] = instante
+        bloco.ids[linha] = item_id
+        bloco.de[linha] = de
+        bloco.para[linha] = para
+        bloco.relacionados[linha] = relacionado
+        bloco.tamanho += 1
+        self._por_item.setdefault(item_id, array("q")).append(self._fim)
+        self._fim += 1
+
+    def _localizar(self, posicao: int):
+        """Retorna o bloco e a linha de uma posição global retida."""
+        indice = (posicao - self._blocos[0].base) // self.tamanho_bloco
+        bloco = self._blocos[indice]
+        return bloco, posicao - bloco.base
+
+    def _instante(self, posicao: int) -> float:
+        bloco, linha = self._localizar(posicao)
+        return bloco.instantes[linha]
+
+    def _expurgar(self, agora: float) -> None:
+        """Descarta os blocos cheios cujo último evento é mais antigo que a retenção."""
+        limite = agora - self.retencao
+        while self._blocos and self._blocos[0].tamanho == self.tamanho_bloco \
+                and self._blocos[0].instantes[self.tamanho_bloco - 1] < limite:
+            bloco = self._blocos.pop(0)
+            self._inicio = bloco.base + bloco.tamanho
+            # Corta, no índice de cada item do bloco, as posições que deixaram de existir
+            for item_id in set(bloco.ids):
+                posicoes = self._por_item[item_id]
+                corte = bisect_left(posicoes, self._inicio)
+                if corte == len(posicoes):
+                    del self._por_item[item_id]
+                else:
+                    del posicoes[:corte]
+
+    def expurgar(self) -> None:
+        """Descarta os blocos além da retenção (também é feito ao alocar cada bloco)."""
+        with self._lock:
+            self._expurgar(self.relogio())
+
+    def consultar(self, item_id: int, desde: Optional[float] = None, ate: Optional[float] = None,
+                  limite: Optional[int] = None) -> List[Transicao]:
+        """Retorna as transições do item com instante em [desde, ate], da mais antiga para a mais recente."""
+        with self._lock:
+            posicoes = self._por_item.get(item_id)
+            if not posicoes:
+                return []
+            inicio = 0 if desde is None else bisect_left(posicoes, desde, key=self._instante)
+            fim = len(posicoes) if ate is None else bisect_right(posicoes, ate, key=self._instante)
+            if limite is not None:
+                fim = min(fim, inicio + limite)
+            transicoes = []
+            for posicao in posicoes[inicio:fim]:
+                bloco, linha = self._localizar(posicao)
+                de, relacionado = bloco.de[linha], bloco.relacionados[linha]
+                transicoes.append(Transicao(bloco.instantes[linha], None if de == SEM_STATUS else self.status[de],
+                                            self.status[bloco.para[linha]], None if relacionado == NULO else relacionado))
+            return transicoes
+
+    def possui(self, item_id: int) -> bool:
+        """Indica se o item tem eventos retidos."""
+        return item_id in self._por_item
+
+    def limpar(self) -> None:
+        """Descarta todo o histórico."""
+        with self._lock:
+            self._blocos.clear()
+            self._por_item.clear()
+            self._inicio = self._fim
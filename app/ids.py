@@ -0,0 +1,131 @@
+# app/ids.py
+"""Módulo contendo os alocadores de IDs usados pelos modelos."""
+
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_FORMATO_CONTADOR = "<q"
+_TAMANHO_CONTADOR = struct.calcsize(_FORMATO_CONTADOR)
+
+class AlocadorIds:
+    """Alocador de IDs sequenciais seguro entre threads de um mesmo processo."""
+    def __init__(self, ultimo: int = 1):
+        """Inicializa o alocador; o primeiro ID gerado será `ultimo + 1`."""
+        self._lock = threading.Lock()
+        self._ultimo = ultimo
+
+    def proximo(self) -> int:
+        """Retorna um novo ID."""
+        with self._lock:
+            self._ultimo += 1
+            return self._ultimo
+
+    def reservar_ate(self, valor: int) -> None:
+        """Garante que os próximos IDs sejam maiores que `valor`."""
+        with self._lock:
+            self._ultimo = max(self._ultimo, valor)
+
+    def valor_atual(self) -> int:
+        """Retorna o último ID entregue (ou reservado)."""
+        return self._ultimo
+
+    def restaurar(self, valor: int) -> None:
+        """Redefine o último ID entregue, tornando a sequência reprodutível."""
+        with self._lock:
+            self._ultimo = valor
+
+class AlocadorIdsCompartilhado(AlocadorIds):
+    """Alocador de IDs único entre processos, com o contador em um arquivo mapeado em memória.
+
+    Cada processo reserva blocos de `tamanho_bloco` IDs sob um lock de arquivo e os
+    entrega localmente, então o lock entre processos é tomado uma vez por bloco.
+    Os IDs continuam únicos, mas processos diferentes podem entregá-los fora de ordem.
+    """
+    def __init__(self, caminho: str, tamanho_bloco: int = 1000):
+        """Abre (ou cria) o arquivo do contador e o mapeia em memória."""
+        super().__init__(0)
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        self._fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._travar_arquivo():
+            if os.fstat(self._fd).st_size < _TAMANHO_CONTADOR:
+                os.write(self._fd, struct.pack(_FORMATO_CONTADOR, 1))
+        self._mapa = mmap.mmap(self._fd, _TAMANHO_CONTADOR)
+        self._limite = 0
+
+    def proximo(self) -> int:
+        """Retorna um novo ID, reservando outro bloco quando o atual se esgota."""
+        with self._lock:
+            if self._ultimo >= self._limite:
+                with self._travar_arquivo():
+                    inicio = self._ler_contador()
+                    self._escrever_contador(inicio + self.tamanho_bloco)
+                self._ultimo, self._limite = inicio, inicio + self.tamanho_bloco
+            self._ultimo += 1
+            return self._ultimo
+
+    def reservar_ate(self, valor: int) -> None:
+        """Garante que nenhum processo entregue IDs menores ou iguais a `valor` daqui em diante."""
+        if self._ler_contador() >= valor:
+            return
+        with self._lock:
+            with self._travar_arquivo():
+                if self._ler_contador() < valor:
+                    self._escrever_contador(valor)
+            self._limite = 0
+
+    def valor_atual(self) -> int:
+        """Retorna o contador compartilhado (último ID reservado por algum processo)."""
+        return self._ler_contador()
+
+    def restaurar(self, valor: int) -> None:
+        """Redefine o contador compartilhado e descarta o bloco local."""
+        with self._lock:
+            with self._travar_arquivo():
+                self._escrever_contador(valor)
+            self._limite = 0
+
+    def fechar(self) -> None:
+        """Libera o mapeamento e o descritor do arquivo."""
+        self._mapa.close()
+        os.close(self._fd)
+
+    def _ler_contador(self) -> int:
+        return struct.unpack_from(_FORMATO_CONTADOR, self._mapa, 0)[0]
+
+    def _escrever_contador(self, valor: int) -> None:
+        struct.pack_into(_FORMATO_CONTADOR, self._mapa, 0, valor)
+
+    @contextmanager
+    def _travar_arquivo(self):
+        """Lock exclusivo sobre o arquivo do contador, entre processos."""
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, _TAMANHO_CONTADOR)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, _TAMANHO_CONTADOR)
+
+# Alocador usado por generate_id; substituído por configurar_alocador no modo compartilhado.
+alocador: AlocadorIds = AlocadorIds()
+
+def configurar_alocador(novo: AlocadorIds) -> None:
+    """Define o alocador de IDs usado pelos modelos."""
+    global alocador
+    alocador = novo
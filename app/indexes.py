@@ -0,0 +1,73 @@
+# app/indexes.py
+"""Módulo contendo os índices secundários mantidos pelos serviços."""
+
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+Extrator = Callable[[Any], Iterable[Hashable]]
+
+def campo(nome: str) -> Extrator:
+    """Cria um extrator que indexa o valor de um atributo, ignorando None."""
+    def extrair(item: Any) -> Iterable[Hashable]:
+        valor = getattr(item, nome)
+        return () if valor is None else (valor,)
+    return extrair
+
+def campo_lista(nome: str) -> Extrator:
+    """Cria um extrator que indexa cada elemento de um atributo do tipo lista."""
+    def extrair(item: Any) -> Iterable[Hashable]:
+        return getattr(item, nome) or ()
+    return extrair
+
+class Indice:
+    """Índice secundário que mapeia uma chave para os IDs (ordenados) dos itens."""
+    def __init__(self, extrator: Extrator):
+        """Inicializa o índice com a função que extrai as chaves de um item."""
+        self.extrator = extrator
+        self._ids_por_chave: Dict[Hashable, List[int]] = {}
+        # Guarda as chaves com que cada item foi indexado, pois os modelos
+        # podem ser alterados no lugar antes de o serviço reindexá-los.
+        self._chaves_por_id: Dict[int, Tuple[Hashable, ...]] = {}
+
+    def atualizar(self, item_id: int, item: Any) -> None:
+        """Indexa (ou reindexa) um item com as chaves atuais."""
+        chaves = tuple(dict.fromkeys(self.extrator(item)))
+        if self._chaves_por_id.get(item_id) == chaves:
+            return
+        self.remover(item_id)
+        for chave in chaves:
+            insort(self._ids_por_chave.setdefault(chave, []), item_id)
+        if chaves:
+            self._chaves_por_id[item_id] = chaves
+
+    def remover(self, item_id: int) -> None:
+        """Remove um item de todas as chaves em que estava indexado."""
+        for chave in self._chaves_por_id.pop(item_id, ()):
+            ids = self._ids_por_chave[chave]
+            del ids[bisect_left(ids, item_id)]
+            if not ids:
+                del self._ids_por_chave[chave]
+
+    def buscar(self, chave: Hashable) -> List[int]:
+        """Retorna os IDs associados à chave, em ordem crescente. Não deve ser alterada."""
+        return self._ids_por_chave.get(chave, [])
+
+    def contem(self, item_id: int, chave: Hashable) -> bool:
+        """Indica se o item está indexado sob a chave informada."""
+        return chave in self._chaves_por_id.get(item_id, ())
+
+    def contar(self, chave: Hashable) -> int:
+        """Retorna quantos itens estão associados à chave."""
+        return len(self._ids_por_chave.get(chave, ()))
+
+    def copiar(self) -> "Indice":
+        """Retorna uma cópia independente do índice (usada nos snapshots)."""
+        copia = Indice(self.extrator)
+        copia._ids_por_chave = {chave: list(ids) for chave, ids in self._ids_por_chave.items()}
+        copia._chaves_por_id = dict(self._chaves_por_id)
+        return copia
+
+    def limpar(self) -> None:
+        """Remove todas as entradas do índice."""
+        self._ids_por_chave.clear()
+        self._chaves_por_id.clear()
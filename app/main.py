@@ -1,29 +1,171 @@
 # app/main.py
-"""Ponto de entrada principal da aplicação FastAPI."""
+"""Ponto de entrada principal da aplicação FastAPI.
 
-from fastapi import FastAPI, Response
-from . import routers
-from .services import restaurar_banco
+Modo compartilhado (vários workers servindo a mesma frota no mesmo host):
+
+    EQUIPAMENTO_STORAGE=sqlite EQUIPAMENTO_DADOS=/var/lib/equipamento \
+        uvicorn app.main:app --workers 4
+
+Nesse modo todos os workers gravam no mesmo banco SQLite (cada um mantém um cache
+sincronizado pelas alterações dos demais) e obtêm IDs de um contador compartilhado
+em `ids.contador`, reservado em blocos de EQUIPAMENTO_IDS_BLOCO IDs (padrão 1000).
+"""
+
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from . import ids, routers
+from .admission import AdmissaoMiddleware
+from .clients import configurar_clientes, fechar_clientes
+from .errors import ConflitoVersao, ErroOperacao
+from .metrics import MetricasMiddleware, registro
+from .serialization import RespostaJSON
+from .snapshots import carregar_fixtures, restaurar_snapshot, salvar_snapshot
+from .startup import aquecer, carregar_openapi, perfil
+from .telemetry import telemetria
+from .services import (
+    agregados, historico_bicicletas, historico_trancas, restaurar_banco, configurar_armazenamento,
+    fechar_armazenamento, executar
+)
+
+# Configuração do armazenamento via variáveis de ambiente:
+#   EQUIPAMENTO_STORAGE = "memoria" (padrão), "log" (log de escrita antecipada + snapshots)
+#                         "sqlite" (banco compartilhável entre workers do mesmo host)
+#                         ou "colunar" (em memória, compacto, para milhões de itens)
+#   EQUIPAMENTO_DADOS   = diretório dos arquivos de dados (padrão: ./dados)
+#   EQUIPAMENTO_FIXTURES = arquivos NDJSON/CSV carregados na subida, separados por vírgula;
+#                          o estado resultante fica salvo no snapshot "fixtures"
+#   EQUIPAMENTO_URL_ALUGUEL = URL do microsserviço de aluguel, usado para validar o idFuncionario
+#                             das operações na rede (vazia: não valida)
+#   EQUIPAMENTO_URL_EXTERNO = URL do microsserviço externo, usado para avisar o funcionário
+#                             por email após essas operações (vazia: não envia)
+#   EQUIPAMENTO_TAXA_CLIENTE = requisições por segundo admitidas de cada cliente (padrão 0: sem limite)
+#   EQUIPAMENTO_TAXA_TOTEM   = requisições por segundo admitidas para cada totem, somando as consultas
+#                              às suas trancas/bicicletas e os comandos de trancar/destrancar (padrão 20)
+#   EQUIPAMENTO_CONCORRENCIA = requisições em execução simultânea, repartidas por classe de rota (padrão 64)
+#   EQUIPAMENTO_HISTORICO_DIAS = dias de retenção do histórico de status de trancas e bicicletas (padrão 30)
+#   EQUIPAMENTO_DOCS = "0" desliga /docs, /redoc e /openapi.json (padrão 1)
+#   EQUIPAMENTO_OPENAPI = arquivo do esquema OpenAPI pré-gerado (`python -m app.startup openapi.json`),
+#                         carregado na subida em vez de gerado na primeira consulta a /openapi.json;
+#                         é ignorado se for de outra versão do app
+#   EQUIPAMENTO_AQUECER = "1" prepara todas as rotas na subida, para a primeira requisição não pagar
+#                         por isso (padrão 0)
+#   EQUIPAMENTO_PERFIL_INICIO = "1" imprime, ao fim da subida, o tempo de import de cada módulo e de
+#                               cada etapa da inicialização (ver app/startup.py)
+STORAGE = os.getenv("EQUIPAMENTO_STORAGE", "memoria")
+DIRETORIO_DADOS = os.getenv("EQUIPAMENTO_DADOS", "dados")
+FIXTURES = [caminho for caminho in os.getenv("EQUIPAMENTO_FIXTURES", "").split(",") if caminho]
+SNAPSHOT_FIXTURES = "fixtures"
+TAMANHO_BLOCO_IDS = int(os.getenv("EQUIPAMENTO_IDS_BLOCO", "1000"))
+URL_ALUGUEL = os.getenv("EQUIPAMENTO_URL_ALUGUEL", "")
+URL_EXTERNO = os.getenv("EQUIPAMENTO_URL_EXTERNO", "")
+TAXA_CLIENTE = float(os.getenv("EQUIPAMENTO_TAXA_CLIENTE", "0"))
+TAXA_TOTEM = float(os.getenv("EQUIPAMENTO_TAXA_TOTEM", "20"))
+CONCORRENCIA = int(os.getenv("EQUIPAMENTO_CONCORRENCIA", "64"))
+RETENCAO_HISTORICO = float(os.getenv("EQUIPAMENTO_HISTORICO_DIAS", "30")) * 24 * 3600
+DOCUMENTACAO = os.getenv("EQUIPAMENTO_DOCS", "1") != "0"
+OPENAPI = os.getenv("EQUIPAMENTO_OPENAPI", "")
+AQUECER = os.getenv("EQUIPAMENTO_AQUECER", "0") != "0"
+ROTEADORES = (routers.bicicleta_router, routers.tranca_router, routers.totem_router,
+              routers.rede_router, routers.snapshot_router)
+
+def configurar_storage(tipo: str = STORAGE, diretorio: str = DIRETORIO_DADOS):
+    """Seleciona o mecanismo de armazenamento dos serviços."""
+    # Cada armazenamento só é importado se for o escolhido
+    if tipo == "log":
+        from .storage import LogStore
+        configurar_armazenamento(lambda nome, model: LogStore(diretorio, nome, model))
+    elif tipo == "sqlite":
+        os.makedirs(diretorio, exist_ok=True)
+        ids.configurar_alocador(ids.AlocadorIdsCompartilhado(
+            os.path.join(diretorio, "ids.contador"), TAMANHO_BLOCO_IDS))
+        caminho = os.path.join(diretorio, "equipamento.db")
+        from .sqlite_store import SQLiteStore
+        configurar_armazenamento(lambda nome, model: SQLiteStore(caminho, nome, model))
+    elif tipo == "colunar":
+        from .columnar_store import ColumnarStore
+        configurar_armazenamento(lambda _nome, model: ColumnarStore(model))
+    elif tipo != "memoria":
+        raise ValueError(f"Armazenamento desconhecido: {tipo}")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Abre o armazenamento (e carrega as fixtures) e os clientes dos outros serviços na subida; fecha-os no encerramento."""
+    with perfil.etapa("armazenamento"):
+        configurar_storage()
+    configurar_clientes(URL_ALUGUEL, URL_EXTERNO)
+    historico_bicicletas.retencao = historico_trancas.retencao = RETENCAO_HISTORICO
+    if FIXTURES:
+        with perfil.etapa("fixtures"):
+            for caminho in FIXTURES:
+                carregar_fixtures(caminho)
+            salvar_snapshot(SNAPSHOT_FIXTURES)
+    if OPENAPI and DOCUMENTACAO:
+        with perfil.etapa("openapi"):
+            carregar_openapi(app, OPENAPI)
+    if AQUECER:
+        with perfil.etapa("aquecimento"):
+            await aquecer(app, [rota.path for roteador in ROTEADORES for rota in roteador.routes])
+    if perfil.ativo:
+        perfil.parar_imports()
+        # Direto na saída de erro: o uvicorn só configura o log dos próprios loggers
+        print(perfil.relatorio(), file=sys.stderr, flush=True)
+    yield
+    telemetria.parar()
+    await fechar_clientes()
+    fechar_armazenamento()
 
 # Cria a instância da aplicação FastAPI
 app = FastAPI(
     title="API de Equipamentos de Bicicletário",
     description="Microsserviço responsável por gerenciar Bicicletas, Trancas e Totens.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON,
+    openapi_url="/openapi.json" if DOCUMENTACAO else None
 )
 
+@app.exception_handler(ErroOperacao)
+async def tratar_erro_operacao(_request: Request, erro: ErroOperacao):
+    """Converte erros de regra de negócio em respostas HTTP."""
+    return JSONResponse(status_code=erro.status_code, content={"detail": erro.detail})
+
+@app.exception_handler(ConflitoVersao)
+async def tratar_conflito_versao(_request: Request, erro: ConflitoVersao):
+    """Responde 412 quando o If-Match não corresponde à versão atual do item."""
+    return JSONResponse(status_code=412, headers={"ETag": f'"{erro.versao_atual}"'},
+                        content={"detail": f"Versão desatualizada; versão atual: {erro.versao_atual}"})
+
+# Limites de taxa e de concorrência (ver app/admission.py); fica por dentro das métricas,
+# para que as recusas também sejam medidas
+app.add_middleware(AdmissaoMiddleware, taxa_cliente=TAXA_CLIENTE, taxa_totem=TAXA_TOTEM,
+                   concorrencia=CONCORRENCIA, totens_da_tranca=agregados.totens_da_tranca)
+# Latência e status de cada requisição, por rota (ver /metrics)
+app.add_middleware(MetricasMiddleware)
+
 # Inclui os routers de cada recurso na aplicação
-app.include_router(routers.bicicleta_router)
-app.include_router(routers.tranca_router)
-app.include_router(routers.totem_router)
+for roteador in ROTEADORES:
+    app.include_router(roteador)
 
 @app.get("/", tags=["Root"], summary="Endpoint raiz da API")
-def read_root():
+async def read_root():
     """Retorna uma mensagem de boas-vindas."""
     return {"message": "Bem-vindo à API de Equipamentos!"}
 
 @app.get("/restaurarBanco", tags=["Administrativo"], summary="Restaura o banco de dados")
-def get_restaurar_banco():
-    """Restaura o banco de dados para um estado inicial sem dados."""
-    restaurar_banco()
+async def get_restaurar_banco(snapshot: Optional[str] = Query(None, description="Snapshot a restaurar em vez de limpar")):
+    """Restaura o banco de dados para um estado inicial sem dados, ou para o de um snapshot salvo."""
+    telemetria.limpar()
+    if snapshot is None:
+        await executar(restaurar_banco)
+    elif await executar(restaurar_snapshot, snapshot) is None:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado")
     return Response(content="Banco de dados restaurado.", status_code=200)
+
+@app.get("/metrics", tags=["Administrativo"], summary="Métricas no formato do Prometheus")
+async def get_metrics():
+    """Retorna as métricas de requisições, operações, locks e coleções."""
+    return Response(content=registro.expor(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,183 @@
+# app/metrics.py
+"""Módulo contendo as métricas da aplicação, expostas em /metrics no formato texto do Prometheus."""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Limites (em segundos) padrão dos histogramas de latência
+BUCKETS_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Rotulos = Tuple[str, ...]
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Rotulos, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Contador:
+    """Contador monotônico, com um valor por combinação de rótulos."""
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        """Define o nome, a descrição e os nomes dos rótulos da métrica."""
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *rotulos: str, valor: float = 1.0) -> None:
+        """Soma `valor` ao contador dos rótulos informados."""
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0.0) + valor
+
+    def valor(self, *rotulos: str) -> float:
+        """Retorna o valor atual para os rótulos informados."""
+        return self._valores.get(rotulos, 0.0)
+
+    def amostras(self) -> Iterable[str]:
+        """Gera as linhas de amostra no formato do Prometheus."""
+        with self._lock:
+            valores = list(self._valores.items())
+        for rotulos, valor in valores:
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {valor}"
+
+class Histograma:
+    """Histograma cumulativo (buckets, soma e contagem) por combinação de rótulos."""
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        """Define o nome, a descrição, os nomes dos rótulos e os limites dos buckets."""
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(buckets)
+        # Por rótulos: [contagem por bucket (não cumulativa, com +Inf no fim), soma]
+        self._series: Dict[Rotulos, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        """Registra uma observação (ex.: uma duração em segundos)."""
+        posicao = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = ([0] * (len(self.buckets) + 1), [0.0])
+            serie[0][posicao] += 1
+            serie[1][0] += valor
+
+    def contagem(self, *rotulos: str) -> int:
+        """Retorna quantas observações foram registradas para os rótulos."""
+        serie = self._series.get(rotulos)
+        return sum(serie[0]) if serie else 0
+
+    def amostras(self) -> Iterable[str]:
+        """Gera as linhas de amostra (buckets cumulativos, soma e contagem)."""
+        with self._lock:
+            series = [(rotulos, list(contagens), soma[0]) for rotulos, (contagens, soma) in self._series.items()]
+        for rotulos, contagens, soma in series:
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += quantidade
+                le = 'le="%s"' % ("+Inf" if limite == float("inf") else repr(limite))
+                yield f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, le)} {acumulado}"
+            yield f"{self.nome}_sum{_formatar_rotulos(self.rotulos, rotulos)} {soma}"
+            yield f"{self.nome}_count{_formatar_rotulos(self.rotulos, rotulos)} {acumulado}"
+
+class Medidor:
+    """Valor instantâneo calculado no momento da coleta, por uma função que retorna {rótulos: valor}."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str], coletar: Callable[[], Dict[Rotulos, float]]):
+        """Define o nome, a descrição, os nomes dos rótulos e a função de coleta."""
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.coletar = coletar
+
+    def amostras(self) -> Iterable[str]:
+        """Gera as linhas de amostra com os valores atuais."""
+        for rotulos, valor in self.coletar().items():
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {valor}"
+
+class Registro:
+    """Conjunto das métricas expostas pela aplicação."""
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self._metricas: List = []
+
+    def registrar(self, metrica):
+        """Adiciona uma métrica ao registro e a retorna."""
+        self._metricas.append(metrica)
+        return metrica
+
+    def expor(self) -> str:
+        """Retorna todas as métricas no formato texto do Prometheus."""
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.amostras())
+        return "\n".join(linhas) + "\n"
+
+registro = Registro()
+
+duracao_http = registro.registrar(Histograma(
+    "equipamento_http_duracao_segundos", "Latência das requisições HTTP por rota", ("metodo", "rota")))
+requisicoes_http = registro.registrar(Contador(
+    "equipamento_http_requisicoes_total", "Requisições HTTP por rota e status", ("metodo", "rota", "status")))
+duracao_operacoes = registro.registrar(Histograma(
+    "equipamento_operacao_duracao_segundos", "Duração das operações dos serviços", ("colecao", "operacao")))
+espera_locks = registro.registrar(Histograma(
+    "equipamento_lock_espera_segundos", "Tempo de espera pelos locks dos itens", ("colecao",),
+    buckets=(0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)))
+chamadas_externas = registro.registrar(Histograma(
+    "equipamento_externo_duracao_segundos", "Duração das chamadas aos outros microsserviços, por resultado",
+    ("servico", "resultado"), buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+
+def cronometrado(operacao: str):
+    """Decorador que registra a duração de um método do GenericService em duracao_operacoes."""
+    def decorar(metodo):
+        @wraps(metodo)
+        def medir(self, *args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                duracao_operacoes.observar(time.perf_counter() - inicio, self.model.__name__, operacao)
+        return medir
+    return decorar
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede a latência e conta os status de cada requisição, por rota."""
+    def __init__(self, app):
+        """Envolve a aplicação ASGI."""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status: Optional[int] = None
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # O roteador grava a rota encontrada no próprio scope; usa o template para limitar os rótulos
+            rota = getattr(scope.get("route"), "path", "<nao_encontrada>")
+            duracao_http.observar(time.perf_counter() - inicio, scope["method"], rota)
+            requisicoes_http.incrementar(scope["method"], rota, str(status or 500))
@@ -1,18 +1,20 @@
 # app/models.py
 """Módulo contendo os modelos de dados (schemas) da aplicação."""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
 from typing import List, Optional
 from enum import Enum
 
-# Usaremos um gerador de ID sequencial para evitar colisões do random em testes.
-ID_COUNTER = 1
+from . import ids
 
 def generate_id():
-    """Gera um ID sequencial para os modelos."""
-    global ID_COUNTER
-    ID_COUNTER += 1
-    return ID_COUNTER
+    """Gera um ID sequencial para os modelos (seguro entre threads; ver app/ids.py)."""
+    return ids.alocador.proximo()
+
+def reservar_ids_ate(valor: int):
+    """Garante que os próximos IDs gerados sejam maiores que `valor` (ex.: após carregar dados salvos)."""
+    ids.alocador.reservar_ate(valor)
 
 class StatusBicicleta(str, Enum):
     """Enumeração dos possíveis status de uma bicicleta."""
@@ -41,6 +43,16 @@ class AcaoTranca(str, Enum):
     TRANCAR = 'TRANCAR'
     DESTRANCAR = 'DESTRANCAR'
 
+class FormatoListagem(str, Enum):
+    """Enumeração dos formatos de saída das listagens."""
+    JSON = 'json'
+    NDJSON = 'ndjson'
+
+class FormatoExportacao(str, Enum):
+    """Enumeração dos formatos da exportação da frota."""
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
 # --- Modelos para Bicicleta ---
 class NovaBicicleta(BaseModel):
     """Schema para a criação de uma nova bicicleta, sem o ID."""
@@ -51,8 +63,9 @@ class NovaBicicleta(BaseModel):
     status: StatusBicicleta
 
 class Bicicleta(NovaBicicleta):
-    """Schema completo de uma bicicleta, incluindo o ID."""
+    """Schema completo de uma bicicleta, incluindo o ID e a versão."""
     id: int = Field(default_factory=generate_id)
+    versao: int = 1
 
 class BicicletaUpdate(BaseModel):
     """Schema para atualização de uma bicicleta, com campos opcionais."""
@@ -64,19 +77,51 @@ class BicicletaUpdate(BaseModel):
 
 # --- Modelos para Totem ---
 class NovoTotem(BaseModel):
-    """Schema para a criação de um novo totem."""
+    """Schema para a criação de um novo totem, com coordenadas opcionais (graus decimais)."""
     localizacao: str
     descricao: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def _coordenadas_completas(self):
+        """Exige latitude e longitude juntas (ou nenhuma das duas)."""
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude e longitude devem ser informadas juntas")
+        return self
 
 class Totem(NovoTotem):
-    """Schema completo de um totem, incluindo o ID e a lista de trancas."""
+    """Schema completo de um totem, incluindo o ID, a versão e a lista de trancas."""
     id: int = Field(default_factory=generate_id)
+    versao: int = 1
     trancas: List[int] = []
 
 class TotemUpdate(BaseModel):
     """Schema para atualização de um totem, com campos opcionais."""
     localizacao: Optional[str] = None
     descricao: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def _coordenadas_completas(self):
+        """Exige latitude e longitude juntas (ou nenhuma das duas), pois a alteração é aplicada sem nova validação."""
+        informadas = {"latitude", "longitude"} & self.model_fields_set
+        if len(informadas) == 1 or (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude e longitude devem ser informadas juntas")
+        return self
+
+class RecursoProcurado(str, Enum):
+    """Enumeração do que se procura nos totens próximos."""
+    BICICLETA = 'BICICLETA'
+    TRANCA = 'TRANCA'
+
+class TotemProximo(BaseModel):
+    """Schema de um totem encontrado na busca por proximidade, com sua disponibilidade."""
+    totem: Totem
+    distanciaKm: float
+    bicicletasDisponiveis: int
+    trancasLivres: int
 
 # --- Modelos para Tranca ---
 class NovaTranca(BaseModel):
@@ -88,8 +133,9 @@ class NovaTranca(BaseModel):
     status: StatusTranca
 
 class Tranca(NovaTranca):
-    """Schema completo de uma tranca, incluindo o ID e a bicicleta associada."""
+    """Schema completo de uma tranca, incluindo o ID, a versão e a bicicleta associada."""
     id: int = Field(default_factory=generate_id)
+    versao: int = 1
     bicicleta: Optional[int] = None
 
 class TrancaUpdate(BaseModel):
@@ -100,6 +146,21 @@ class TrancaUpdate(BaseModel):
     modelo: Optional[str] = None
     status: Optional[StatusTranca] = None
 
+# --- Modelos para operações em lote ---
+class ReferenciaLote(BaseModel):
+    """Item de uma operação em lote: o ID e, opcionalmente, a versão esperada (como no If-Match)."""
+    id: int
+    versao: Optional[int] = None
+
+class BicicletaUpdateLote(BicicletaUpdate, ReferenciaLote):
+    """Schema de cada item de uma atualização de bicicletas em lote."""
+
+class TotemUpdateLote(TotemUpdate, ReferenciaLote):
+    """Schema de cada item de uma atualização de totens em lote."""
+
+class TrancaUpdateLote(TrancaUpdate, ReferenciaLote):
+    """Schema de cada item de uma atualização de trancas em lote."""
+
 # --- Modelos para Ações Complexas ---
 class IntegracaoBicicletaRede(BaseModel):
     """Schema para os dados necessários para integrar uma bicicleta na rede."""
@@ -124,3 +185,26 @@ class RetiradaTrancaRede(IntegracaoTrancaRede):
 class AcaoTrancar(BaseModel):
     """Schema para o corpo da requisição de trancar uma tranca."""
     bicicleta: Optional[int] = None
+
+# --- Modelos para o histórico de status ---
+class TransicaoBicicleta(BaseModel):
+    """Schema de uma mudança de status de uma bicicleta (`de` é nulo na criação)."""
+    instante: datetime
+    de: Optional[StatusBicicleta] = None
+    para: StatusBicicleta
+
+class TransicaoTranca(BaseModel):
+    """Schema de uma mudança de status (ou da bicicleta presa) de uma tranca."""
+    instante: datetime
+    de: Optional[StatusTranca] = None
+    para: StatusTranca
+    bicicleta: Optional[int] = None
+
+# --- Modelos para a telemetria das trancas ---
+class DivergenciaTelemetria(BaseModel):
+    """Schema de uma tranca cuja bicicleta lida pelo sensor difere da registrada."""
+    idTranca: int
+    bicicletaLida: Optional[int] = None
+    bicicletaRegistrada: Optional[int] = None
+    falhas: int
+    instante: datetime
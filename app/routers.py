@@ -1,224 +1,672 @@
 # app/routers.py
 """Módulo contendo a definição de todos os endpoints da API (rotas)."""
 
-from fastapi import APIRouter, HTTPException, status, Body, Response
-from typing import List, Optional
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+import pydantic_core
+import anyio
+from fastapi import APIRouter, HTTPException, status, Body, Response, Query, Depends, Header, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from operator import itemgetter
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Set, Tuple, Type, TypeVar, Union
+from pydantic import BaseModel, ValidationError
+from .cache import cache_idempotencia, cache_respostas, corresponde, etag_colecao
+from .clients import notificar, validar_funcionario
+from .errors import ErroOperacao
+from .events import Evento, filtro_eventos
+from .export import TIPOS_MIDIA, exportar
+from .serialization import RespostaJSON, juntar_json
+from .snapshots import listar_snapshots, remover_snapshot, restaurar_snapshot, salvar_snapshot
+from .telemetry import ErroLeitura, telemetria
 from .models import (
+    FormatoListagem, FormatoExportacao,
     Bicicleta, NovaBicicleta, BicicletaUpdate, StatusBicicleta,
     Tranca, NovaTranca, TrancaUpdate, StatusTranca, AcaoTranca, AcaoTrancar,
-    Totem, NovoTotem, TotemUpdate,
-    IntegracaoBicicletaRede, RetiradaBicicletaRede, IntegracaoTrancaRede, RetiradaTrancaRede
+    Totem, NovoTotem, TotemUpdate, TotemProximo, RecursoProcurado,
+    ReferenciaLote, BicicletaUpdateLote, TrancaUpdateLote, TotemUpdateLote,
+    IntegracaoBicicletaRede, RetiradaBicicletaRede, IntegracaoTrancaRede, RetiradaTrancaRede,
+    TransicaoBicicleta, TransicaoTranca, DivergenciaTelemetria
 )
-from .services import bicicleta_service, tranca_service, totem_service
+from .services import (
+    SERVICOS, AsyncService, bicicleta_async, tranca_async, totem_async, executar,
+    trancas_do_totem, bicicletas_do_totem, bicicleta_na_tranca, trancar, destrancar, resumo_rede, resumo_totem, feed,
+    integrar_bicicleta, retirar_bicicleta, integrar_tranca, retirar_tranca, totens_proximos,
+    historico_bicicleta, historico_tranca
+)
+
+# --- Listagens paginadas ---
+class ParametrosListagem:
+    """Parâmetros comuns de paginação, projeção e formato das listagens."""
+    def __init__(
+        self,
+        cursor: int = Query(0, ge=0, description="Retorna itens com ID maior que o cursor"),
+        limite: int = Query(100, ge=1, le=1000, description="Quantidade máxima de itens por página"),
+        fields: Optional[str] = Query(None, description="Campos a retornar, separados por vírgula"),
+        formato: FormatoListagem = Query(FormatoListagem.JSON, description="json (página) ou ndjson (stream)"),
+        if_none_match: Optional[str] = Header(None),
+    ):
+        """Inicializa os parâmetros a partir da query string e dos headers."""
+        self.cursor = cursor
+        self.limite = limite
+        self.fields = fields
+        self.formato = formato
+        self.if_none_match = if_none_match
+
+def _campos_projecao(servico: AsyncService, fields: Optional[str]) -> Optional[Set[str]]:
+    """Valida a projeção `fields=` contra os campos do modelo."""
+    if not fields:
+        return None
+    campos = {campo.strip() for campo in fields.split(",") if campo.strip()}
+    invalidos = campos - set(servico.service.model.model_fields)
+    if invalidos:
+        raise HTTPException(status_code=422, detail=f"Campos inválidos: {', '.join(sorted(invalidos))}")
+    return campos
+
+async def _gerar_ndjson(servico: AsyncService, filtros: Dict[str, Hashable], cursor: Optional[int],
+                        tamanho: int, campos: Optional[Set[str]]) -> AsyncIterator[bytes]:
+    """Percorre a coleção página a página, emitindo uma linha JSON por item."""
+    while cursor is not None:
+        itens, cursor = await servico.get_page(cursor, tamanho, filtros)
+        yield b"".join(_serializar(servico, item, campos) + b"\n" for item in itens)
+
+def _serializar(servico: AsyncService, item, campos: Optional[Set[str]] = None) -> bytes:
+    """Serializa um item, reaproveitando o JSON já calculado quando não há projeção."""
+    if campos is None:
+        return servico.service.get_json(item)
+    return item.model_dump_json(include=campos).encode()
+
+def _resposta_item(servico: AsyncService, item) -> Response:
+    """Responde com o JSON já serializado do item e seu ETag."""
+    return RespostaJSON(content=servico.service.get_json(item), headers={"ETag": _etag(item)})
+
+def _resposta_lista(servico: AsyncService, itens) -> Response:
+    """Responde com um array montado a partir do JSON já serializado de cada item."""
+    return RespostaJSON(content=juntar_json(servico.service.get_json(item) for item in itens))
+
+async def _listar(servico: AsyncService, params: ParametrosListagem, **filtros) -> Response:
+    """Monta a resposta de uma listagem paginada, com filtros por índice e projeção."""
+    filtros = {nome: valor for nome, valor in filtros.items() if valor is not None}
+    campos = _campos_projecao(servico, params.fields)
+    if params.formato == FormatoListagem.NDJSON:
+        return StreamingResponse(_gerar_ndjson(servico, filtros, params.cursor, params.limite, campos),
+                                 media_type="application/x-ndjson")
+
+    # A geração é lida antes da página: se houver escrita no meio, a entrada fica
+    # associada a uma geração já superada e nunca é servida do cache.
+    geracao = await servico.get_geracao()
+    etag = etag_colecao(geracao)
+    if corresponde(params.if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    chave = (servico.service.model.__name__, params.cursor, params.limite, params.fields,
+             tuple(sorted(filtros.items())))
+    resposta = cache_respostas.obter(chave, geracao)
+    if resposta is None:
+        itens, proximo = await servico.get_page(params.cursor, params.limite, filtros)
+        corpo = juntar_json(_serializar(servico, item, campos) for item in itens)
+        resposta = (corpo, {"X-Proximo-Cursor": str(proximo)} if proximo is not None else {})
+        cache_respostas.guardar(chave, geracao, resposta)
+    corpo, headers = resposta
+    return RespostaJSON(content=corpo, headers={**headers, "ETag": etag})
+
+async def _obter(servico: AsyncService, item_id: int, if_none_match: Optional[str], nao_encontrado: str) -> Response:
+    """Retorna um item já serializado, respondendo 304 se o cliente tiver a versão atual."""
+    item = await servico.get_by_id(item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail=nao_encontrado)
+    etag = _etag(item)
+    if corresponde(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return _resposta_item(servico, item)
+
+# --- Controle de concorrência otimista (ETag / If-Match) ---
+def _etag(item) -> str:
+    """Retorna o ETag forte de um item, derivado da sua versão."""
+    return f'"{item.versao}"'
+
+def _versao_esperada(if_match: Optional[str]) -> Optional[int]:
+    """Converte o header If-Match na versão esperada (None se ausente ou `*`)."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    valor = if_match.strip().strip('"')
+    if not valor.isdigit():
+        raise HTTPException(status_code=412, detail="If-Match inválido")
+    return int(valor)
+
+async def _atualizar(servico: AsyncService, item_id: int, data: Union[BaseModel, Dict[str, Any]],
+                     if_match: Optional[str], nao_encontrado: str) -> Response:
+    """Atualiza um item respeitando o If-Match e devolve o novo ETag (conflito vira 412 em main.py)."""
+    item = await servico.update(item_id, data, versao=_versao_esperada(if_match))
+    if not item:
+        raise HTTPException(status_code=404, detail=nao_encontrado)
+    return _resposta_item(servico, item)
+
+# --- Operações em lote ---
+M = TypeVar('M', bound=BaseModel)
+
+TAMANHO_MAXIMO_LOTE = 10_000
+
+async def _ler_lote(request: Request, model: Type[M]) -> Tuple[List[Tuple[int, M]], List[Dict[str, Any]]]:
+    """Lê um lote em JSON (array) ou NDJSON e valida todos os itens em uma passada.
+
+    Retorna os itens válidos, com sua posição no lote, e as falhas de validação.
+    """
+    corpo = await request.body()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        brutos: Any = [linha for linha in corpo.splitlines() if linha.strip()]
+        validar: Callable[[Any], M] = model.model_validate_json
+    else:
+        try:
+            brutos = pydantic_core.from_json(corpo)
+        except ValueError:
+            brutos = None
+        if not isinstance(brutos, list):
+            raise HTTPException(status_code=400, detail="O lote deve ser um array JSON ou NDJSON")
+        validar = model.model_validate
+    if len(brutos) > TAMANHO_MAXIMO_LOTE:
+        raise HTTPException(status_code=413, detail=f"O lote excede {TAMANHO_MAXIMO_LOTE} itens")
+    validos: List[Tuple[int, M]] = []
+    falhas: List[Dict[str, Any]] = []
+    for indice, bruto in enumerate(brutos):
+        try:
+            validos.append((indice, validar(bruto)))
+        except ValidationError as erro:
+            falhas.append({"indice": indice, "status": 422,
+                           "detail": erro.errors(include_url=False, include_context=False, include_input=False)})
+    return validos, falhas
+
+def _resposta_lote(aplicados: List[Tuple[int, Any]], falhas: List[Dict[str, Any]], atomico: bool) -> Response:
+    """Monta o relatório por item de um lote.
+
+    Responde 200 se tudo foi aplicado, 207 se parte falhou e 422 se um lote atômico foi rejeitado
+    (nesse caso os itens sem erro aparecem com status 409 e nada é gravado).
+    """
+    if falhas and atomico:
+        resultados = falhas + [{"indice": indice, "status": 409, "detail": "Não aplicado: o lote foi rejeitado"}
+                               for indice, _ in aplicados]
+        status_code, quantidade = 422, 0
+    else:
+        resultados = falhas + [{"indice": indice, "status": 200, "id": item.id, "versao": item.versao}
+                               for indice, item in aplicados]
+        status_code, quantidade = (207 if falhas else 200), len(aplicados)
+    resultados.sort(key=itemgetter("indice"))
+    return RespostaJSON(status_code=status_code,
+                        content={"aplicados": quantidade, "falhas": len(falhas), "resultados": resultados})
+
+async def _criar_lote(servico: AsyncService, request: Request, atomico: bool) -> Response:
+    """Valida e cria um lote de itens, gravando e indexando todos de uma vez."""
+    validos, falhas = await _ler_lote(request, servico.service.create_model)
+    if falhas and atomico:
+        return _resposta_lote(validos, falhas, atomico)
+    criados = await servico.create_many([dado for _, dado in validos])
+    return _resposta_lote([(indice, item) for (indice, _), item in zip(validos, criados)], falhas, atomico)
+
+async def _alterar_lote(servico: AsyncService, request: Request, model: Type[M], atomico: bool,
+                        campos: Callable[[M], Dict[str, Any]]) -> Response:
+    """Valida e aplica um lote de alterações, tomando os locks dos itens uma única vez."""
+    validos, falhas = await _ler_lote(request, model)
+    if falhas and atomico:
+        return _resposta_lote(validos, falhas, atomico)
+    resultados = await servico.update_many([(dado.id, campos(dado), dado.versao) for _, dado in validos], atomico)
+    aplicados = []
+    for (indice, _), resultado in zip(validos, resultados):
+        if isinstance(resultado, ErroOperacao):
+            falhas.append({"indice": indice, "status": resultado.status_code, "detail": resultado.detail})
+        else:
+            aplicados.append((indice, resultado))
+    return _resposta_lote(aplicados, falhas, atomico)
+
+def _campos_alterados(dado: ReferenciaLote) -> Dict[str, Any]:
+    """Extrai de um item do lote apenas os campos informados para alteração."""
+    return dado.model_dump(exclude_unset=True, exclude={"id", "versao"})
+
+def _parametro_atomico() -> Any:
+    """Parâmetro de query que escolhe entre lote atômico e aplicação item a item."""
+    return Query(True, description="Se verdadeiro, nada é gravado quando algum item falha")
+
+# --- Histórico de status ---
+class ParametrosHistorico:
+    """Intervalo de tempo e limite das consultas ao histórico de status."""
+    def __init__(
+        self,
+        desde: Optional[datetime] = Query(None, alias="from", description="Início do intervalo (ISO 8601)"),
+        ate: Optional[datetime] = Query(None, alias="to", description="Fim do intervalo (ISO 8601)"),
+        limite: int = Query(1000, ge=1, le=10_000, description="Quantidade máxima de transições"),
+    ):
+        """Valida os parâmetros do histórico."""
+        if desde is not None and ate is not None and desde > ate:
+            raise HTTPException(status_code=422, detail="`from` deve ser anterior a `to`")
+        self.desde = desde
+        self.ate = ate
+        self.limite = limite
+
+# --- Operações na rede (com Idempotency-Key) ---
+async def _operacao_rede(operacao: str, chave: Optional[str], data: BaseModel, assunto: str,
+                        funcao: Callable[..., Any], *args) -> Response:
+    """Executa uma operação na rede; repetições com a mesma Idempotency-Key devolvem o primeiro resultado.
+
+    O funcionário informado é validado no serviço de aluguel antes da operação e, após
+    ela, avisado por email com o `assunto` (se os serviços estiverem configurados).
+    A chave vale por operação e fica guardada com um resumo do corpo: reutilizá-la com
+    outro corpo é recusado (422). Uma repetição que chega enquanto a original ainda
+    executa aguarda o resultado dela. Só resultados bem-sucedidos ficam guardados; após
+    um erro, a próxima tentativa com a mesma chave executa a operação de novo.
+    """
+    async def realizar() -> bytes:
+        funcionario = await validar_funcionario(data.idFuncionario)
+        corpo = pydantic_core.to_json(await executar(funcao, *args))
+        notificar(funcionario, assunto, corpo.decode())
+        return corpo
+
+    if not chave:
+        return RespostaJSON(content=await realizar())
+    resumo = hashlib.sha256(data.model_dump_json().encode()).hexdigest()
+    entrada = cache_idempotencia.obter((operacao, chave))
+    if entrada is not None:
+        if entrada[0] != resumo:
+            raise HTTPException(status_code=422, detail="Idempotency-Key já usada com outro corpo")
+        corpo = entrada[1]
+        if isinstance(corpo, asyncio.Future):
+            corpo = await asyncio.shield(corpo)
+        return RespostaJSON(content=corpo, headers={"Idempotent-Replayed": "true"})
+
+    pendente = asyncio.get_running_loop().create_future()
+    cache_idempotencia.guardar((operacao, chave), resumo, pendente)
+    try:
+        corpo = await realizar()
+    except BaseException as erro:
+        cache_idempotencia.remover((operacao, chave))
+        pendente.set_exception(erro)
+        pendente.exception()  # marca como lida, mesmo que ninguém esteja aguardando
+        raise
+    cache_idempotencia.guardar((operacao, chave), resumo, corpo)
+    pendente.set_result(corpo)
+    return RespostaJSON(content=corpo)
 
 # --- Router para Bicicleta ---
 bicicleta_router = APIRouter(prefix="/bicicleta", tags=["Equipamento"])
 
 @bicicleta_router.post("/", response_model=Bicicleta, status_code=status.HTTP_200_OK, summary="Cadastrar bicicleta")
-def criar_bicicleta(data: NovaBicicleta):
+async def criar_bicicleta(data: NovaBicicleta):
     """Cria uma nova bicicleta no sistema."""
-    return bicicleta_service.create(data)
+    return _resposta_item(bicicleta_async, await bicicleta_async.create(data))
+
+@bicicleta_router.post("/lote", summary="Cadastrar bicicletas em lote")
+async def criar_bicicletas_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Cria várias bicicletas a partir de um array JSON ou de NDJSON, com relatório por item."""
+    return await _criar_lote(bicicleta_async, request, atomico)
+
+@bicicleta_router.put("/lote", summary="Editar bicicletas em lote")
+async def atualizar_bicicletas_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Atualiza várias bicicletas; cada item traz o `id`, a `versao` esperada (opcional) e os campos."""
+    return await _alterar_lote(bicicleta_async, request, BicicletaUpdateLote, atomico, _campos_alterados)
+
+@bicicleta_router.post("/lote/status/{acao}", summary="Alterar status de bicicletas em lote")
+async def alterar_status_bicicletas_lote(acao: StatusBicicleta, request: Request,
+                                         atomico: bool = _parametro_atomico()):
+    """Altera o status de várias bicicletas; cada item traz o `id` e a `versao` esperada (opcional)."""
+    return await _alterar_lote(bicicleta_async, request, ReferenciaLote, atomico, lambda _: {"status": acao})
 
 @bicicleta_router.get("/", response_model=List[Bicicleta], summary="recupera bicicletas cadastradas")
-def listar_bicicletas():
-    """Retorna uma lista de todas as bicicletas cadastradas."""
-    return bicicleta_service.get_all()
+async def listar_bicicletas(status: Optional[StatusBicicleta] = None, numero: Optional[int] = None,
+                            params: ParametrosListagem = Depends()):
+    """Retorna uma página das bicicletas cadastradas; o cursor seguinte vem em `X-Proximo-Cursor`."""
+    return await _listar(bicicleta_async, params, status=status, numero=numero)
 
 @bicicleta_router.get("/{id_bicicleta}", response_model=Bicicleta, summary="Obter bicicleta")
-def obter_bicicleta(id_bicicleta: int):
+async def obter_bicicleta(id_bicicleta: int, if_none_match: Optional[str] = Header(None)):
     """Obtém os dados de uma bicicleta específica pelo seu ID."""
-    bicicleta = bicicleta_service.get_by_id(id_bicicleta)
-    if not bicicleta:
+    return await _obter(bicicleta_async, id_bicicleta, if_none_match, "Bicicleta não encontrada")
+
+@bicicleta_router.get("/{id_bicicleta}/historico", response_model=List[TransicaoBicicleta],
+                      summary="Histórico de status da bicicleta")
+async def obter_historico_bicicleta(id_bicicleta: int, params: ParametrosHistorico = Depends()):
+    """Retorna as mudanças de status da bicicleta no intervalo, da mais antiga para a mais recente."""
+    historico = await executar(historico_bicicleta, id_bicicleta, params.desde, params.ate, params.limite)
+    if historico is None:
         raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
-    return bicicleta
+    return historico
 
 @bicicleta_router.put("/{id_bicicleta}", response_model=Bicicleta, summary="Editar bicicleta")
-def atualizar_bicicleta(id_bicicleta: int, data: BicicletaUpdate):
-    """Atualiza os dados de uma bicicleta existente."""
-    bicicleta = bicicleta_service.update(id_bicicleta, data)
-    if not bicicleta:
-        raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
-    return bicicleta
+async def atualizar_bicicleta(id_bicicleta: int, data: BicicletaUpdate,
+                              if_match: Optional[str] = Header(None)):
+    """Atualiza os dados de uma bicicleta existente (condicional com If-Match)."""
+    return await _atualizar(bicicleta_async, id_bicicleta, data, if_match, "Bicicleta não encontrada")
 
 @bicicleta_router.delete("/{id_bicicleta}", status_code=status.HTTP_200_OK, summary="Remover bicicleta")
-def deletar_bicicleta(id_bicicleta: int):
+async def deletar_bicicleta(id_bicicleta: int):
     """Remove uma bicicleta do sistema."""
-    if not bicicleta_service.delete(id_bicicleta):
+    if not await bicicleta_async.delete(id_bicicleta):
         raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
     return {"message": "Bicicleta removida com sucesso"}
 
 @bicicleta_router.post("/{id_bicicleta}/status/{acao}", response_model=Bicicleta, summary="Alterar status da bicicleta")
-def alterar_status_bicicleta(id_bicicleta: int, acao: StatusBicicleta):
-    """Altera o status de uma bicicleta."""
-    bicicleta = bicicleta_service.get_by_id(id_bicicleta)
-    if not bicicleta:
-        raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
-    
+async def alterar_status_bicicleta(id_bicicleta: int, acao: StatusBicicleta,
+                                   if_match: Optional[str] = Header(None)):
+    """Altera o status de uma bicicleta (condicional com If-Match)."""
     update_data = BicicletaUpdate(status=acao)
-    updated_bicicleta = bicicleta_service.update(id_bicicleta, update_data)
-    return updated_bicicleta
+    return await _atualizar(bicicleta_async, id_bicicleta, update_data, if_match, "Bicicleta não encontrada")
 
 @bicicleta_router.post("/integrarNaRede", summary="colocar uma bicicleta nova ou retornando de reparo de volta na rede de totens")
-def integrar_bicicleta_na_rede(data: IntegracaoBicicletaRede):
-    """Lógica para integrar a bicicleta na rede."""
-    return {"message": "Integração da bicicleta solicitada.", "data": data}
+async def integrar_bicicleta_na_rede(data: IntegracaoBicicletaRede, idempotency_key: Optional[str] = Header(None)):
+    """Prende uma bicicleta nova ou reparada em uma tranca livre; retorna a bicicleta e a tranca."""
+    return await _operacao_rede("integrar_bicicleta", idempotency_key, data, "Bicicleta integrada na rede",
+                                integrar_bicicleta, data.idBicicleta, data.idTranca)
 
 @bicicleta_router.post("/retirarDaRede", summary="retirar bicicleta para reparo ou aposentadoria")
-def retirar_bicicleta_da_rede(data: RetiradaBicicletaRede):
-    """Lógica para retirar a bicicleta da rede."""
-    return {"message": "Retirada da bicicleta solicitada.", "data": data}
+async def retirar_bicicleta_da_rede(data: RetiradaBicicletaRede, idempotency_key: Optional[str] = Header(None)):
+    """Solta da tranca uma bicicleta com reparo solicitado; retorna a bicicleta e a tranca."""
+    return await _operacao_rede("retirar_bicicleta", idempotency_key, data, "Bicicleta retirada da rede",
+                                retirar_bicicleta, data.idBicicleta, data.idTranca, data.statusAcaoReparador)
 
 # --- Router para Tranca ---
 tranca_router = APIRouter(prefix="/tranca", tags=["Equipamento"])
 
 @tranca_router.post("/", response_model=Tranca, status_code=status.HTTP_200_OK, summary="Cadastrar tranca")
-def criar_tranca(data: NovaTranca):
+async def criar_tranca(data: NovaTranca):
     """Cria uma nova tranca no sistema."""
-    return tranca_service.create(data)
+    return _resposta_item(tranca_async, await tranca_async.create(data))
+
+@tranca_router.post("/lote", summary="Cadastrar trancas em lote")
+async def criar_trancas_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Cria várias trancas a partir de um array JSON ou de NDJSON, com relatório por item."""
+    return await _criar_lote(tranca_async, request, atomico)
+
+@tranca_router.put("/lote", summary="Editar trancas em lote")
+async def atualizar_trancas_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Atualiza várias trancas; cada item traz o `id`, a `versao` esperada (opcional) e os campos."""
+    return await _alterar_lote(tranca_async, request, TrancaUpdateLote, atomico, _campos_alterados)
+
+@tranca_router.post("/lote/status/{acao}", summary="Alterar status de trancas em lote")
+async def alterar_status_trancas_lote(acao: AcaoTranca, request: Request,
+                                      atomico: bool = _parametro_atomico()):
+    """Tranca ou libera várias trancas; cada item traz o `id` e a `versao` esperada (opcional)."""
+    novo_status = StatusTranca.OCUPADA if acao == AcaoTranca.TRANCAR else StatusTranca.LIVRE
+    return await _alterar_lote(tranca_async, request, ReferenciaLote, atomico, lambda _: {"status": novo_status})
 
 @tranca_router.get("/", response_model=List[Tranca], summary="recupera trancas cadastradas")
-def listar_trancas():
-    """Retorna uma lista de todas as trancas cadastradas."""
-    return tranca_service.get_all()
+async def listar_trancas(status: Optional[StatusTranca] = None, numero: Optional[int] = None,
+                         params: ParametrosListagem = Depends()):
+    """Retorna uma página das trancas cadastradas; o cursor seguinte vem em `X-Proximo-Cursor`."""
+    return await _listar(tranca_async, params, status=status, numero=numero)
+
+@tranca_router.post("/telemetria", status_code=status.HTTP_202_ACCEPTED, summary="Receber telemetria das trancas em lote")
+async def receber_telemetria(request: Request):
+    """Enfileira um array de leituras `[idTranca, trancada, idBicicleta, falhas]` para aplicação em segundo plano.
+
+    Responde 503 (com Retry-After) se o buffer não comportar o lote inteiro.
+    """
+    try:
+        aceitas = telemetria.receber(pydantic_core.from_json(await request.body()))
+    except (ValueError, ErroLeitura) as erro:
+        raise HTTPException(status_code=422, detail=str(erro)) from None
+    if aceitas is None:
+        raise HTTPException(status_code=503, detail="Buffer de telemetria cheio", headers={"Retry-After": "1"})
+    return {"aceitas": aceitas}
+
+@tranca_router.get("/telemetria/divergencias", response_model=List[DivergenciaTelemetria],
+                   summary="Trancas cuja bicicleta lida difere da registrada")
+async def listar_divergencias_telemetria():
+    """Retorna as trancas sinalizadas pela telemetria, com a bicicleta lida e a registrada."""
+    return [DivergenciaTelemetria(idTranca=d.id_tranca, bicicletaLida=d.bicicleta_lida,
+                                  bicicletaRegistrada=d.bicicleta_registrada, falhas=d.falhas,
+                                  instante=datetime.fromtimestamp(d.instante, timezone.utc))
+            for d in telemetria.listar_divergencias()]
 
 @tranca_router.get("/{id_tranca}", response_model=Tranca, summary="Obter tranca")
-def obter_tranca(id_tranca: int):
+async def obter_tranca(id_tranca: int, if_none_match: Optional[str] = Header(None)):
     """Obtém os dados de uma tranca específica pelo seu ID."""
-    tranca = tranca_service.get_by_id(id_tranca)
-    if not tranca:
+    return await _obter(tranca_async, id_tranca, if_none_match, "Tranca não encontrada")
+
+@tranca_router.get("/{id_tranca}/historico", response_model=List[TransicaoTranca],
+                   summary="Histórico de status da tranca")
+async def obter_historico_tranca(id_tranca: int, params: ParametrosHistorico = Depends()):
+    """Retorna as mudanças de status (e da bicicleta presa) da tranca no intervalo, da mais antiga para a mais recente."""
+    historico = await executar(historico_tranca, id_tranca, params.desde, params.ate, params.limite)
+    if historico is None:
         raise HTTPException(status_code=404, detail="Tranca não encontrada")
-    return tranca
+    return historico
 
 @tranca_router.put("/{id_tranca}", response_model=Tranca, summary="Editar tranca")
-def atualizar_tranca(id_tranca: int, data: TrancaUpdate):
-    """Atualiza os dados de uma tranca existente."""
-    tranca = tranca_service.update(id_tranca, data)
-    if not tranca:
-        raise HTTPException(status_code=404, detail="Tranca não encontrada")
-    return tranca
+async def atualizar_tranca(id_tranca: int, data: TrancaUpdate,
+                           if_match: Optional[str] = Header(None)):
+    """Atualiza os dados de uma tranca existente (condicional com If-Match)."""
+    return await _atualizar(tranca_async, id_tranca, data, if_match, "Tranca não encontrada")
 
 @tranca_router.delete("/{id_tranca}", status_code=status.HTTP_200_OK, summary="Remover tranca")
-def deletar_tranca(id_tranca: int):
+async def deletar_tranca(id_tranca: int):
     """Remove uma tranca do sistema."""
-    if not tranca_service.delete(id_tranca):
+    if not await tranca_async.delete(id_tranca):
         raise HTTPException(status_code=404, detail="Tranca não encontrada")
     return {"message": "Tranca removida com sucesso"}
 
 @tranca_router.get("/{id_tranca}/bicicleta", response_model=Bicicleta, summary="Obter bicicleta na tranca")
-def obter_bicicleta_na_tranca(id_tranca: int):
+async def obter_bicicleta_na_tranca(id_tranca: int):
     """Obtém os dados da bicicleta que está em uma tranca específica."""
-    tranca = tranca_service.get_by_id(id_tranca)
+    tranca, bicicleta = await executar(bicicleta_na_tranca, id_tranca)
     if not tranca:
         raise HTTPException(status_code=404, detail="Tranca não encontrada")
     if not tranca.bicicleta:
         raise HTTPException(status_code=404, detail="Nenhuma bicicleta nesta tranca")
-    
-    bicicleta = bicicleta_service.get_by_id(tranca.bicicleta)
     if not bicicleta:
          raise HTTPException(status_code=404, detail=f"Bicicleta com id {tranca.bicicleta} não encontrada")
-    return bicicleta
+    return _resposta_item(bicicleta_async, bicicleta)
 
 @tranca_router.post("/{id_tranca}/trancar", response_model=Tranca, summary="Trancar uma tranca, opcionalmente com uma bicicleta")
-def trancar_tranca(id_tranca: int, data: Optional[AcaoTrancar] = None):
+async def trancar_tranca(id_tranca: int, data: Optional[AcaoTrancar] = None,
+                         if_match: Optional[str] = Header(None)):
     """Tranca uma tranca. Se um ID de bicicleta for fornecido, associa-o à tranca."""
-    tranca = tranca_service.get_by_id(id_tranca)
-    if not tranca:
-        raise HTTPException(status_code=404, detail="Tranca não encontrada")
-    if tranca.status == StatusTranca.OCUPADA:
-        raise HTTPException(status_code=422, detail="Tranca já está ocupada")
-
     id_bicicleta = data.bicicleta if data else None
-    
-    tranca.status = StatusTranca.OCUPADA
-    if id_bicicleta:
-        bicicleta = bicicleta_service.get_by_id(id_bicicleta)
-        if not bicicleta:
-            raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
-        tranca.bicicleta = id_bicicleta
-        
-    return tranca_service.update(id_tranca, tranca)
+    tranca = await executar(trancar, id_tranca, id_bicicleta, _versao_esperada(if_match))
+    return _resposta_item(tranca_async, tranca)
 
 
 @tranca_router.post("/{id_tranca}/destrancar", response_model=Tranca, summary="Destrancar uma tranca")
-def destrancar_tranca(id_tranca: int, data: Optional[AcaoTrancar] = None):
+async def destrancar_tranca(id_tranca: int, data: Optional[AcaoTrancar] = None,
+                            if_match: Optional[str] = Header(None)):
     """Destranca uma tranca. Se uma bicicleta estiver associada, ela é removida."""
-    tranca = tranca_service.get_by_id(id_tranca)
-    if not tranca:
-        raise HTTPException(status_code=404, detail="Tranca não encontrada")
-    if tranca.status == StatusTranca.LIVRE:
-        raise HTTPException(status_code=422, detail="Tranca já está livre")
-
     id_bicicleta = data.bicicleta if data else None
-    
-    tranca.status = StatusTranca.LIVRE
-    if id_bicicleta and tranca.bicicleta == id_bicicleta:
-        tranca.bicicleta = None
-        
-    return tranca_service.update(id_tranca, tranca)
+    tranca = await executar(destrancar, id_tranca, id_bicicleta, _versao_esperada(if_match))
+    return _resposta_item(tranca_async, tranca)
 
 @tranca_router.post("/integrarNaRede", summary="colocar uma tranca nova ou retornando de reparo de volta na rede de totens")
-def integrar_tranca_na_rede(data: IntegracaoTrancaRede):
-    """Lógica para integrar a tranca na rede de totens."""
-    return {"message": "Integração da tranca solicitada.", "data": data}
+async def integrar_tranca_na_rede(data: IntegracaoTrancaRede, idempotency_key: Optional[str] = Header(None)):
+    """Instala uma tranca nova ou reparada em um totem; retorna a tranca e o totem."""
+    return await _operacao_rede("integrar_tranca", idempotency_key, data, "Tranca integrada na rede",
+                                integrar_tranca, data.idTranca, data.idTotem)
 
 @tranca_router.post("/retirarDaRede", summary="retirar uma tranca para aposentadoria ou reparo")
-def retirar_tranca_da_rede(data: RetiradaTrancaRede):
-    """Lógica para retirar a tranca da rede de totens."""
-    return {"message": "Retirada da tranca solicitada.", "data": data}
+async def retirar_tranca_da_rede(data: RetiradaTrancaRede, idempotency_key: Optional[str] = Header(None)):
+    """Desinstala de um totem uma tranca sem bicicleta; retorna a tranca e o totem."""
+    return await _operacao_rede("retirar_tranca", idempotency_key, data, "Tranca retirada da rede",
+                                retirar_tranca, data.idTranca, data.idTotem, data.statusAcaoReparador)
 
 @tranca_router.post("/{id_tranca}/status/{acao}", response_model=Tranca, summary="Alterar status da tranca")
-def alterar_status_tranca(id_tranca: int, acao: AcaoTranca):
-    """Altera o status de uma tranca para trancada ou livre."""
-    tranca = tranca_service.get_by_id(id_tranca)
-    if not tranca:
-        raise HTTPException(status_code=404, detail="Tranca não encontrada")
-        
+async def alterar_status_tranca(id_tranca: int, acao: AcaoTranca,
+                                if_match: Optional[str] = Header(None)):
+    """Altera o status de uma tranca para trancada ou livre (condicional com If-Match)."""
     novo_status = StatusTranca.OCUPADA if acao == AcaoTranca.TRANCAR else StatusTranca.LIVRE
     update_data = TrancaUpdate(status=novo_status)
-    return tranca_service.update(id_tranca, update_data)
+    return await _atualizar(tranca_async, id_tranca, update_data, if_match, "Tranca não encontrada")
 
 # --- Router para Totem ---
 totem_router = APIRouter(prefix="/totem", tags=["Equipamento"])
 
 @totem_router.post("/", response_model=Totem, status_code=status.HTTP_200_OK, summary="Incluir totem")
-def criar_totem(data: NovoTotem):
+async def criar_totem(data: NovoTotem):
     """Cria um novo totem no sistema."""
-    return totem_service.create(data)
+    return _resposta_item(totem_async, await totem_async.create(data))
+
+@totem_router.post("/lote", summary="Incluir totens em lote")
+async def criar_totens_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Cria vários totens a partir de um array JSON ou de NDJSON, com relatório por item."""
+    return await _criar_lote(totem_async, request, atomico)
+
+@totem_router.put("/lote", summary="Editar totens em lote")
+async def atualizar_totens_lote(request: Request, atomico: bool = _parametro_atomico()):
+    """Atualiza vários totens; cada item traz o `id`, a `versao` esperada (opcional) e os campos."""
+    return await _alterar_lote(totem_async, request, TotemUpdateLote, atomico, _campos_alterados)
 
 @totem_router.get("/", response_model=List[Totem], summary="recupera totens cadastrados")
-def listar_totens():
-    """Retorna uma lista de todos os totens cadastrados."""
-    return totem_service.get_all()
+async def listar_totens(params: ParametrosListagem = Depends()):
+    """Retorna uma página dos totens cadastrados; o cursor seguinte vem em `X-Proximo-Cursor`."""
+    return await _listar(totem_async, params)
+
+@totem_router.get("/proximos", response_model=List[TotemProximo], summary="Buscar os totens mais próximos de um ponto")
+async def buscar_totens_proximos(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=100, description="Quantidade máxima de totens"),
+    disponivel: Optional[RecursoProcurado] = Query(None, description="Só totens com bicicleta disponível ou tranca livre"),
+    raio_km: Optional[float] = Query(None, gt=0, description="Distância máxima, em km"),
+):
+    """Retorna os totens mais próximos, do mais perto ao mais longe, com bicicletas disponíveis e trancas livres."""
+    return await executar(totens_proximos, latitude, longitude, k, disponivel, raio_km)
 
 @totem_router.get("/{id_totem}", response_model=Totem, summary="Obter totem")
-def obter_totem(id_totem: int):
+async def obter_totem(id_totem: int, if_none_match: Optional[str] = Header(None)):
     """Obtém os dados de um totem específico pelo seu ID."""
-    totem = totem_service.get_by_id(id_totem)
-    if not totem:
-        raise HTTPException(status_code=404, detail="Totem não encontrado")
-    return totem
+    return await _obter(totem_async, id_totem, if_none_match, "Totem não encontrado")
 
 @totem_router.put("/{id_totem}", response_model=Totem, summary="Editar totem")
-def atualizar_totem(id_totem: int, data: NovoTotem):
-    """Atualiza os dados de um totem existente."""
-    totem = totem_service.update(id_totem, data)
-    if not totem:
-        raise HTTPException(status_code=404, detail="Totem não encontrado")
-    return totem
+async def atualizar_totem(id_totem: int, data: NovoTotem,
+                          if_match: Optional[str] = Header(None)):
+    """Atualiza os dados de um totem existente (condicional com If-Match)."""
+    return await _atualizar(totem_async, id_totem, data, if_match, "Totem não encontrado")
 
 @totem_router.delete("/{id_totem}", status_code=status.HTTP_200_OK, summary="Remover totem")
-def deletar_totem(id_totem: int):
+async def deletar_totem(id_totem: int):
     """Remove um totem do sistema."""
-    if not totem_service.delete(id_totem):
+    if not await totem_async.delete(id_totem):
         raise HTTPException(status_code=404, detail="Totem não encontrado")
     return {"message": "Totem removido com sucesso"}
 
+@totem_router.get("/{id_totem}/resumo", summary="Contagens por status das trancas e bicicletas de um totem")
+async def obter_resumo_totem(id_totem: int):
+    """Retorna quantas trancas e bicicletas do totem estão em cada status."""
+    resumo = await executar(resumo_totem, id_totem)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Totem não encontrado")
+    return resumo
+
 @totem_router.get("/{id_totem}/trancas", response_model=List[Tranca], summary="Listar trancas de um totem")
-def listar_trancas_do_totem(id_totem: int):
-    """Retorna as trancas associadas a um totem específico."""
-    return []
+async def listar_trancas_do_totem(id_totem: int, status: Optional[StatusTranca] = None):
+    """Retorna as trancas associadas a um totem específico, opcionalmente filtradas por status."""
+    trancas = await executar(trancas_do_totem, id_totem, status)
+    if trancas is None:
+        raise HTTPException(status_code=404, detail="Totem não encontrado")
+    return _resposta_lista(tranca_async, trancas)
 
 @totem_router.get("/{id_totem}/bicicletas", response_model=List[Bicicleta], summary="Listar bicicletas de um totem")
-def listar_bicicletas_do_totem(id_totem: int):
+async def listar_bicicletas_do_totem(id_totem: int):
     """Retorna as bicicletas disponíveis em um totem específico."""
-    return []
+    bicicletas = await executar(bicicletas_do_totem, id_totem)
+    if bicicletas is None:
+        raise HTTPException(status_code=404, detail="Totem não encontrado")
+    return _resposta_lista(bicicleta_async, bicicletas)
+
+# --- Router para a visão geral da rede ---
+rede_router = APIRouter(prefix="/rede", tags=["Equipamento"])
+
+@rede_router.get("/resumo", summary="Contagens por status de trancas e bicicletas, globais e por totem")
+async def obter_resumo_rede(totens: bool = Query(True, description="Inclui as contagens de cada totem")):
+    """Retorna os contadores mantidos a cada alteração, sem percorrer a frota."""
+    return await executar(resumo_rede, totens)
+
+# --- Feed de alterações (SSE e WebSocket) ---
+TIPOS_EVENTO = {"bicicleta", "tranca", "totem"}
+
+def _ler_tipos(tipo: Optional[str]) -> Optional[Set[str]]:
+    """Converte a lista de tipos separados por vírgula, validando-os (None = todos)."""
+    tipos = {t.strip() for t in tipo.split(",") if t.strip()} if tipo else None
+    if tipos and tipos - TIPOS_EVENTO:
+        raise HTTPException(status_code=422, detail=f"Tipos inválidos: {', '.join(sorted(tipos - TIPOS_EVENTO))}")
+    return tipos
+
+class ParametrosEventos:
+    """Parâmetros de retomada e filtro das assinaturas do feed de alterações."""
+    def __init__(
+        self,
+        since: Optional[int] = Query(None, ge=0, description="Retoma após este número de sequência"),
+        tipo: Optional[str] = Query(None, description="Tipos de item (bicicleta, tranca, totem), separados por vírgula"),
+        totem: Optional[int] = Query(None, description="Apenas alterações relacionadas a este totem"),
+        status: Optional[str] = Query(None, description="Status, separados por vírgula"),
+    ):
+        """Inicializa os parâmetros a partir da query string, validando os tipos."""
+        tipos = _ler_tipos(tipo)
+        status_aceitos = {s.strip() for s in status.split(",") if s.strip()} if status else None
+        self.since = since
+        self.filtro = filtro_eventos(tipos, totem, status_aceitos)
+
+async def _gerar_sse(eventos: AsyncIterator[Optional[Evento]]) -> AsyncIterator[bytes]:
+    """Formata os eventos como Server-Sent Events (o `id` permite retomar com Last-Event-ID)."""
+    async for evento in eventos:
+        if evento is None:
+            yield b": ping\n\n"
+        else:
+            yield b"id: %d\nevent: %s\ndata: %s\n\n" % (evento.seq, evento.operacao.encode(), evento.json())
+
+@rede_router.get("/eventos", summary="Assinar as alterações da rede (Server-Sent Events)")
+async def assinar_eventos(params: ParametrosEventos = Depends(), last_event_id: Optional[str] = Header(None)):
+    """Transmite as alterações por SSE; reconexões retomam por `since` ou pelo header Last-Event-ID."""
+    desde = params.since
+    if desde is None and last_event_id and last_event_id.isdigit():
+        desde = int(last_event_id)
+    return StreamingResponse(_gerar_sse(feed.assinar(desde, params.filtro)), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@rede_router.websocket("/eventos/ws")
+async def assinar_eventos_ws(websocket: WebSocket, params: ParametrosEventos = Depends()):
+    """Transmite as alterações por WebSocket, uma mensagem JSON por evento."""
+    await websocket.accept()
+    async with anyio.create_task_group() as tarefas:
+        async def aguardar_desconexao():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+            tarefas.cancel_scope.cancel()
+
+        tarefas.start_soon(aguardar_desconexao)
+        async for evento in feed.assinar(params.since, params.filtro):
+            if evento is not None:
+                await websocket.send_text(evento.json().decode())
+
+@rede_router.get("/exportar", summary="Exportar a frota em NDJSON ou CSV (streaming)")
+async def exportar_frota(
+    formato: FormatoExportacao = Query(FormatoExportacao.NDJSON),
+    tipo: Optional[str] = Query(None, description="Tipos de item (bicicleta, tranca, totem), separados por vírgula"),
+    gzip: bool = Query(False, description="Compacta o arquivo com gzip"),
+):
+    """Exporta as coleções no estado do início da requisição, item a item, sem bloquear as escritas."""
+    tipos = _ler_tipos(tipo)
+    blocos = await executar(exportar, formato.value, [t for t in SERVICOS if tipos is None or t in tipos], gzip)
+    arquivo = f"frota.{formato.value}" + (".gz" if gzip else "")
+    return StreamingResponse(blocos, media_type="application/gzip" if gzip else TIPOS_MIDIA[formato.value],
+                             headers={"Content-Disposition": f'attachment; filename="{arquivo}"'})
+
+# --- Router para os snapshots nomeados ---
+snapshot_router = APIRouter(prefix="/snapshots", tags=["Administrativo"])
+
+@snapshot_router.get("/", summary="Listar snapshots")
+async def listar_snapshots_salvos():
+    """Retorna os snapshots salvos, com a quantidade de itens de cada coleção."""
+    return [snapshot.resumo() for snapshot in await executar(listar_snapshots)]
+
+@snapshot_router.put("/{nome}", summary="Salvar o estado atual como snapshot")
+async def salvar_snapshot_nomeado(nome: str):
+    """Captura o estado atual (itens, índices e contador de IDs), substituindo um snapshot de mesmo nome."""
+    return (await executar(salvar_snapshot, nome)).resumo()
+
+@snapshot_router.post("/{nome}/restaurar", summary="Restaurar um snapshot")
+async def restaurar_snapshot_nomeado(nome: str):
+    """Volta todas as coleções e o contador de IDs ao estado do snapshot."""
+    snapshot = await executar(restaurar_snapshot, nome)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado")
+    return snapshot.resumo()
+
+@snapshot_router.delete("/{nome}", summary="Remover snapshot")
+async def remover_snapshot_nomeado(nome: str):
+    """Remove um snapshot salvo."""
+    if not await executar(remover_snapshot, nome):
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado")
+    return {"message": "Snapshot removido com sucesso"}
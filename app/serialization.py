@@ -0,0 +1,29 @@
+# app/serialization.py
+"""Módulo contendo a serialização rápida das respostas JSON."""
+
+from typing import Any, Iterable
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+def juntar_json(fragmentos: Iterable[bytes]) -> bytes:
+    """Monta um array JSON a partir de itens já serializados."""
+    return b"[" + b",".join(fragmentos) + b"]"
+
+class RespostaJSON(JSONResponse):
+    """Resposta JSON que aceita bytes já serializados e usa um encoder rápido para o resto.
+
+    Usa orjson quando instalado; caso contrário, o serializador do pydantic-core.
+    """
+    def render(self, content: Any) -> bytes:
+        """Serializa o conteúdo, repassando bytes sem alteração."""
+        if isinstance(content, bytes):
+            return content
+        if orjson is not None:
+            return orjson.dumps(content)
+        return pydantic_core.to_json(content)
@@ -1,66 +1,835 @@
 # app/services.py
 """Módulo contendo a lógica de negócio e o acesso aos dados."""
 
-from typing import Dict, List, Optional, Type, TypeVar, Generic
+import logging
+import threading
+import pydantic_core
+from datetime import datetime, timezone
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from typing import (
+    Any, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type, TypeVar, Generic, Union
+)
+from anyio import CapacityLimiter, to_thread
 from pydantic import BaseModel
-from .models import Bicicleta, NovaBicicleta, Tranca, NovaTranca, Totem, NovoTotem
+from .aggregates import AgregadosRede, contar_do_zero
+from .cache import cache_idempotencia, cache_respostas
+from .concurrency import LocksListrados, VersoesAnteriores, instante_leitura, leitura_consistente, relogio
+from .errors import ConflitoVersao, ErroOperacao
+from .events import FeedAlteracoes
+from .history import HistoricoTransicoes
+from .indexes import Indice, campo, campo_lista
+from .metrics import Medidor, cronometrado, registro
+from .models import (
+    Bicicleta, NovaBicicleta, Tranca, NovaTranca, Totem, NovoTotem, TotemProximo, RecursoProcurado,
+    StatusBicicleta, StatusTranca, StatusAcaoReparador, TransicaoBicicleta, TransicaoTranca, reservar_ids_ate
+)
+from .spatial import IndiceEspacial
+from .storage import MemoryStore
 
 # Tipos genéricos para o serviço
 T = TypeVar('T', bound=BaseModel)
 U = TypeVar('U', bound=BaseModel)
+R = TypeVar('R')
 
-# "Bancos de dados" em memória
-db_bicicletas: Dict[int, Bicicleta] = {}
-db_trancas: Dict[int, Tranca] = {}
-db_totens: Dict[int, Totem] = {}
+logger = logging.getLogger(__name__)
+
+# "Bancos de dados" (em memória por padrão; ver configurar_armazenamento)
+db_bicicletas = MemoryStore()
+db_trancas = MemoryStore()
+db_totens = MemoryStore()
 
 def restaurar_banco():
     """Limpa todos os dados em memória para restaurar o estado inicial."""
-    db_bicicletas.clear()
-    db_trancas.clear()
-    db_totens.clear()
-    print("Banco de dados restaurado para o estado inicial.")
+    bicicleta_service.clear()
+    tranca_service.clear()
+    totem_service.clear()
+    historico_bicicletas.limpar()
+    historico_trancas.limpar()
+    cache_respostas.limpar()
+    cache_idempotencia.limpar()
+    logger.info("Banco de dados restaurado para o estado inicial.")
+
+class EstadoColecao(NamedTuple):
+    """Conteúdo de uma coleção em um instante, com os índices já calculados."""
+    itens: Tuple[BaseModel, ...]
+    ids: Tuple[int, ...]
+    indices: Dict[str, Indice]
 
 class GenericService(Generic[T, U]):
-    """Serviço genérico com operações CRUD para qualquer modelo."""
-    def __init__(self, database: Dict[int, T], model: Type[T], create_model: Type[U]):
+    """Serviço genérico com operações CRUD para qualquer modelo.
+
+    Dentro de `leitura_consistente()` as leituras veem a coleção no instante em que
+    ela começou (ver app/concurrency.py): cada escrita registra antes a versão
+    anterior dos itens e só é carimbada depois de gravada e indexada. A consistência
+    vale dentro do processo; alterações de outros workers (SQLite compartilhado) e as
+    substituições da coleção inteira (clear, restaurar) não têm versões anteriores.
+    """
+    def __init__(self, database: MemoryStore, model: Type[T], create_model: Type[U],
+                 indices: Optional[Dict[str, Indice]] = None):
         """Inicializa o serviço genérico."""
         self.database = database
         self.model = model
         self.create_model = create_model
+        self.indices = indices or {}
+        self.locks = LocksListrados(nome=model.__name__)
+        # JSON já serializado de cada item, junto com a versão que o gerou
+        self._json: Dict[int, Tuple[int, bytes]] = {}
+        # Incrementada a cada escrita na coleção; usada em ETags e no cache de respostas
+        self.geracao = 0
+        # Protege a lista de IDs e os índices, que são alterados por várias threads
+        self._lock_indices = threading.Lock()
+        # IDs em ordem crescente, usados como cursor estável na paginação
+        self._ids: List[int] = []
+        # Chamados com (id, item) a cada gravação e (id, None) a cada remoção, sob _lock_indices
+        self.observadores: List[Callable[[int, Optional[T]], None]] = []
+        # Versões anteriores dos itens alterados, para as leituras consistentes
+        self.versoes = VersoesAnteriores()
+        self._reconstruir_indices()
 
+    @cronometrado("get_all")
     def get_all(self) -> List[T]:
-        """Retorna todos os itens do banco de dados."""
-        return list(self.database.values())
+        """Retorna todos os itens do banco de dados, num mesmo instante."""
+        self._sincronizar()
+        with leitura_consistente() as instante:
+            # Os itens atuais são lidos antes dos registros, que cobrem tudo o que mudou depois do instante
+            itens = list(self.database.values())
+            alterados = self.versoes.alterados(instante)
+        if not alterados:
+            return itens
+        visiveis = [alterados.pop(item.id, item) for item in itens]
+        # O que sobrou foi removido depois do instante (ou ainda está sendo criado)
+        visiveis.extend(alterados.values())
+        return [item for item in visiveis if item is not None]
 
+    @cronometrado("get_by_id")
     def get_by_id(self, item_id: int) -> Optional[T]:
-        """Busca um item pelo seu ID."""
+        """Busca um item pelo seu ID (na versão do instante da leitura consistente, se houver uma)."""
+        self._sincronizar()
+        return self._ler(item_id, instante_leitura())
+
+    def _ler(self, item_id: int, instante: Optional[int]) -> Optional[T]:
+        """Retorna a versão atual do item, ou a do instante informado."""
+        item = self.database.get(item_id)
+        return item if instante is None else self.versoes.visivel(item_id, item, instante)
+
+    def _atual(self, item_id: int) -> Optional[T]:
+        """Retorna a versão atual do item mesmo dentro de uma leitura consistente: é dela que uma escrita parte."""
+        self._sincronizar()
         return self.database.get(item_id)
 
+    def get_geracao(self) -> int:
+        """Retorna a geração atual da coleção, incorporando alterações externas."""
+        self._sincronizar()
+        return self.geracao
+
+    @cronometrado("get_page")
+    def get_page(self, apos: int = 0, limite: int = 100,
+                 filtros: Optional[Dict[str, Hashable]] = None) -> Tuple[List[T], Optional[int]]:
+        """Retorna até `limite` itens com ID maior que `apos` e o cursor da próxima página.
+
+        Os filtros são pares nome do índice/chave; o índice mais seletivo é percorrido
+        e os demais são verificados item a item, sem varrer a coleção inteira. A página
+        é lida num mesmo instante: os itens alterados depois dele entram como candidatos
+        e são conferidos na versão daquele instante.
+        """
+        self._sincronizar()
+        with leitura_consistente() as instante:
+            candidatos = self._ids
+            if filtros:
+                listas = {nome: self.indices[nome].buscar(chave) for nome, chave in filtros.items()}
+                candidatos = listas[min(listas, key=lambda nome: len(listas[nome]))]
+            alterados = self.versoes.alterados(instante)
+            extras = sorted(item_id for item_id in alterados if item_id > apos)
+
+            pagina: List[T] = []
+            ultimo = apos
+            ler, visivel = self.database.get, self.versoes.visivel
+            conferir = [(self.indices[nome].extrator, chave) for nome, chave in (filtros or {}).items()]
+            while len(pagina) < limite:
+                # A lista de candidatos pode mudar enquanto a página é montada: cada rodada lê uma
+                # cópia de um trecho dela, a partir do último ID visto, sem pular nem repetir itens
+                falta = limite - len(pagina)
+                posicao = bisect_right(candidatos, ultimo)
+                trecho = candidatos[posicao:posicao + falta]
+                fim_extras = bisect_right(extras, trecho[-1]) if len(trecho) == falta else len(extras)
+                novos = extras[bisect_right(extras, ultimo):fim_extras]
+                ids = sorted(set(trecho).union(novos)) if novos else trecho
+                if not ids:
+                    break
+                for item_id in ids:
+                    ultimo = item_id
+                    item = alterados[item_id] if item_id in alterados else visivel(item_id, ler(item_id), instante)
+                    if item is not None and (not conferir or all(chave in extrator(item) for extrator, chave in conferir)):
+                        pagina.append(item)
+                        if len(pagina) == limite:
+                            break
+            restantes = bisect_right(candidatos, ultimo) < len(candidatos) or bisect_right(extras, ultimo) < len(extras)
+        cursor = pagina[-1].id if pagina and restantes else None
+        return pagina, cursor
+
+    def get_json(self, item: T) -> bytes:
+        """Retorna o JSON do item, serializando-o apenas se ele mudou desde a última vez."""
+        entrada = self._json.get(item.id)
+        if entrada is not None and entrada[0] == item.versao:
+            return entrada[1]
+        dados = pydantic_core.to_json(item)
+        # Versões antigas (de leituras consistentes) não tomam o lugar da mais recente
+        if entrada is None or entrada[0] < item.versao:
+            self._json[item.id] = (item.versao, dados)
+        return dados
+
+    def find_ids(self, indice: str, chave: Hashable) -> List[int]:
+        """Retorna os IDs dos itens associados à chave em um índice, em ordem crescente."""
+        self._sincronizar()
+        instante = instante_leitura()
+        if instante is None:
+            return self.indices[indice].buscar(chave)
+        # Na leitura consistente, os itens alterados depois do instante são conferidos na versão dele
+        ids = list(self.indices[indice].buscar(chave))
+        alterados = self.versoes.alterados(instante)
+        extrator = self.indices[indice].extrator
+        return sorted({item_id for item_id in ids if item_id not in alterados}
+                      | {item_id for item_id, item in alterados.items()
+                         if item is not None and chave in extrator(item)})
+
+    def find(self, indice: str, chave: Hashable) -> List[T]:
+        """Retorna os itens associados à chave em um índice, sem percorrer a coleção."""
+        instante = instante_leitura()
+        itens = (self._ler(item_id, instante) for item_id in self.find_ids(indice, chave))
+        return [item for item in itens if item is not None]
+
+    @contextmanager
+    def _gravando(self, anteriores: Iterable[Tuple[int, Optional[T]]]) -> Iterator[None]:
+        """Registra as versões anteriores antes da gravação e a confirma (carimba) ao final."""
+        registros = self.versoes.preparar(anteriores)
+        try:
+            yield
+        finally:
+            # Mesmo se a gravação falhar: o registro só repete a versão que continua gravada
+            relogio.confirmar(registros)
+
+    @cronometrado("create")
     def create(self, data: U) -> T:
         """Cria um novo item."""
         novo_item = self.model(**data.model_dump())
-        self.database[novo_item.id] = novo_item
+        with self._gravando([(novo_item.id, None)]):
+            self.database.put(novo_item)
+            self._indexar(novo_item)
         return novo_item
 
-    def update(self, item_id: int, data: BaseModel) -> Optional[T]:
-        """Atualiza um item existente."""
-        item = self.get_by_id(item_id)
-        if not item:
-            return None
-        update_data = data.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(item, key, value)
-        return item
+    @cronometrado("create_many")
+    def create_many(self, dados: List[U]) -> List[T]:
+        """Cria vários itens, gravando-os e indexando-os de uma só vez."""
+        novos = [self.model(**data.model_dump()) for data in dados]
+        with self._gravando((item.id, None) for item in novos):
+            self.database.put_many(novos)
+            self._indexar(*novos)
+        return novos
+
+    def importar(self, itens: List[T]) -> None:
+        """Grava itens completos, mantendo seus IDs (ex.: carregados de fixtures)."""
+        with self._gravando((item.id, self.database.get(item.id)) for item in itens):
+            self.database.put_many(itens)
+            self._indexar(*itens)
+        if itens:
+            reservar_ids_ate(max(item.id for item in itens))
+
+    def capturar(self) -> EstadoColecao:
+        """Retorna o estado atual da coleção. Os itens são compartilhados, pois nunca são alterados no lugar."""
+        self._sincronizar()
+        with self._lock_indices:
+            return EstadoColecao(tuple(self.database.values()), tuple(self._ids),
+                                 {nome: indice.copiar() for nome, indice in self.indices.items()})
+
+    def restaurar(self, estado: EstadoColecao) -> None:
+        """Volta a coleção ao estado capturado, sem recalcular os índices nem notificar cada item.
+
+        Quem mantém estado derivado dos observadores deve restaurá-lo junto (ver app/snapshots.py).
+        """
+        with self._lock_indices:
+            self.database.substituir(list(estado.itens))
+            self.versoes.limpar()
+            self.geracao += 1
+            self._json.clear()
+            self._ids = list(estado.ids)
+            self.indices = {nome: indice.copiar() for nome, indice in estado.indices.items()}
+
+    def travar(self, *item_ids: int):
+        """Context manager que bloqueia os itens para uma sequência de leitura e escrita."""
+        return self.locks.travar(*item_ids)
+
+    @cronometrado("update")
+    def update(self, item_id: int, data: Union[BaseModel, Dict[str, Any]],
+               versao: Optional[int] = None) -> Optional[T]:
+        """Atualiza um item existente, gerando uma nova versão dele.
+
+        Se `versao` for informada, a atualização só ocorre se ela for a versão atual
+        (compare-and-swap); caso contrário lança ConflitoVersao. A gravação confere de
+        novo a versão no armazenamento, o que cobre outros processos sobre o mesmo banco.
+        """
+        update_data = data if isinstance(data, dict) else data.model_dump(exclude_unset=True)
+        with self.locks.travar(item_id):
+            item = self._atual(item_id)
+            if not item:
+                return None
+            if versao is not None and item.versao != versao:
+                raise ConflitoVersao(item.versao)
+            # Cópia na escrita: quem já leu o item continua vendo um estado consistente
+            novo_item = item.model_copy(update={**update_data, "versao": item.versao + 1})
+            with self._gravando([(item_id, item)]):
+                self.database.put_versionado([novo_item], [item.versao])
+                self._indexar(novo_item)
+            return novo_item
+
+    @cronometrado("update_many")
+    def update_many(self, alteracoes: List[Tuple[int, Dict[str, Any], Optional[int]]],
+                    atomico: bool = False) -> List[Union[T, ErroOperacao]]:
+        """Aplica várias alterações (id, campos, versão esperada) tomando os locks uma única vez.
 
+        Retorna, para cada alteração, o novo item ou o erro que a impediu. Com
+        `atomico`, nada é gravado se alguma alteração falhar. Se outro processo gravar
+        um dos itens no meio do caminho, nada é gravado e o conflito é lançado.
+        """
+        resultados: List[Union[T, ErroOperacao]] = []
+        with self.locks.travar(*(item_id for item_id, _, _ in alteracoes)):
+            self._sincronizar()
+            # Estado mais recente de cada item, para alterações repetidas no mesmo lote
+            novos: Dict[int, T] = {}
+            originais: Dict[int, T] = {}
+            for item_id, update_data, versao in alteracoes:
+                item = novos.get(item_id) or originais.setdefault(item_id, self.database.get(item_id))
+                if not item:
+                    resultados.append(ErroOperacao(404, "Item não encontrado"))
+                elif versao is not None and item.versao != versao:
+                    resultados.append(ErroOperacao(412, f"Versão desatualizada; versão atual: {item.versao}"))
+                else:
+                    novos[item_id] = item.model_copy(update={**update_data, "versao": item.versao + 1})
+                    resultados.append(novos[item_id])
+            if atomico and any(isinstance(resultado, ErroOperacao) for resultado in resultados):
+                return resultados
+            with self._gravando((item_id, originais[item_id]) for item_id in novos):
+                self.database.put_versionado(list(novos.values()), [originais[item_id].versao for item_id in novos])
+                self._indexar(*novos.values())
+        return resultados
+
+    @cronometrado("delete")
     def delete(self, item_id: int) -> bool:
         """Deleta um item. Retorna True se bem-sucedido."""
-        if item_id in self.database:
-            del self.database[item_id]
-            return True
-        return False
+        self._sincronizar()
+        with self.locks.travar(item_id):
+            anterior = self.database.get(item_id)
+            if anterior is None:
+                return False
+            with self._gravando([(item_id, anterior)]):
+                removido = self.database.delete(item_id)
+                if removido:
+                    self._desindexar(item_id)
+            return removido
+
+    def clear(self) -> None:
+        """Remove todos os itens e limpa os índices."""
+        self.database.clear()
+        self.versoes.limpar()
+        with self._lock_indices:
+            self.geracao += 1
+            self._json.clear()
+            self._notificar_remocoes(self._ids)
+            self._ids.clear()
+            for indice in self.indices.values():
+                indice.limpar()
+
+    def usar_store(self, database: MemoryStore) -> None:
+        """Troca o armazenamento do serviço e reconstrói os índices a partir dele."""
+        self.database = database
+        self._reconstruir_indices()
+
+    def _reconstruir_indices(self) -> None:
+        """Recalcula a lista de IDs e os índices a partir do conteúdo do armazenamento."""
+        self.versoes.limpar()
+        with self._lock_indices:
+            self.geracao += 1
+            self._json.clear()
+            self._notificar_remocoes(self._ids)
+            self._ids = sorted(item.id for item in self.database.values())
+            for indice in self.indices.values():
+                indice.limpar()
+                for item in self.database.values():
+                    indice.atualizar(item.id, item)
+            for item in self.database.values():
+                for observador in self.observadores:
+                    observador(item.id, item)
+        if self._ids:
+            reservar_ids_ate(self._ids[-1])
+
+    def _sincronizar(self) -> None:
+        """Atualiza IDs e índices com as alterações feitas por outros processos."""
+        if not self.database.compartilhado:
+            return
+        alterados = self.database.sincronizar()
+        if alterados is None:
+            self._reconstruir_indices()
+            return
+        for item_id in alterados:
+            item = self.database.get(item_id)
+            if item is None:
+                self._desindexar(item_id)
+            else:
+                self._indexar(item)
+                reservar_ids_ate(item_id)
+
+    def _indexar(self, *itens: T) -> None:
+        """Registra o ID de cada item (se novo) e atualiza suas entradas nos índices."""
+        with self._lock_indices:
+            self.geracao += 1
+            for item in itens:
+                self._json.pop(item.id, None)
+                posicao = bisect_left(self._ids, item.id)
+                if posicao == len(self._ids) or self._ids[posicao] != item.id:
+                    self._ids.insert(posicao, item.id)
+                for indice in self.indices.values():
+                    indice.atualizar(item.id, item)
+                for observador in self.observadores:
+                    observador(item.id, item)
+
+    def _desindexar(self, item_id: int) -> None:
+        """Remove o ID do item e suas entradas nos índices."""
+        with self._lock_indices:
+            self.geracao += 1
+            self._json.pop(item_id, None)
+            posicao = bisect_left(self._ids, item_id)
+            if posicao < len(self._ids) and self._ids[posicao] == item_id:
+                del self._ids[posicao]
+            for indice in self.indices.values():
+                indice.remover(item_id)
+            for observador in self.observadores:
+                observador(item_id, None)
+
+    def _notificar_remocoes(self, item_ids: List[int]) -> None:
+        """Avisa os observadores da remoção de vários itens. Deve ser chamado sob _lock_indices."""
+        for item_id in item_ids:
+            for observador in self.observadores:
+                observador(item_id, None)
 
 # Instâncias dos serviços específicos, herdando do genérico
-bicicleta_service = GenericService(db_bicicletas, Bicicleta, NovaBicicleta)
-tranca_service = GenericService(db_trancas, Tranca, NovaTranca)
-totem_service = GenericService(db_totens, Totem, NovoTotem)
\ No newline at end of file
+bicicleta_service = GenericService(db_bicicletas, Bicicleta, NovaBicicleta, indices={
+    "status": Indice(campo("status")),
+    "numero": Indice(campo("numero")),
+})
+tranca_service = GenericService(db_trancas, Tranca, NovaTranca, indices={
+    "status": Indice(campo("status")),
+    "numero": Indice(campo("numero")),
+    "bicicleta": Indice(campo("bicicleta")),
+})
+totem_service = GenericService(db_totens, Totem, NovoTotem, indices={
+    "trancas": Indice(campo_lista("trancas")),
+})
+
+# Serviço de cada tipo de item, pelo nome usado em fixtures, exportações e eventos
+SERVICOS: Dict[str, GenericService] = {"bicicleta": bicicleta_service, "tranca": tranca_service, "totem": totem_service}
+
+# Contadores por status da rede, mantidos a cada alteração dos serviços
+agregados = AgregadosRede()
+bicicleta_service.observadores.append(agregados.bicicleta_alterada)
+tranca_service.observadores.append(agregados.tranca_alterada)
+totem_service.observadores.append(agregados.totem_alterado)
+
+# Coordenadas dos totens, para as buscas por proximidade
+indice_espacial = IndiceEspacial()
+totem_service.observadores.append(indice_espacial.totem_alterado)
+
+# Histórico das mudanças de status (e da bicicleta presa em cada tranca)
+historico_bicicletas = HistoricoTransicoes(StatusBicicleta)
+historico_trancas = HistoricoTransicoes(StatusTranca, relacionado="bicicleta")
+bicicleta_service.observadores.append(historico_bicicletas.item_alterado)
+tranca_service.observadores.append(historico_trancas.item_alterado)
+
+# Tamanho das coleções e distribuição por status, calculados na coleta de /metrics
+registro.registrar(Medidor(
+    "equipamento_colecao_itens", "Quantidade de itens por coleção", ("colecao",),
+    lambda: {(servico.model.__name__,): len(servico.database)
+             for servico in (bicicleta_service, tranca_service, totem_service)}))
+registro.registrar(Medidor(
+    "equipamento_versoes_anteriores", "Itens com versões anteriores retidas para leituras consistentes",
+    ("colecao",), lambda: {(servico.model.__name__,): len(servico.versoes)
+                           for servico in (bicicleta_service, tranca_service, totem_service)}))
+registro.registrar(Medidor(
+    "equipamento_status_itens", "Quantidade de trancas e bicicletas por status", ("colecao", "status"),
+    lambda: {(colecao, status): quantidade for colecao, contagens in agregados.resumo(totens=False).items()
+             for status, quantidade in contagens.items()}))
+
+# Feed de alterações, assinável por SSE/WebSocket; registrado depois dos agregados,
+# que já refletem a alteração quando os totens relacionados são consultados
+feed = FeedAlteracoes()
+bicicleta_service.observadores.append(
+    lambda item_id, item: feed.publicar("bicicleta", item_id, item, agregados.totens_da_bicicleta(item_id)))
+tranca_service.observadores.append(
+    lambda item_id, item: feed.publicar("tranca", item_id, item, agregados.totens_da_tranca(item_id)))
+totem_service.observadores.append(
+    lambda item_id, item: feed.publicar("totem", item_id, item, (item_id,)))
+
+def configurar_armazenamento(fabrica: Callable[[str, Type[BaseModel]], MemoryStore]) -> None:
+    """Substitui o armazenamento de todos os serviços pelo criado por `fabrica(nome, model)`."""
+    global db_bicicletas, db_trancas, db_totens
+    for nome, service in (("bicicletas", bicicleta_service), ("trancas", tranca_service), ("totens", totem_service)):
+        service.database.close()
+        service.usar_store(fabrica(nome, service.model))
+    db_bicicletas, db_trancas, db_totens = bicicleta_service.database, tranca_service.database, totem_service.database
+
+def fechar_armazenamento() -> None:
+    """Fecha o armazenamento de todos os serviços, sincronizando dados pendentes."""
+    for service in (bicicleta_service, tranca_service, totem_service):
+        service.database.close()
+
+# --- Consultas de relacionamento (custo proporcional ao resultado; cada uma vê um único instante) ---
+def trancas_do_totem(id_totem: int, status: Optional[StatusTranca] = None) -> Optional[List[Tranca]]:
+    """Retorna as trancas de um totem, opcionalmente filtradas por status. None se o totem não existir."""
+    with leitura_consistente():
+        totem = totem_service.get_by_id(id_totem)
+        if not totem:
+            return None
+        trancas = [tranca_service.get_by_id(id_tranca) for id_tranca in totem.trancas]
+    return [t for t in trancas if t is not None and (status is None or t.status == status)]
+
+def bicicletas_do_totem(id_totem: int) -> Optional[List[Bicicleta]]:
+    """Retorna as bicicletas presas nas trancas de um totem. None se o totem não existir."""
+    with leitura_consistente():
+        trancas = trancas_do_totem(id_totem)
+        if trancas is None:
+            return None
+        bicicletas = [bicicleta_service.get_by_id(t.bicicleta) for t in trancas if t.bicicleta is not None]
+    return [b for b in bicicletas if b is not None]
+
+def bicicleta_na_tranca(id_tranca: int) -> Tuple[Optional[Tranca], Optional[Bicicleta]]:
+    """Retorna a tranca e a bicicleta presa nela (None no lugar de cada uma que não existir)."""
+    with leitura_consistente():
+        tranca = tranca_service.get_by_id(id_tranca)
+        if tranca is None or tranca.bicicleta is None:
+            return tranca, None
+        return tranca, bicicleta_service.get_by_id(tranca.bicicleta)
+
+def tranca_da_bicicleta(id_bicicleta: int) -> Optional[Tranca]:
+    """Retorna a tranca em que a bicicleta está presa, se houver."""
+    with leitura_consistente():
+        ids = tranca_service.find_ids("bicicleta", id_bicicleta)
+        return tranca_service.get_by_id(ids[0]) if ids else None
+
+def totem_da_tranca(id_tranca: int) -> Optional[Totem]:
+    """Retorna o totem ao qual a tranca está vinculada, se houver."""
+    with leitura_consistente():
+        ids = totem_service.find_ids("trancas", id_tranca)
+        return totem_service.get_by_id(ids[0]) if ids else None
+
+# --- Resumo da rede (contadores agregados) ---
+def resumo_rede(totens: bool = True) -> Dict[str, Any]:
+    """Retorna as contagens por status da rede, incorporando antes as alterações externas."""
+    for service in (bicicleta_service, tranca_service, totem_service):
+        service.get_geracao()
+    return agregados.resumo(totens)
+
+def resumo_totem(id_totem: int) -> Optional[Dict[str, Dict[str, int]]]:
+    """Retorna as contagens por status de um totem. None se o totem não existir."""
+    for service in (bicicleta_service, tranca_service, totem_service):
+        service.get_geracao()
+    return agregados.resumo_totem(id_totem)
+
+def totens_proximos(latitude: float, longitude: float, k: int = 5, recurso: Optional[RecursoProcurado] = None,
+                    raio_km: Optional[float] = None) -> List[TotemProximo]:
+    """Retorna os k totens mais próximos do ponto, opcionalmente só os com bicicleta disponível ou tranca livre."""
+    for service in (bicicleta_service, tranca_service, totem_service):
+        service.get_geracao()
+    aceitar = None
+    if recurso is not None:
+        posicao = 0 if recurso == RecursoProcurado.BICICLETA else 1
+        aceitar = lambda id_totem: agregados.disponibilidade(id_totem)[posicao] > 0
+    resultado = []
+    for distancia, id_totem in indice_espacial.proximos(latitude, longitude, k, aceitar, raio_km):
+        totem = totem_service.get_by_id(id_totem)
+        if totem is None:
+            continue
+        bicicletas, trancas = agregados.disponibilidade(id_totem)
+        resultado.append(TotemProximo(totem=totem, distanciaKm=round(distancia, 3),
+                                      bicicletasDisponiveis=bicicletas, trancasLivres=trancas))
+    return resultado
+
+# --- Histórico de status ---
+def _consultar_historico(historico: HistoricoTransicoes, servico: GenericService, item_id: int,
+                         desde: Optional[datetime], ate: Optional[datetime], limite: Optional[int]):
+    """Retorna as transições do item no intervalo, ou None se ele não existir nem tiver histórico."""
+    servico.get_geracao()
+    if not historico.possui(item_id) and servico.get_by_id(item_id) is None:
+        return None
+    return historico.consultar(item_id, desde.timestamp() if desde else None,
+                               ate.timestamp() if ate else None, limite)
+
+def historico_bicicleta(id_bicicleta: int, desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                        limite: Optional[int] = None) -> Optional[List[TransicaoBicicleta]]:
+    """Retorna as mudanças de status da bicicleta entre `desde` e `ate`. None se ela não for conhecida."""
+    transicoes = _consultar_historico(historico_bicicletas, bicicleta_service, id_bicicleta, desde, ate, limite)
+    if transicoes is None:
+        return None
+    return [TransicaoBicicleta(instante=datetime.fromtimestamp(t.instante, timezone.utc), de=t.de, para=t.para)
+            for t in transicoes]
+
+def historico_tranca(id_tranca: int, desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                     limite: Optional[int] = None) -> Optional[List[TransicaoTranca]]:
+    """Retorna as mudanças de status (e de bicicleta) da tranca entre `desde` e `ate`. None se ela não for conhecida."""
+    transicoes = _consultar_historico(historico_trancas, tranca_service, id_tranca, desde, ate, limite)
+    if transicoes is None:
+        return None
+    return [TransicaoTranca(instante=datetime.fromtimestamp(t.instante, timezone.utc), de=t.de, para=t.para,
+                            bicicleta=t.relacionado) for t in transicoes]
+
+def conferir_agregados() -> Dict[Hashable, Tuple[int, int]]:
+    """Recalcula os contadores do zero e retorna as divergências (vazio se estiverem corretos)."""
+    esperado = contar_do_zero(bicicleta_service.get_all(), tranca_service.get_all(), totem_service.get_all())
+    return agregados.divergencias(esperado)
+
+# --- Operações de trancamento (verificação e escrita sob o lock da tranca) ---
+def trancar(id_tranca: int, id_bicicleta: Optional[int] = None, versao: Optional[int] = None) -> Tranca:
+    """Tranca uma tranca livre, opcionalmente associando uma bicicleta a ela."""
+    with tranca_service.travar(id_tranca):
+        tranca = tranca_service._atual(id_tranca)
+        if not tranca:
+            raise ErroOperacao(404, "Tranca não encontrada")
+        if tranca.status == StatusTranca.OCUPADA:
+            raise ErroOperacao(422, "Tranca já está ocupada")
+        alteracoes: Dict[str, Any] = {"status": StatusTranca.OCUPADA}
+        if id_bicicleta:
+            if not bicicleta_service._atual(id_bicicleta):
+                raise ErroOperacao(404, "Bicicleta não encontrada")
+            alteracoes["bicicleta"] = id_bicicleta
+        return tranca_service.update(id_tranca, alteracoes, versao=versao)
+
+def destrancar(id_tranca: int, id_bicicleta: Optional[int] = None, versao: Optional[int] = None) -> Tranca:
+    """Destranca uma tranca, desassociando a bicicleta informada se for a que está nela."""
+    with tranca_service.travar(id_tranca):
+        tranca = tranca_service._atual(id_tranca)
+        if not tranca:
+            raise ErroOperacao(404, "Tranca não encontrada")
+        if tranca.status == StatusTranca.LIVRE:
+            raise ErroOperacao(422, "Tranca já está livre")
+        alteracoes: Dict[str, Any] = {"status": StatusTranca.LIVRE}
+        if id_bicicleta and tranca.bicicleta == id_bicicleta:
+            alteracoes["bicicleta"] = None
+        return tranca_service.update(id_tranca, alteracoes, versao=versao)
+
+# --- Transações entre coleções ---
+class Transacao:
+    """Leitura e alteração de itens de várias coleções como uma unidade.
+
+    Os locks de todos os itens envolvidos são tomados na entrada, coleção a coleção
+    em ordem fixa (pelo nome do modelo), o que evita deadlock entre transações. As
+    alterações ficam pendentes até o fim do bloco `with`: se ele terminar sem erro,
+    todas são gravadas e só então indexadas e notificadas; se alguma gravação falhar,
+    as já feitas são desfeitas com as versões anteriores dos itens. Todas as gravações
+    recebem o mesmo carimbo, então uma leitura consistente vê a transação inteira ou nada dela.
+    """
+    def __init__(self, itens: Dict[GenericService, Iterable[int]]):
+        """Define os IDs, por serviço, que a transação pode ler e alterar."""
+        self._itens = {servico: tuple(ids) for servico, ids in itens.items()}
+        self._locks = ExitStack()
+        self._originais: Dict[Tuple[GenericService, int], Optional[BaseModel]] = {}
+        self._novos: Dict[Tuple[GenericService, int], BaseModel] = {}
+
+    def __enter__(self) -> "Transacao":
+        for servico in sorted(self._itens, key=lambda s: s.model.__name__):
+            self._locks.enter_context(servico.travar(*self._itens[servico]))
+        return self
+
+    def __exit__(self, tipo, _erro, _rastro) -> bool:
+        try:
+            if tipo is None:
+                self._confirmar()
+        finally:
+            self._locks.close()
+        return False
+
+    def ler(self, servico: GenericService[T, Any], item_id: int) -> Optional[T]:
+        """Retorna o item como está na transação, já com as alterações pendentes."""
+        chave = (servico, item_id)
+        if chave in self._novos:
+            return self._novos[chave]
+        if chave not in self._originais:
+            if item_id not in self._itens.get(servico, ()):
+                raise ValueError(f"{servico.model.__name__} {item_id} não faz parte da transação")
+            self._originais[chave] = servico._atual(item_id)
+        return self._originais[chave]
+
+    def alterar(self, servico: GenericService[T, Any], item_id: int, alteracoes: Dict[str, Any]) -> T:
+        """Registra uma nova versão do item, gravada apenas na confirmação da transação."""
+        item = self.ler(servico, item_id)
+        if item is None:
+            raise ErroOperacao(404, f"{servico.model.__name__} não encontrado(a)")
+        original = self._originais[(servico, item_id)]
+        novo = item.model_copy(update={**alteracoes, "versao": original.versao + 1})
+        self._novos[(servico, item_id)] = novo
+        return novo
+
+    def _confirmar(self) -> None:
+        """Grava as alterações pendentes de cada serviço; desfaz todas se alguma gravação falhar."""
+        por_servico: Dict[GenericService, List[BaseModel]] = {}
+        for (servico, _), novo in self._novos.items():
+            por_servico.setdefault(servico, []).append(novo)
+        registros = [registro for servico, novos in por_servico.items()
+                     for registro in servico.versoes.preparar((n.id, self._originais[(servico, n.id)]) for n in novos)]
+        tentados: List[GenericService] = []
+        try:
+            try:
+                for servico, novos in por_servico.items():
+                    tentados.append(servico)
+                    servico.database.put_versionado(novos, [self._originais[(servico, n.id)].versao for n in novos])
+            except Exception as erro:
+                if isinstance(erro, (ConflitoVersao, ErroOperacao)):
+                    # Num conflito, nada foi gravado no serviço que falhou; desfazê-lo apagaria a escrita do outro processo
+                    tentados.pop()
+                for servico in reversed(tentados):
+                    try:
+                        servico.database.put_many([self._originais[(servico, n.id)] for n in por_servico[servico]])
+                    except Exception:  # segue desfazendo os demais serviços
+                        logger.exception("Falha ao desfazer a transação em %s", servico.model.__name__)
+                raise
+            for servico, novos in por_servico.items():
+                servico._indexar(*novos)
+        finally:
+            relogio.confirmar(registros)
+
+def _exigir(item: Optional[T], mensagem: str) -> T:
+    """Retorna o item, ou lança ErroOperacao 404 com a mensagem se ele não existir."""
+    if item is None:
+        raise ErroOperacao(404, mensagem)
+    return item
+
+# Status a partir dos quais um equipamento pode entrar na rede (novo ou voltando de reparo)
+STATUS_INTEGRACAO_BICICLETA = {StatusBicicleta.NOVA, StatusBicicleta.EM_REPARO}
+STATUS_INTEGRACAO_TRANCA = {StatusTranca.NOVA, StatusTranca.EM_REPARO}
+
+def integrar_bicicleta(id_bicicleta: int, id_tranca: int) -> Dict[str, BaseModel]:
+    """Prende uma bicicleta nova ou reparada em uma tranca livre, tornando-a disponível."""
+    with Transacao({bicicleta_service: [id_bicicleta], tranca_service: [id_tranca]}) as transacao:
+        bicicleta = _exigir(transacao.ler(bicicleta_service, id_bicicleta), "Bicicleta não encontrada")
+        tranca = _exigir(transacao.ler(tranca_service, id_tranca), "Tranca não encontrada")
+        if bicicleta.status not in STATUS_INTEGRACAO_BICICLETA:
+            raise ErroOperacao(422, f"Bicicleta com status {bicicleta.status.value} não pode ser integrada na rede")
+        if tranca.status != StatusTranca.LIVRE or tranca.bicicleta is not None:
+            raise ErroOperacao(422, "Tranca não está livre")
+        return {
+            "bicicleta": transacao.alterar(bicicleta_service, id_bicicleta, {"status": StatusBicicleta.DISPONIVEL}),
+            "tranca": transacao.alterar(tranca_service, id_tranca,
+                                        {"status": StatusTranca.OCUPADA, "bicicleta": id_bicicleta}),
+        }
+
+def retirar_bicicleta(id_bicicleta: int, id_tranca: int, acao: StatusAcaoReparador) -> Dict[str, BaseModel]:
+    """Solta da tranca uma bicicleta com reparo solicitado, enviando-a para reparo ou aposentadoria."""
+    with Transacao({bicicleta_service: [id_bicicleta], tranca_service: [id_tranca]}) as transacao:
+        bicicleta = _exigir(transacao.ler(bicicleta_service, id_bicicleta), "Bicicleta não encontrada")
+        tranca = _exigir(transacao.ler(tranca_service, id_tranca), "Tranca não encontrada")
+        if tranca.bicicleta != id_bicicleta:
+            raise ErroOperacao(422, "Bicicleta não está presa nesta tranca")
+        if bicicleta.status != StatusBicicleta.REPARO_SOLICITADO:
+            raise ErroOperacao(422, "Bicicleta não está com reparo solicitado")
+        return {
+            "bicicleta": transacao.alterar(bicicleta_service, id_bicicleta, {"status": StatusBicicleta(acao.value)}),
+            "tranca": transacao.alterar(tranca_service, id_tranca, {"status": StatusTranca.LIVRE, "bicicleta": None}),
+        }
+
+def integrar_tranca(id_tranca: int, id_totem: int) -> Dict[str, BaseModel]:
+    """Instala uma tranca nova ou reparada em um totem, tornando-a livre."""
+    with Transacao({tranca_service: [id_tranca], totem_service: [id_totem]}) as transacao:
+        tranca = _exigir(transacao.ler(tranca_service, id_tranca), "Tranca não encontrada")
+        totem = _exigir(transacao.ler(totem_service, id_totem), "Totem não encontrado")
+        if tranca.status not in STATUS_INTEGRACAO_TRANCA:
+            raise ErroOperacao(422, f"Tranca com status {tranca.status.value} não pode ser integrada na rede")
+        if totem_service.find_ids("trancas", id_tranca):
+            raise ErroOperacao(422, "Tranca já está instalada em um totem")
+        return {
+            "tranca": transacao.alterar(tranca_service, id_tranca, {"status": StatusTranca.LIVRE}),
+            "totem": transacao.alterar(totem_service, id_totem, {"trancas": [*totem.trancas, id_tranca]}),
+        }
+
+def retirar_tranca(id_tranca: int, id_totem: int, acao: StatusAcaoReparador) -> Dict[str, BaseModel]:
+    """Desinstala de um totem uma tranca sem bicicleta, enviando-a para reparo ou aposentadoria."""
+    with Transacao({tranca_service: [id_tranca], totem_service: [id_totem]}) as transacao:
+        tranca = _exigir(transacao.ler(tranca_service, id_tranca), "Tranca não encontrada")
+        totem = _exigir(transacao.ler(totem_service, id_totem), "Totem não encontrado")
+        if id_tranca not in totem.trancas:
+            raise ErroOperacao(422, "Tranca não está instalada neste totem")
+        if tranca.bicicleta is not None:
+            raise ErroOperacao(422, "Tranca está com uma bicicleta presa")
+        return {
+            "tranca": transacao.alterar(tranca_service, id_tranca, {"status": StatusTranca(acao.value)}),
+            "totem": transacao.alterar(totem_service, id_totem,
+                                       {"trancas": [t for t in totem.trancas if t != id_tranca]}),
+        }
+
+# --- Caminho assíncrono ---
+_limitador_executor: Optional[CapacityLimiter] = None
+TAMANHO_EXECUTOR = 32
+
+def armazenamento_bloqueante() -> bool:
+    """Indica se algum serviço usa um armazenamento com I/O bloqueante."""
+    return any(s.database.bloqueante for s in (bicicleta_service, tranca_service, totem_service))
+
+async def executar(funcao: Callable[..., R], *args, bloqueante: Optional[bool] = None, **kwargs) -> R:
+    """Executa uma operação de serviço a partir do event loop.
+
+    Com armazenamento em memória a operação roda direto no loop (não há I/O); com
+    armazenamento bloqueante ela roda em um executor dedicado, limitado a
+    TAMANHO_EXECUTOR threads. Cada operação é síncrona por inteiro, então as
+    sequências de leitura e escrita feitas sob lock nunca são intercaladas no loop.
+    """
+    global _limitador_executor
+    if not (armazenamento_bloqueante() if bloqueante is None else bloqueante):
+        return funcao(*args, **kwargs)
+    if _limitador_executor is None:
+        _limitador_executor = CapacityLimiter(TAMANHO_EXECUTOR)
+    return await to_thread.run_sync(partial(funcao, *args, **kwargs), limiter=_limitador_executor)
+
+class AsyncService(Generic[T, U]):
+    """Versão assíncrona do GenericService, com fronteira explícita de executor."""
+    def __init__(self, service: GenericService[T, U]):
+        """Envolve um serviço síncrono."""
+        self.service = service
+
+    async def _executar(self, funcao: Callable[..., R], *args, **kwargs) -> R:
+        return await executar(funcao, *args, bloqueante=self.service.database.bloqueante, **kwargs)
+
+    async def get_geracao(self) -> int:
+        """Retorna a geração atual da coleção."""
+        return await self._executar(self.service.get_geracao)
+
+    async def get_by_id(self, item_id: int) -> Optional[T]:
+        """Busca um item pelo seu ID."""
+        return await self._executar(self.service.get_by_id, item_id)
+
+    async def get_page(self, apos: int = 0, limite: int = 100,
+                       filtros: Optional[Dict[str, Hashable]] = None) -> Tuple[List[T], Optional[int]]:
+        """Retorna uma página de itens (ver GenericService.get_page)."""
+        return await self._executar(self.service.get_page, apos, limite, filtros)
+
+    async def create(self, data: U) -> T:
+        """Cria um novo item."""
+        return await self._executar(self.service.create, data)
+
+    async def update(self, item_id: int, data: Union[BaseModel, Dict[str, Any]],
+                     versao: Optional[int] = None) -> Optional[T]:
+        """Atualiza um item existente (ver GenericService.update)."""
+        return await self._executar(self.service.update, item_id, data, versao)
+
+    async def create_many(self, dados: List[U]) -> List[T]:
+        """Cria vários itens (ver GenericService.create_many)."""
+        return await self._executar(self.service.create_many, dados)
+
+    async def update_many(self, alteracoes: List[Tuple[int, Dict[str, Any], Optional[int]]],
+                          atomico: bool = False) -> List[Union[T, ErroOperacao]]:
+        """Aplica várias alterações (ver GenericService.update_many)."""
+        return await self._executar(self.service.update_many, alteracoes, atomico)
+
+    async def delete(self, item_id: int) -> bool:
+        """Deleta um item. Retorna True se bem-sucedido."""
+        return await self._executar(self.service.delete, item_id)
+
+bicicleta_async = AsyncService(bicicleta_service)
+tranca_async = AsyncService(tranca_service)
+totem_async = AsyncService(totem_service)
@@ -0,0 +1,139 @@
+# app/snapshots.py
+"""Módulo contendo os snapshots nomeados da frota e a carga de fixtures em NDJSON ou CSV."""
+
+import csv
+import json
+import threading
+import time
+import typing
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from . import ids
+from .aggregates import AgregadosRede
+from .cache import cache_idempotencia, cache_respostas
+from .models import reservar_ids_ate
+from .services import SERVICOS, EstadoColecao, GenericService, agregados, feed, indice_espacial
+from .spatial import IndiceEspacial
+
+TAMANHO_LOTE_FIXTURES = 10_000
+
+class Snapshot(NamedTuple):
+    """Estado completo da frota em um instante: itens, índices, contadores e o último ID."""
+    nome: str
+    criado_em: float
+    ultimo_id: int
+    colecoes: Dict[str, EstadoColecao]
+    agregados: AgregadosRede
+    espacial: IndiceEspacial
+
+    def resumo(self) -> Dict[str, Any]:
+        """Retorna os dados do snapshot exibidos pela API."""
+        return {"nome": self.nome, "criadoEm": self.criado_em, "ultimoId": self.ultimo_id,
+                "itens": {tipo: len(estado.itens) for tipo, estado in self.colecoes.items()}}
+
+_snapshots: Dict[str, Snapshot] = {}
+_lock = threading.Lock()
+
+def salvar_snapshot(nome: str) -> Snapshot:
+    """Captura o estado atual com o nome informado, substituindo um snapshot anterior de mesmo nome.
+
+    Os itens são compartilhados com o armazenamento (são imutáveis); apenas os índices
+    e contadores são copiados.
+    """
+    snapshot = Snapshot(nome, time.time(), ids.alocador.valor_atual(),
+                        {tipo: servico.capturar() for tipo, servico in SERVICOS.items()},
+                        agregados.copiar(), indice_espacial.copiar())
+    with _lock:
+        _snapshots[nome] = snapshot
+    return snapshot
+
+def restaurar_snapshot(nome: str) -> Optional[Snapshot]:
+    """Volta a frota ao estado do snapshot, incluindo o contador de IDs. None se ele não existir.
+
+    Nada é recalculado item a item: o armazenamento recebe os itens capturados e os
+    índices, contadores e o índice espacial são trocados por cópias dos capturados.
+    Os assinantes do feed recebem um único aviso "restaurado".
+    """
+    with _lock:
+        snapshot = _snapshots.get(nome)
+    if snapshot is None:
+        return None
+    for tipo, servico in SERVICOS.items():
+        servico.restaurar(snapshot.colecoes[tipo])
+    agregados.restaurar(snapshot.agregados)
+    indice_espacial.restaurar(snapshot.espacial)
+    ids.alocador.restaurar(snapshot.ultimo_id)
+    cache_respostas.limpar()
+    cache_idempotencia.limpar()
+    feed.avisar("restaurado")
+    return snapshot
+
+def listar_snapshots() -> List[Snapshot]:
+    """Retorna os snapshots salvos, em ordem de nome."""
+    with _lock:
+        return [_snapshots[nome] for nome in sorted(_snapshots)]
+
+def remover_snapshot(nome: str) -> bool:
+    """Remove um snapshot. Retorna True se ele existia."""
+    with _lock:
+        return _snapshots.pop(nome, None) is not None
+
+def _ler_registros(caminho: str) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """Gera (linha, tipo, campos) de um arquivo NDJSON ou CSV, sem carregá-lo inteiro."""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.endswith(".csv"):
+            leitor = csv.DictReader(arquivo)
+            for registro in leitor:
+                campos = {chave: valor for chave, valor in registro.items() if valor not in ("", None)}
+                yield leitor.line_num, campos.pop("tipo", ""), campos
+            return
+        for numero, linha in enumerate(arquivo, 1):
+            if linha.strip():
+                campos = json.loads(linha)
+                yield numero, campos.pop("tipo", ""), campos
+
+def _campos_csv(servico: GenericService, campos: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte as células de campos do tipo lista (ex.: trancas "3;4;5") em listas."""
+    for nome, campo in servico.model.model_fields.items():
+        if isinstance(campos.get(nome), str) and typing.get_origin(campo.annotation) is list:
+            campos[nome] = [valor for valor in campos[nome].split(";") if valor]
+    return campos
+
+def carregar_fixtures(caminho: str) -> Dict[str, int]:
+    """Carrega itens de um arquivo NDJSON ou CSV em lotes; retorna quantos itens de cada tipo foram lidos.
+
+    Cada registro traz o `tipo` (bicicleta, tranca ou totem) e os campos do item; o
+    `id` é opcional e, se presente, é mantido; os IDs gerados ficam acima de todos os
+    já lidos, então um `id` explícito não pode repetir um gerado antes dele no arquivo.
+    No CSV, listas são separadas por ";".
+    """
+    lotes: Dict[str, list] = {tipo: [] for tipo in SERVICOS}
+    contagem = dict.fromkeys(SERVICOS, 0)
+    gerados: Set[int] = set()
+    for numero, tipo, campos in _ler_registros(caminho):
+        servico = SERVICOS.get(tipo)
+        if servico is None:
+            raise ValueError(f"{caminho}, linha {numero}: tipo desconhecido {tipo!r}")
+        if caminho.endswith(".csv"):
+            campos = _campos_csv(servico, campos)
+        try:
+            item = servico.model.model_validate(campos)
+        except ValidationError as erro:
+            raise ValueError(f"{caminho}, linha {numero}: {erro}") from erro
+        if "id" not in campos:
+            gerados.add(item.id)
+        elif item.id in gerados:
+            raise ValueError(f"{caminho}, linha {numero}: id {item.id} já foi gerado para um item anterior")
+        else:
+            # Os IDs gerados para os próximos itens sem `id` ficam acima dos já lidos
+            reservar_ids_ate(item.id)
+        lotes[tipo].append(item)
+        contagem[tipo] += 1
+        if len(lotes[tipo]) >= TAMANHO_LOTE_FIXTURES:
+            servico.importar(lotes[tipo])
+            lotes[tipo] = []
+    for tipo, lote in lotes.items():
+        SERVICOS[tipo].importar(lote)
+    return contagem
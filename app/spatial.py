@@ -0,0 +1,159 @@
+# app/spatial.py
+"""Módulo contendo o índice espacial dos totens, usado nas buscas por proximidade."""
+
+import heapq
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+RAIO_TERRA_KM = 6371.0088
+
+Celula = Tuple[int, int]
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância entre dois pontos pela projeção equirretangular, precisa na escala de uma cidade."""
+    dlon = (lon2 - lon1 + 180) % 360 - 180
+    x = math.radians(dlon) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return RAIO_TERRA_KM * math.hypot(x, y)
+
+class IndiceEspacial:
+    """Grade regular sobre latitude/longitude; cada célula guarda os pontos que caem nela.
+
+    A busca pelos k mais próximos percorre anéis de células em volta do ponto de
+    consulta, de dentro para fora, e para assim que nenhum ponto ainda não visitado
+    puder estar mais perto que o k-ésimo candidato. Quando o próximo anel teria mais
+    células que a grade ocupada, as células restantes são percorridas diretamente.
+    """
+    def __init__(self, passo: float = 0.01):
+        """Inicializa a grade vazia, com células de `passo` graus (0,01° ≈ 1,1 km)."""
+        self.passo = passo
+        self._colunas = round(360 / passo)
+        self._celulas: Dict[Celula, Dict[int, Tuple[float, float]]] = {}
+        self._pontos: Dict[int, Tuple[Celula, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _celula(self, latitude: float, longitude: float) -> Celula:
+        linha = math.floor((latitude + 90) / self.passo)
+        coluna = math.floor((longitude + 180) / self.passo) % self._colunas
+        return linha, coluna
+
+    def atualizar(self, item_id: int, latitude: float, longitude: float) -> None:
+        """Insere o ponto do item ou o move para a nova posição."""
+        celula = self._celula(latitude, longitude)
+        with self._lock:
+            self._remover(item_id)
+            self._celulas.setdefault(celula, {})[item_id] = (latitude, longitude)
+            self._pontos[item_id] = (celula, latitude, longitude)
+
+    def remover(self, item_id: int) -> None:
+        """Remove o ponto do item, se houver."""
+        with self._lock:
+            self._remover(item_id)
+
+    def totem_alterado(self, item_id: int, totem) -> None:
+        """Observador do serviço de totens: indexa as coordenadas (ou as remove, se ausentes)."""
+        if totem is None or totem.latitude is None or totem.longitude is None:
+            self.remover(item_id)
+        else:
+            self.atualizar(item_id, totem.latitude, totem.longitude)
+
+    def limpar(self) -> None:
+        """Remove todos os pontos."""
+        with self._lock:
+            self._celulas.clear()
+            self._pontos.clear()
+
+    def copiar(self) -> "IndiceEspacial":
+        """Retorna uma cópia independente do índice (usada nos snapshots)."""
+        copia = IndiceEspacial(self.passo)
+        with self._lock:
+            copia._celulas = {celula: dict(pontos) for celula, pontos in self._celulas.items()}
+            copia._pontos = dict(self._pontos)
+        return copia
+
+    def restaurar(self, origem: "IndiceEspacial") -> None:
+        """Substitui os pontos pelos de uma cópia, sem alterá-la."""
+        copia = origem.copiar()
+        with self._lock:
+            self._celulas, self._pontos = copia._celulas, copia._pontos
+
+    def __len__(self) -> int:
+        return len(self._pontos)
+
+    def proximos(self, latitude: float, longitude: float, k: int,
+                 aceitar: Optional[Callable[[int], bool]] = None,
+                 raio_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        """Retorna até `k` pares (distância em km, ID) mais próximos do ponto, em ordem crescente.
+
+        Só entram os IDs para os quais `aceitar` (se informado) retorna True e, se
+        `raio_km` for informado, que estejam a no máximo essa distância.
+        """
+        linha, coluna = self._celula(latitude, longitude)
+        limite_raio = math.inf if raio_km is None else raio_km
+        # Heap de máximo (distâncias negadas) com os k melhores candidatos
+        melhores: List[Tuple[float, int]] = []
+
+        def examinar(pontos: Iterable[Tuple[int, Tuple[float, float]]]) -> None:
+            for item_id, (lat, lon) in pontos:
+                distancia = distancia_km(latitude, longitude, lat, lon)
+                if distancia > limite_raio or (len(melhores) == k and distancia >= -melhores[0][0]):
+                    continue
+                if aceitar is not None and not aceitar(item_id):
+                    continue
+                if len(melhores) == k:
+                    heapq.heapreplace(melhores, (-distancia, item_id))
+                else:
+                    heapq.heappush(melhores, (-distancia, item_id))
+
+        with self._lock:
+            anel = 0
+            while True:
+                if 8 * anel > len(self._celulas):
+                    # O anel seria maior que a grade ocupada: percorre o que falta diretamente
+                    for celula, pontos in self._celulas.items():
+                        if self._afastamento(celula, linha, coluna) >= anel:
+                            examinar(pontos.items())
+                    break
+                for celula in self._anel(linha, coluna, anel):
+                    pontos = self._celulas.get(celula)
+                    if pontos:
+                        examinar(pontos.items())
+                # Qualquer ponto fora dos anéis já vistos está a mais de `anel` células de distância
+                minimo = self._distancia_minima(latitude, anel)
+                if minimo > limite_raio or (len(melhores) == k and minimo >= -melhores[0][0]):
+                    break
+                anel += 1
+        return sorted((-distancia, item_id) for distancia, item_id in melhores)
+
+    def _remover(self, item_id: int) -> None:
+        ponto = self._pontos.pop(item_id, None)
+        if ponto is not None:
+            pontos = self._celulas[ponto[0]]
+            del pontos[item_id]
+            if not pontos:
+                del self._celulas[ponto[0]]
+
+    def _anel(self, linha: int, coluna: int, anel: int) -> Iterable[Celula]:
+        """Gera as células a exatamente `anel` células de distância (Chebyshev) da célula central."""
+        if anel == 0:
+            yield linha, coluna
+            return
+        for deslocamento in range(-anel, anel + 1):
+            yield linha - anel, (coluna + deslocamento) % self._colunas
+            yield linha + anel, (coluna + deslocamento) % self._colunas
+        for deslocamento in range(-anel + 1, anel):
+            yield linha + deslocamento, (coluna - anel) % self._colunas
+            yield linha + deslocamento, (coluna + anel) % self._colunas
+
+    def _afastamento(self, celula: Celula, linha: int, coluna: int) -> int:
+        """Distância de Chebyshev, em células, entre duas células (com a volta na longitude)."""
+        diferenca = abs(celula[1] - coluna)
+        return max(abs(celula[0] - linha), min(diferenca, self._colunas - diferenca))
+
+    def _distancia_minima(self, latitude: float, anel: int) -> float:
+        """Limite inferior da distância (km) a qualquer ponto fora dos anéis 0..`anel`."""
+        graus = anel * self.passo
+        # A diferença de longitude encolhe com a latitude; usa a mais alta que esses pontos podem ter
+        latitude_maxima = min(90.0, abs(latitude) + graus + self.passo)
+        return RAIO_TERRA_KM * math.radians(graus) * math.cos(math.radians(latitude_maxima))
@@ -0,0 +1,281 @@
+# app/sqlite_store.py
+"""Módulo contendo o armazenamento em SQLite, compartilhável entre processos."""
+
+import queue
+import sqlite3
+import threading
+from typing import List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+from .errors import ConflitoVersao, ErroOperacao
+from .storage import MemoryStore
+
+# Quantas entradas do registro de alterações manter para os outros processos
+ALTERACOES_RETIDAS = 100_000
+
+class _Operacao:
+    """Gravação enfileirada para a thread escritora."""
+    __slots__ = ("tipo", "item_id", "item", "versionados", "concluida", "erro")
+
+    def __init__(self, tipo: str, item_id: Optional[int] = None, item: Optional[BaseModel] = None,
+                 versionados: Optional[List[Tuple[BaseModel, int]]] = None):
+        self.tipo = tipo
+        self.item_id = item_id
+        self.item = item
+        self.versionados = versionados  # (item, versão anterior) de um grupo condicional
+        self.concluida = threading.Event()
+        self.erro: Optional[BaseException] = None
+
+class SQLiteStore(MemoryStore):
+    """Armazenamento em SQLite (modo WAL) com cache em memória.
+
+    As leituras são servidas pelo cache, que é atualizado de forma incremental a
+    partir da tabela `alteracoes` sempre que outro processo grava no banco
+    (detectado por `PRAGMA data_version`). As gravações são enfileiradas para uma
+    única thread escritora, que as agrupa em transações de até `tamanho_lote` itens.
+    As de `put_versionado` conferem a versão gravada no banco dentro da transação
+    (BEGIN IMMEDIATE), então dois processos não sobrescrevem a escrita um do outro.
+    """
+    bloqueante = True
+    compartilhado = True
+
+    def __init__(self, caminho: str, nome: str, model: Type[BaseModel], tamanho_lote: int = 256,
+                 espera_lock: float = 30.0):
+        """Abre (ou cria) a tabela da coleção, carrega o cache e inicia a thread escritora.
+
+        `espera_lock` é quanto tempo (em segundos) esperar pelo lock de escrita do banco,
+        que pode estar com outro processo, antes de a gravação falhar.
+        """
+        super().__init__()
+        self.caminho = caminho
+        self.nome = nome
+        self.model = model
+        self.tamanho_lote = tamanho_lote
+        self.espera_lock = espera_lock
+        self._local = threading.local()
+        self._conexoes: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        # Alterações gravadas por este processo, que o cache já reflete
+        self._proprias: Set[int] = set()
+        self._fila: "queue.Queue[Optional[_Operacao]]" = queue.Queue()
+        # O nome da coleção vem do código, nunca da requisição
+        self._sql_put = f"INSERT OR REPLACE INTO {nome} (id, dados) VALUES (?, ?)"
+        self._sql_put_versionado = f"UPDATE {nome} SET dados = ? WHERE id = ? AND json_extract(dados, '$.versao') = ?"
+        self._sql_versao = f"SELECT json_extract(dados, '$.versao') FROM {nome} WHERE id = ?"
+        self._sql_del = f"DELETE FROM {nome} WHERE id = ?"
+        self._sql_get = f"SELECT id, dados FROM {nome} WHERE id = ?"
+        self._sql_alteracao = "INSERT INTO alteracoes (colecao, id) VALUES (?, ?)"
+        conexao = self._conexao()
+        conexao.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {nome} (id INTEGER PRIMARY KEY, dados TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, colecao TEXT NOT NULL, id INTEGER
+            );
+        """)
+        self._recarregar(conexao)
+        self._escritora = threading.Thread(target=self._escrever, name=f"sqlite-{nome}", daemon=True)
+        self._escritora.start()
+
+    def put(self, item: BaseModel) -> None:
+        """Grava um item e aguarda a confirmação do lote."""
+        self._executar(_Operacao("put", item.id, item))
+
+    def put_many(self, itens: List[BaseModel]) -> None:
+        """Enfileira todas as gravações de uma vez; a thread escritora as agrupa em lotes."""
+        self._executar(*(_Operacao("put", item.id, item) for item in itens))
+
+    def put_versionado(self, itens: List[BaseModel], anteriores: List[int]) -> None:
+        """Grava os itens numa única transação, só se cada um ainda estiver na versão anterior informada."""
+        if itens:
+            self._executar(_Operacao("put_versionado", versionados=list(zip(itens, anteriores))))
+
+    def delete(self, item_id: int) -> bool:
+        """Remove um item. Retorna True se ele existia."""
+        if item_id not in self._dados:
+            return False
+        self._executar(_Operacao("del", item_id))
+        return True
+
+    def clear(self) -> None:
+        """Esvazia a tabela da coleção (equivalente a um TRUNCATE)."""
+        self._executar(_Operacao("clear"))
+
+    def close(self) -> None:
+        """Encerra a thread escritora e fecha as conexões."""
+        if self._escritora.is_alive():
+            self._fila.put(None)
+            self._escritora.join()
+        with self._lock:
+            for conexao in self._conexoes:
+                conexao.close()
+            self._conexoes.clear()
+
+    def sincronizar(self) -> Optional[List[int]]:
+        """Aplica ao cache as alterações feitas por outras conexões.
+
+        Retorna os IDs alterados, ou None se o cache foi recarregado por inteiro.
+        """
+        conexao = self._conexao()
+        versao = conexao.execute("PRAGMA data_version").fetchone()[0]
+        if versao == getattr(self._local, "data_version", None):
+            return []
+        self._local.data_version = versao
+        with self._lock:
+            minimo = conexao.execute("SELECT MIN(seq) FROM alteracoes").fetchone()[0]
+            if minimo is not None and minimo > self._seq + 1 and self._seq:
+                # As alterações que faltam já foram descartadas: recarrega tudo
+                self._recarregar(conexao)
+                return None
+            linhas = conexao.execute(
+                "SELECT seq, id FROM alteracoes WHERE colecao = ? AND seq > ? ORDER BY seq",
+                (self.nome, self._seq)).fetchall()
+            if not linhas:
+                return []
+            self._seq = linhas[-1][0]
+            externas = [item_id for seq, item_id in linhas if seq not in self._proprias]
+            self._proprias.difference_update(seq for seq, _ in linhas)
+            if any(item_id is None for item_id in externas):
+                self._recarregar(conexao)
+                return None
+            alterados = list(dict.fromkeys(externas))
+            for item_id in alterados:
+                linha = conexao.execute(self._sql_get, (item_id,)).fetchone()
+                if linha:
+                    self._dados[item_id] = self.model.model_validate_json(linha[1])
+                else:
+                    self._dados.pop(item_id, None)
+            return alterados
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, criando-a na primeira chamada."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=self.espera_lock, isolation_level=None,
+                                      check_same_thread=False, cached_statements=64)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            with self._lock:
+                self._conexoes.append(conexao)
+        return conexao
+
+    def _recarregar(self, conexao: sqlite3.Connection) -> None:
+        """Recarrega o cache inteiro a partir de uma leitura consistente do banco."""
+        conexao.execute("BEGIN")
+        try:
+            self._seq = conexao.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes").fetchone()[0]
+            self._proprias.clear()
+            self._dados = {item_id: self.model.model_validate_json(dados)
+                           for item_id, dados in conexao.execute(f"SELECT id, dados FROM {self.nome}")}
+        finally:
+            conexao.execute("COMMIT")
+
+    def _executar(self, *operacoes: _Operacao) -> None:
+        """Enfileira as operações e aguarda sua confirmação."""
+        for operacao in operacoes:
+            self._fila.put(operacao)
+        for operacao in operacoes:
+            operacao.concluida.wait()
+        for operacao in operacoes:
+            if operacao.erro:
+                raise operacao.erro
+
+    def _aplicar(self, conexao: sqlite3.Connection, operacao: _Operacao) -> List[int]:
+        """Executa uma operação dentro da transação corrente. Retorna os seqs das alterações."""
+        if operacao.tipo == "put_versionado":
+            seqs = []
+            for item, anterior in operacao.versionados:
+                if not conexao.execute(self._sql_put_versionado, (item.model_dump_json(), item.id, anterior)).rowcount:
+                    linha = conexao.execute(self._sql_versao, (item.id,)).fetchone()
+                    if linha is None:
+                        raise ErroOperacao(409, "Item removido por outro processo")
+                    raise ConflitoVersao(linha[0])
+                seqs.append(conexao.execute(self._sql_alteracao, (self.nome, item.id)).lastrowid)
+            return seqs
+        if operacao.tipo == "put":
+            conexao.execute(self._sql_put, (operacao.item_id, operacao.item.model_dump_json()))
+        elif operacao.tipo == "del":
+            conexao.execute(self._sql_del, (operacao.item_id,))
+        else:
+            conexao.execute(f"DELETE FROM {self.nome}")
+        return [conexao.execute(self._sql_alteracao, (self.nome, operacao.item_id)).lastrowid]
+
+    def _confirmar(self, conexao: sqlite3.Connection, lote: List[_Operacao]) -> List[int]:
+        """Executa o lote em uma transação; em caso de erro, repete item a item.
+
+        Se nem a transação abrir (ex.: lock de escrita com outro processo além de
+        `espera_lock`), o lote inteiro falha, sem repetir. Retorna os seqs das
+        alterações confirmadas.
+        """
+        try:
+            conexao.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as erro:
+            for operacao in lote:
+                operacao.erro = erro
+            return []
+        try:
+            seqs = [seq for operacao in lote for seq in self._aplicar(conexao, operacao)]
+            conexao.execute("COMMIT")
+            return seqs
+        except (sqlite3.Error, ConflitoVersao, ErroOperacao) as erro:
+            if conexao.in_transaction:
+                conexao.execute("ROLLBACK")
+            if len(lote) == 1:
+                lote[0].erro = erro
+                return []
+            return [seq for operacao in lote for seq in self._confirmar(conexao, [operacao])]
+
+    def _escrever(self) -> None:
+        """Thread escritora: agrupa as operações enfileiradas em transações.
+
+        Qualquer falha é entregue a quem espera pelas operações do lote; a thread segue
+        viva, senão as gravações seguintes ficariam esperando para sempre.
+        """
+        conexao = self._conexao()
+        confirmacoes = 0
+        while True:
+            operacao = self._fila.get()
+            if operacao is None:
+                return
+            lote = [operacao]
+            while len(lote) < self.tamanho_lote:
+                try:
+                    proxima = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proxima is None:
+                    self._fila.put(None)
+                    break
+                lote.append(proxima)
+            try:
+                seqs = self._confirmar(conexao, lote)
+                with self._lock:
+                    self._proprias.update(seq for seq in seqs if seq > self._seq)
+                    for operacao in lote:
+                        if operacao.erro:
+                            continue
+                        if operacao.tipo == "put":
+                            self._dados[operacao.item_id] = operacao.item
+                        elif operacao.tipo == "put_versionado":
+                            self._dados.update((item.id, item) for item, _ in operacao.versionados)
+                        elif operacao.tipo == "del":
+                            self._dados.pop(operacao.item_id, None)
+                        else:
+                            self._dados.clear()
+            except BaseException as erro:
+                if conexao.in_transaction:  # não deixa a conexão presa numa transação pela metade
+                    conexao.execute("ROLLBACK")
+                for operacao in lote:
+                    if not operacao.concluida.is_set() and operacao.erro is None:
+                        operacao.erro = erro
+            finally:
+                for operacao in lote:
+                    operacao.concluida.set()
+            confirmacoes += 1
+            if confirmacoes % 1000 == 0:
+                try:
+                    conexao.execute("DELETE FROM alteracoes WHERE seq <= (SELECT MAX(seq) FROM alteracoes) - ?",
+                                    (ALTERACOES_RETIDAS,))
+                except sqlite3.Error:  # banco ocupado: a limpeza fica para o próximo milhar
+                    pass
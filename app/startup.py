@@ -0,0 +1,190 @@
+# app/startup.py
+"""Módulo contendo o perfil de inicialização, o aquecimento das rotas e o esquema OpenAPI pré-gerado.
+
+Com EQUIPAMENTO_PERFIL_INICIO=1 o pacote `app` passa a cronometrar o import de cada
+módulo carregado depois dele (tempo próprio, sem os imports aninhados), e a subida
+imprime na saída de erro, ao final, os módulos e pacotes mais lentos e a duração de
+cada etapa da inicialização. Só depende da biblioteca padrão, para poder ser
+importado antes de todo o resto.
+
+Uso (gera o esquema OpenAPI a ser carregado na subida com EQUIPAMENTO_OPENAPI):
+    python -m app.startup openapi.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Parâmetros de caminho ("{id_tranca}", "{acao}") são trocados por um valor qualquer no aquecimento
+PARAMETRO_CAMINHO = re.compile(r"\{[^}]*\}")
+
+class _LoaderCronometrado:
+    """Envolve o loader de um módulo, medindo a execução do módulo; o resto é delegado ao original."""
+    def __init__(self, loader, perfil: "PerfilInicio"):
+        self._loader = loader
+        self._perfil = perfil
+
+    def __getattr__(self, nome: str):
+        return getattr(self._loader, nome)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, modulo) -> None:
+        self._perfil.iniciar_import(modulo.__name__)
+        try:
+            self._loader.exec_module(modulo)
+        finally:
+            self._perfil.terminar_import()
+
+class _CronometroImports:
+    """Finder colocado no início de sys.meta_path: acha o módulo pelos demais finders e cronometra o loader."""
+    def __init__(self, perfil: "PerfilInicio"):
+        self.perfil = perfil
+
+    def find_spec(self, nome: str, caminho=None, alvo=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(nome, caminho, alvo)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _LoaderCronometrado(spec.loader, self.perfil)
+                return spec
+        return None
+
+class PerfilInicio:
+    """Tempos de import por módulo e de cada etapa da inicialização."""
+    def __init__(self):
+        self.ativo = False
+        self.imports: Dict[str, Tuple[float, float]] = {}  # módulo -> (tempo próprio, tempo total)
+        self.etapas: List[Tuple[str, float]] = []
+        self._cronometro: Optional[_CronometroImports] = None
+        self._pilhas = threading.local()
+
+    def cronometrar_imports(self) -> None:
+        """Passa a medir os imports feitos a partir de agora."""
+        self.ativo = True
+        if self._cronometro is None:
+            self._cronometro = _CronometroImports(self)
+            sys.meta_path.insert(0, self._cronometro)
+
+    def parar_imports(self) -> None:
+        """Deixa de medir os imports (os já medidos continuam no relatório)."""
+        if self._cronometro is not None:
+            sys.meta_path.remove(self._cronometro)
+            self._cronometro = None
+
+    def _pilha(self) -> list:
+        pilha = getattr(self._pilhas, "pilha", None)
+        if pilha is None:
+            pilha = self._pilhas.pilha = []
+        return pilha
+
+    def iniciar_import(self, modulo: str) -> None:
+        """Marca o início da execução de um módulo."""
+        self._pilha().append([modulo, time.perf_counter(), 0.0])
+
+    def terminar_import(self) -> None:
+        """Marca o fim da execução do módulo atual, descontando o tempo dos imports aninhados do pai."""
+        pilha = self._pilha()
+        modulo, inicio, aninhados = pilha.pop()
+        total = time.perf_counter() - inicio
+        self.imports[modulo] = (total - aninhados, total)
+        if pilha:
+            pilha[-1][2] += total
+
+    @contextmanager
+    def etapa(self, nome: str) -> Iterator[None]:
+        """Mede a duração de uma etapa da inicialização."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas.append((nome, time.perf_counter() - inicio))
+
+    def por_grupo(self) -> Dict[str, float]:
+        """Soma o tempo próprio de import por pacote; os módulos do `app` ficam separados."""
+        grupos: Dict[str, float] = {}
+        for modulo, (proprio, _total) in self.imports.items():
+            grupo = modulo if modulo.startswith("app.") else modulo.split(".", 1)[0]
+            grupos[grupo] = grupos.get(grupo, 0.0) + proprio
+        return grupos
+
+    def relatorio(self, maximo: int = 20) -> str:
+        """Monta o relatório: imports mais lentos por pacote e por módulo, depois as etapas."""
+        linhas = [f"Imports: {sum(p for p, _ in self.imports.values()) * 1000:.1f}ms em {len(self.imports)} módulos"]
+        grupos = sorted(self.por_grupo().items(), key=lambda item: -item[1])
+        linhas += [f"  {grupo:<40} {proprio * 1000:8.1f}ms" for grupo, proprio in grupos[:maximo]]
+        linhas.append("Módulos mais lentos (próprio / total):")
+        modulos = sorted(self.imports.items(), key=lambda item: -item[1][0])
+        linhas += [f"  {modulo:<40} {proprio * 1000:8.1f}ms {total * 1000:8.1f}ms"
+                   for modulo, (proprio, total) in modulos[:maximo]]
+        linhas.append("Etapas da inicialização:")
+        linhas += [f"  {nome:<40} {duracao * 1000:8.1f}ms" for nome, duracao in self.etapas]
+        return "\n".join(linhas)
+
+perfil = PerfilInicio()
+
+async def aquecer(app, caminhos: Iterable[str]) -> int:
+    """Faz o roteamento de cada caminho com OPTIONS, sem executar as rotas (a resposta é 405).
+
+    Vai direto ao roteador do app, sem passar pelos middlewares (e pelas métricas). Monta
+    as estruturas que o FastAPI só prepararia na primeira requisição de cada rota (validação
+    dos parâmetros e do corpo, serialização da resposta) e carrega o backend do anyio, que
+    também só é importado no primeiro uso. Retorna quantos caminhos foram aquecidos.
+    """
+    from anyio.lowlevel import checkpoint
+    await checkpoint()
+
+    async def receber() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def enviar(_mensagem: Dict[str, Any]) -> None:
+        return None
+
+    distintos = sorted({PARAMETRO_CAMINHO.sub("0", caminho) for caminho in caminhos})
+    for caminho in distintos:
+        escopo = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "OPTIONS",
+                  "scheme": "http", "path": caminho, "raw_path": caminho.encode(), "root_path": "",
+                  "query_string": b"", "headers": [], "client": None, "server": ("aquecimento", 80),
+                  "state": {}}  # sem "app" no escopo, o roteador responde 405 em vez de lançar HTTPException
+        await app.router(escopo, receber, enviar)
+    return len(distintos)
+
+def carregar_openapi(app, caminho: str) -> bool:
+    """Usa o esquema OpenAPI pré-gerado no arquivo, se for da mesma versão do app; retorna se foi usado."""
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            esquema = json.load(arquivo)
+    except (OSError, ValueError):
+        return False
+    if esquema.get("info", {}).get("version") != app.version:
+        return False
+    # Como na personalização do esquema descrita na documentação do FastAPI: troca o gerador do app
+    app.openapi_schema = esquema
+    app.openapi = lambda: esquema
+    return True
+
+def salvar_openapi(app, caminho: str) -> None:
+    """Gera o esquema OpenAPI do app e o grava no arquivo."""
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(app.openapi(), arquivo, ensure_ascii=False)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Gera o arquivo do esquema OpenAPI pré-gerado."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("saida", help="Arquivo JSON do esquema")
+    args = parser.parse_args(argv)
+
+    from .main import app
+    salvar_openapi(app, args.saida)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# app/storage.py
+"""Módulo contendo os mecanismos de armazenamento usados pelo GenericService."""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Type
+
+from pydantic import BaseModel
+
+class MemoryStore:
+    """Armazenamento volátil: um dicionário de ID para modelo."""
+    # Indica se as operações fazem I/O bloqueante
+    bloqueante = False
+    # Indica se outros processos podem alterar os dados (ver sincronizar)
+    compartilhado = False
+
+    def __init__(self):
+        """Inicializa o armazenamento vazio."""
+        self._dados: Dict[int, BaseModel] = {}
+
+    def get(self, item_id: int) -> Optional[BaseModel]:
+        """Busca um item pelo ID."""
+        return self._dados.get(item_id)
+
+    def put(self, item: BaseModel) -> None:
+        """Grava (insere ou substitui) um item."""
+        self._dados[item.id] = item
+
+    def put_many(self, itens: List[BaseModel]) -> None:
+        """Grava vários itens de uma vez."""
+        for item in itens:
+            self._dados[item.id] = item
+
+    def put_versionado(self, itens: List[BaseModel], anteriores: List[int]) -> None:
+        """Grava itens que substituem, cada um, a versão informada em `anteriores`.
+
+        Nos armazenamentos compartilhados entre processos a gravação é condicional e
+        atômica: se algum item não estiver mais naquela versão, nada é gravado e é
+        lançado ConflitoVersao (ou ErroOperacao 409, se ele foi removido). Aqui os
+        locks de item do serviço já garantem a versão, então é uma gravação comum.
+        """
+        self.put_many(itens)
+
+    def delete(self, item_id: int) -> bool:
+        """Remove um item. Retorna True se ele existia."""
+        return self._dados.pop(item_id, None) is not None
+
+    def values(self) -> Iterable[BaseModel]:
+        """Retorna os itens armazenados."""
+        return self._dados.values()
+
+    def clear(self) -> None:
+        """Remove todos os itens."""
+        self._dados.clear()
+
+    def substituir(self, itens: List[BaseModel]) -> None:
+        """Troca todo o conteúdo pelos itens informados."""
+        self.clear()
+        self.put_many(itens)
+
+    def close(self) -> None:
+        """Libera os recursos do armazenamento."""
+
+    def sincronizar(self) -> Optional[List[int]]:
+        """Incorpora alterações externas; retorna os IDs alterados (None = todos)."""
+        return []
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._dados
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+class WriteAheadLog:
+    """Log de escrita antecipada em segmentos NDJSON, com fsync em grupo."""
+    def __init__(self, diretorio: str, nome: str, segmento: int,
+                 intervalo_fsync: float = 0.002, aguardar_fsync: bool = True):
+        """Abre um novo segmento de log e inicia a thread de sincronização."""
+        self.diretorio = diretorio
+        self.nome = nome
+        self.intervalo_fsync = intervalo_fsync
+        self.aguardar_fsync = aguardar_fsync
+        self.segmento = segmento
+        self.registros_no_segmento = 0
+        self._arquivo = open(self.caminho_segmento(segmento), "a", encoding="utf-8")
+        self._seq = 0
+        self._seq_duravel = 0
+        self._cond = threading.Condition()
+        self._fechado = False
+        self._thread = threading.Thread(target=self._sincronizar, name=f"wal-{nome}", daemon=True)
+        self._thread.start()
+
+    def caminho_segmento(self, segmento: int) -> str:
+        """Retorna o caminho do arquivo de um segmento."""
+        return os.path.join(self.diretorio, f"{self.nome}.{segmento:08d}.wal")
+
+    def registrar(self, registro: dict) -> int:
+        """Acrescenta um registro ao log e retorna seu número de sequência."""
+        linha = json.dumps(registro, separators=(",", ":")) + "\n"
+        with self._cond:
+            self._arquivo.write(linha)
+            self._seq += 1
+            self.registros_no_segmento += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def aguardar(self, seq: int) -> None:
+        """Bloqueia até que o registro `seq` esteja em disco, se configurado."""
+        if not self.aguardar_fsync:
+            return
+        with self._cond:
+            while self._seq_duravel < seq and not self._fechado:
+                self._cond.wait()
+
+    def rotacionar(self) -> int:
+        """Sincroniza o segmento atual e passa a escrever no próximo. Retorna o novo segmento."""
+        with self._cond:
+            self._descarregar()
+            self._arquivo.close()
+            self.segmento += 1
+            self.registros_no_segmento = 0
+            self._arquivo = open(self.caminho_segmento(self.segmento), "a", encoding="utf-8")
+            return self.segmento
+
+    def fechar(self) -> None:
+        """Sincroniza os registros pendentes e encerra o log."""
+        with self._cond:
+            if self._fechado:
+                return
+            self._descarregar()
+            self._fechado = True
+            self._arquivo.close()
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _descarregar(self) -> None:
+        """Grava o buffer e faz fsync. Deve ser chamado com a condição adquirida."""
+        if self._seq_duravel == self._seq:
+            return
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._seq_duravel = self._seq
+        self._cond.notify_all()
+
+    def _sincronizar(self) -> None:
+        """Thread que agrupa as escritas recentes em um único fsync."""
+        while True:
+            with self._cond:
+                while self._seq_duravel == self._seq and not self._fechado:
+                    self._cond.wait()
+                if self._fechado:
+                    return
+            # Espera um pouco para acumular mais escritas no mesmo fsync
+            time.sleep(self.intervalo_fsync)
+            with self._cond:
+                if not self._fechado:
+                    self._descarregar()
+
+class LogStore(MemoryStore):
+    """Armazenamento durável: dados em memória, log de escrita antecipada e snapshots.
+
+    Cada gravação é registrada no log antes de ser aplicada; quando o segmento atual
+    atinge `registros_por_snapshot`, uma thread compacta o estado em um snapshot e
+    descarta os segmentos já cobertos. Na inicialização, carrega o último snapshot e
+    reaplica apenas os segmentos posteriores a ele.
+    """
+    bloqueante = True
+
+    def __init__(self, diretorio: str, nome: str, model: Type[BaseModel],
+                 registros_por_snapshot: int = 100_000, **opcoes_log):
+        """Carrega o estado salvo no diretório e abre um novo segmento de log."""
+        super().__init__()
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.nome = nome
+        self.model = model
+        self.registros_por_snapshot = registros_por_snapshot
+        self._lock = threading.Lock()
+        self._compactando = threading.Lock()
+        ultimo_segmento = self._carregar()
+        self._log = WriteAheadLog(diretorio, nome, ultimo_segmento + 1, **opcoes_log)
+
+    @property
+    def caminho_snapshot(self) -> str:
+        """Retorna o caminho do arquivo de snapshot."""
+        return os.path.join(self.diretorio, f"{self.nome}.snapshot")
+
+    def put(self, item: BaseModel) -> None:
+        """Registra a gravação no log e a aplica em memória."""
+        with self._lock:
+            seq = self._log.registrar({"op": "put", "item": item.model_dump(mode="json")})
+            super().put(item)
+        self._log.aguardar(seq)
+        self._talvez_compactar()
+
+    def put_many(self, itens: List[BaseModel]) -> None:
+        """Registra as gravações no log e aguarda um único fsync para o lote todo."""
+        if not itens:
+            return
+        with self._lock:
+            for item in itens:
+                seq = self._log.registrar({"op": "put", "item": item.model_dump(mode="json")})
+                super().put(item)
+        self._log.aguardar(seq)
+        self._talvez_compactar()
+
+    def delete(self, item_id: int) -> bool:
+        """Registra a remoção no log e a aplica em memória."""
+        with self._lock:
+            if item_id not in self._dados:
+                return False
+            seq = self._log.registrar({"op": "del", "id": item_id})
+            super().delete(item_id)
+        self._log.aguardar(seq)
+        self._talvez_compactar()
+        return True
+
+    def clear(self) -> None:
+        """Registra a limpeza no log e remove todos os itens."""
+        with self._lock:
+            seq = self._log.registrar({"op": "clear"})
+            super().clear()
+        self._log.aguardar(seq)
+
+    def close(self) -> None:
+        """Aguarda compactações em andamento e sincroniza o log."""
+        with self._compactando:
+            self._log.fechar()
+
+    def compactar(self) -> None:
+        """Grava um snapshot do estado atual e remove os segmentos cobertos por ele."""
+        with self._compactando:
+            with self._lock:
+                segmento = self._log.rotacionar()
+                itens = list(self._dados.values())
+            # Os itens podem mudar após a cópia; como o log guarda estados completos,
+            # reaplicar os segmentos a partir de `segmento` sempre converge.
+            temporario = self.caminho_snapshot + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps({"segmento": segmento}) + "\n")
+                for item in itens:
+                    arquivo.write(item.model_dump_json() + "\n")
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            os.replace(temporario, self.caminho_snapshot)
+            self._sincronizar_diretorio()
+            for antigo in self._segmentos():
+                if antigo < segmento:
+                    os.remove(os.path.join(self.diretorio, f"{self.nome}.{antigo:08d}.wal"))
+
+    def _talvez_compactar(self) -> None:
+        """Dispara a compactação em segundo plano quando o segmento atual fica grande."""
+        if self._log.registros_no_segmento < self.registros_por_snapshot or self._compactando.locked():
+            return
+        threading.Thread(target=self.compactar, name=f"compactacao-{self.nome}", daemon=True).start()
+
+    def _segmentos(self) -> List[int]:
+        """Lista os números dos segmentos de log existentes, em ordem."""
+        prefixo, sufixo = f"{self.nome}.", ".wal"
+        numeros = []
+        for arquivo in os.listdir(self.diretorio):
+            meio = arquivo[len(prefixo):-len(sufixo)]
+            if arquivo.startswith(prefixo) and arquivo.endswith(sufixo) and meio.isdigit():
+                numeros.append(int(meio))
+        return sorted(numeros)
+
+    def _carregar(self) -> int:
+        """Carrega o snapshot e reaplica a cauda do log. Retorna o último segmento existente."""
+        primeiro = 0
+        if os.path.exists(self.caminho_snapshot):
+            with open(self.caminho_snapshot, encoding="utf-8") as arquivo:
+                primeiro = json.loads(arquivo.readline())["segmento"]
+                for linha in arquivo:
+                    item = self.model.model_validate_json(linha)
+                    self._dados[item.id] = item
+        segmentos = self._segmentos()
+        for segmento in segmentos:
+            if segmento >= primeiro:
+                self._reaplicar(os.path.join(self.diretorio, f"{self.nome}.{segmento:08d}.wal"))
+        return max(segmentos, default=primeiro)
+
+    def _reaplicar(self, caminho: str) -> None:
+        """Reaplica os registros de um segmento, ignorando uma última linha incompleta."""
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    break
+                if registro["op"] == "put":
+                    item = self.model.model_validate(registro["item"])
+                    self._dados[item.id] = item
+                elif registro["op"] == "del":
+                    self._dados.pop(registro["id"], None)
+                else:
+                    self._dados.clear()
+
+    def _sincronizar_diretorio(self) -> None:
+        """Faz fsync do diretório para tornar a troca do snapshot durável."""
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.diretorio, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,237 @@
+# app/telemetry.py
+"""Módulo contendo a ingestão em lote da telemetria (heartbeats) das trancas físicas.
+
+Cada leitura é um array compacto `[idTranca, trancada, idBicicleta, falhas]`: `trancada`
+é 0 ou 1, `idBicicleta` é a etiqueta lida pelo sensor (ou null) e `falhas` é um mapa
+de bits dos sensores com defeito (0 = nenhum). As leituras recebidas vão para um buffer
+circular limitado, em colunas; uma thread em segundo plano esvazia o buffer, mantém só
+a última leitura de cada tranca e aplica pelo `tranca_service` apenas as mudanças reais
+de status. Trancas cuja bicicleta lida difere de `Tranca.bicicleta` ficam sinalizadas
+até que as duas voltem a coincidir.
+"""
+
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .columnar_store import NULO
+from .errors import ConflitoVersao
+from .metrics import Contador, Medidor, registro
+from .models import StatusTranca
+from .services import GenericService, tranca_service
+
+logger = logging.getLogger(__name__)
+
+CAPACIDADE_BUFFER = 1 << 18
+INTERVALO_PROCESSAMENTO = 0.05
+# Só esses status refletem o estado físico da tranca; os demais (NOVA, EM_REPARO, APOSENTADA)
+# são administrativos e não são alterados pela telemetria
+STATUS_FISICOS = {StatusTranca.LIVRE, StatusTranca.OCUPADA}
+
+leituras_telemetria = registro.registrar(Contador(
+    "equipamento_telemetria_leituras_total", "Leituras de telemetria das trancas, por destino", ("destino",)))
+
+class ErroLeitura(ValueError):
+    """Leitura de telemetria em formato inválido."""
+
+class Divergencia(NamedTuple):
+    """Tranca cuja bicicleta lida pelo sensor difere da registrada."""
+    id_tranca: int
+    bicicleta_lida: Optional[int]
+    bicicleta_registrada: Optional[int]
+    falhas: int
+    instante: float
+
+class BufferLeituras:
+    """Buffer circular de leituras em colunas pré-alocadas; recusa lotes que não cabem."""
+    def __init__(self, capacidade: int = CAPACIDADE_BUFFER):
+        """Aloca as colunas com a capacidade informada."""
+        self.capacidade = capacidade
+        self.ids = array("q", bytes(8 * capacidade))
+        self.trancadas = array("b", bytes(capacidade))
+        self.bicicletas = array("q", bytes(8 * capacidade))
+        self.falhas = array("q", bytes(8 * capacidade))
+        self._inicio = 0
+        self._tamanho = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def colocar(self, ids: array, trancadas: array, bicicletas: array, falhas: array) -> bool:
+        """Acrescenta o lote inteiro (colunas de mesmo tamanho); retorna False se não couber."""
+        quantidade = len(ids)
+        with self._lock:
+            if self._tamanho + quantidade > self.capacidade:
+                return False
+            fim = (self._inicio + self._tamanho) % self.capacidade
+            primeira = min(quantidade, self.capacidade - fim)
+            for destino, origem in ((self.ids, ids), (self.trancadas, trancadas),
+                                    (self.bicicletas, bicicletas), (self.falhas, falhas)):
+                destino[fim:fim + primeira] = origem[:primeira]
+                destino[:quantidade - primeira] = origem[primeira:]
+            self._tamanho += quantidade
+            return True
+
+    def retirar(self) -> Tuple[array, array, array, array]:
+        """Retira todas as leituras pendentes, na ordem de chegada."""
+        with self._lock:
+            inicio, quantidade = self._inicio, self._tamanho
+            fim = inicio + quantidade
+            colunas = []
+            for coluna in (self.ids, self.trancadas, self.bicicletas, self.falhas):
+                if fim <= self.capacidade:
+                    colunas.append(coluna[inicio:fim])
+                else:
+                    colunas.append(coluna[inicio:] + coluna[:fim - self.capacidade])
+            self._inicio = fim % self.capacidade
+            self._tamanho = 0
+        return tuple(colunas)
+
+def ler_lote(leituras) -> Tuple[array, array, array, array]:
+    """Valida as leituras (lista de `[idTranca, trancada, idBicicleta, falhas]`) e as converte em colunas."""
+    if not isinstance(leituras, list):
+        raise ErroLeitura("O corpo deve ser um array de leituras")
+    ids, trancadas, bicicletas, falhas = array("q"), array("b"), array("q"), array("q")
+    try:
+        for leitura in leituras:
+            id_tranca, trancada, bicicleta, falha = leitura
+            if type(id_tranca) is not int or type(falha) is not int or trancada not in (0, 1) \
+                    or (bicicleta is not None and type(bicicleta) is not int):
+                raise ErroLeitura(f"Leitura inválida: {leitura!r}")
+            ids.append(id_tranca)
+            trancadas.append(trancada)
+            bicicletas.append(NULO if bicicleta is None else bicicleta)
+            falhas.append(falha)
+    except (TypeError, ValueError, OverflowError) as erro:
+        if isinstance(erro, ErroLeitura):
+            raise
+        raise ErroLeitura(f"Leitura inválida: {erro}") from None
+    return ids, trancadas, bicicletas, falhas
+
+class ProcessadorTelemetria:
+    """Recebe as leituras no buffer e as aplica em segundo plano, coalescidas por tranca."""
+    def __init__(self, servico: GenericService = tranca_service, capacidade: int = CAPACIDADE_BUFFER,
+                 intervalo: float = INTERVALO_PROCESSAMENTO):
+        """Define o serviço das trancas, a capacidade do buffer e o intervalo (em segundos) entre processamentos."""
+        self.servico = servico
+        self.buffer = BufferLeituras(capacidade)
+        self.intervalo = intervalo
+        self.divergencias: Dict[int, Divergencia] = {}
+        self.falhas: Dict[int, int] = {}
+        self._lock_processamento = threading.Lock()
+        self._lock_sinais = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_thread = threading.Lock()
+
+    def receber(self, leituras) -> Optional[int]:
+        """Valida e enfileira um lote de leituras; retorna quantas foram aceitas (None se o lote não couber)."""
+        colunas = ler_lote(leituras)
+        if not self.buffer.colocar(*colunas):
+            leituras_telemetria.incrementar("recusada", valor=len(colunas[0]))
+            return None
+        leituras_telemetria.incrementar("recebida", valor=len(colunas[0]))
+        self._iniciar()
+        if len(self.buffer) > self.buffer.capacidade // 2:
+            self._acordar.set()
+        return len(colunas[0])
+
+    def _iniciar(self) -> None:
+        """Inicia a thread de processamento, se ainda não estiver rodando."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock_thread:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._executar, name="telemetria", daemon=True)
+                self._thread.start()
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.processar_pendentes()
+            except Exception:  # a thread segue viva para os próximos lotes
+                logger.exception("Falha ao processar a telemetria")
+
+    def parar(self) -> None:
+        """Para a thread de processamento, aplicando antes as leituras pendentes."""
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.processar_pendentes()
+
+    def processar_pendentes(self) -> int:
+        """Aplica as leituras pendentes (a última de cada tranca); retorna quantas trancas foram alteradas."""
+        with self._lock_processamento:
+            ids, trancadas, bicicletas, falhas = self.buffer.retirar()
+            if not ids:
+                return 0
+            # Percorre de trás para a frente e fica só com a leitura mais recente de cada tranca
+            ultimas: Dict[int, int] = {}
+            for posicao in range(len(ids) - 1, -1, -1):
+                ultimas.setdefault(ids[posicao], posicao)
+            leituras_telemetria.incrementar("coalescida", valor=len(ids) - len(ultimas))
+            instante = time.time()
+            alteradas = 0
+            for id_tranca, posicao in ultimas.items():
+                bicicleta = bicicletas[posicao]
+                alteradas += self._aplicar(id_tranca, bool(trancadas[posicao]),
+                                           None if bicicleta == NULO else bicicleta, falhas[posicao], instante)
+            return alteradas
+
+    def _aplicar(self, id_tranca: int, trancada: bool, bicicleta: Optional[int], falhas: int, instante: float) -> bool:
+        """Aplica a leitura mais recente de uma tranca; retorna True se o status foi alterado."""
+        tranca = self.servico.get_by_id(id_tranca)
+        if tranca is None:
+            leituras_telemetria.incrementar("desconhecida")
+            return False
+        alterada = False
+        status = StatusTranca.OCUPADA if trancada else StatusTranca.LIVRE
+        if tranca.status in STATUS_FISICOS and tranca.status != status:
+            try:
+                atualizada = self.servico.update(id_tranca, {"status": status}, versao=tranca.versao)
+            except ConflitoVersao:
+                # Alterada por outra requisição no meio do caminho; a próxima leitura corrige, se preciso
+                leituras_telemetria.incrementar("conflito")
+            else:
+                if atualizada is None:
+                    return False
+                tranca, alterada = atualizada, True
+                leituras_telemetria.incrementar("aplicada")
+        with self._lock_sinais:
+            if falhas:
+                self.falhas[id_tranca] = falhas
+            else:
+                self.falhas.pop(id_tranca, None)
+            if bicicleta != tranca.bicicleta:
+                self.divergencias[id_tranca] = Divergencia(id_tranca, bicicleta, tranca.bicicleta, falhas, instante)
+            else:
+                self.divergencias.pop(id_tranca, None)
+        return alterada
+
+    def listar_divergencias(self) -> List[Divergencia]:
+        """Retorna as trancas sinalizadas, por ID."""
+        with self._lock_sinais:
+            return [self.divergencias[id_tranca] for id_tranca in sorted(self.divergencias)]
+
+    def limpar(self) -> None:
+        """Descarta as leituras pendentes e as sinalizações."""
+        with self._lock_processamento:
+            self.buffer.retirar()
+            with self._lock_sinais:
+                self.divergencias.clear()
+                self.falhas.clear()
+
+telemetria = ProcessadorTelemetria()
+
+registro.registrar(Medidor(
+    "equipamento_telemetria_pendentes", "Leituras de telemetria aguardando processamento e trancas sinalizadas",
+    ("tipo",), lambda: {("buffer",): len(telemetria.buffer), ("divergencias",): len(telemetria.divergencias),
+                        ("falhas",): len(telemetria.falhas)}))
@@ -0,0 +1,8 @@
+# benchmarks/__main__.py
+"""Permite executar a suíte de benchmarks com `python -m benchmarks` (ver benchmarks/suite.py)."""
+
+import sys
+
+from benchmarks.suite import main
+
+sys.exit(main())
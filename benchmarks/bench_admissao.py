@@ -0,0 +1,140 @@
+# benchmarks/bench_admissao.py
+"""Teste de carga do controle de admissão: latência dos usuários durante uma tempestade de reconexões.
+
+Sobe um uvicorn local e simula muitos totens que reconectam ao mesmo tempo e passam a
+consultar suas trancas e a trancar/destrancar sem pausa (respeitando o Retry-After
+quando recusados), enquanto alguns usuários consultam bicicletas. Mede os percentis de
+latência dos usuários e quantas requisições dos totens foram aceitas ou recusadas, com
+o controle de admissão desligado (taxa por totem e concorrência sem limite) e ligado.
+
+Uso: python -m benchmarks.bench_admissao --totens 500 --duracao 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.bench_workers import aguardar_servidor
+
+TOTEM = {"localizacao": "Estação", "descricao": ""}
+TRANCA = {"localizacao": "Estação", "anoDeFabricacao": "2023", "modelo": "T1", "status": "NOVA"}
+BICICLETA = {"marca": "Caloi", "modelo": "Elite", "ano": "2023", "status": "DISPONIVEL"}
+
+async def preparar(cliente: httpx.AsyncClient, totens: int) -> Tuple[List[int], List[int], List[int]]:
+    """Cria os totens, uma tranca integrada em cada um e algumas bicicletas; retorna os IDs."""
+    async def lote(colecao: str, corpo: dict, quantidade: int) -> List[int]:
+        resposta = await cliente.post(f"/{colecao}/lote", json=[{**corpo, "numero": i} for i in range(quantidade)])
+        resposta.raise_for_status()
+        return [r["id"] for r in resposta.json()["resultados"]]
+
+    ids_totens = await lote("totem", TOTEM, totens)
+    ids_trancas = await lote("tranca", TRANCA, totens)
+    for id_tranca, id_totem in zip(ids_trancas, ids_totens):
+        (await cliente.post("/tranca/integrarNaRede",
+                            json={"idTranca": id_tranca, "idTotem": id_totem, "idFuncionario": 1})).raise_for_status()
+    return ids_totens, ids_trancas, await lote("bicicleta", BICICLETA, 100)
+
+class Conexao:
+    """Conexão HTTP/1.1 persistente mínima: bem mais leve que o httpx, para que o gerador de
+    carga não seja o gargalo quando centenas de totens dividem a CPU com o servidor."""
+    def __init__(self, porta: int):
+        self.porta = porta
+        self._leitor = self._escritor = None
+
+    async def requisitar(self, metodo: str, caminho: str) -> Tuple[int, Dict[str, str]]:
+        """Envia a requisição (sem corpo) e retorna o status e os headers da resposta."""
+        if self._escritor is None:
+            self._leitor, self._escritor = await asyncio.open_connection("127.0.0.1", self.porta)
+        self._escritor.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: bench\r\nContent-Length: 0\r\n\r\n".encode())
+        cabecalho = (await self._leitor.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(linha.lower().split(": ", 1) for linha in cabecalho[1:] if ": " in linha)
+        await self._leitor.readexactly(int(headers.get("content-length", 0)))
+        return int(cabecalho[0].split()[1]), headers
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+async def tempestade(url: str, args) -> Tuple[List[float], Counter]:
+    """Executa a tempestade por `duracao` segundos; retorna as latências dos usuários e os status dos totens."""
+    latencias: List[float] = []
+    status_totens: Counter = Counter()
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limites) as cliente:
+        ids_totens, ids_trancas, ids_bicicletas = await preparar(cliente, args.totens)
+        fim = time.monotonic() + args.duracao
+
+        async def totem(i: int):
+            id_totem, id_tranca = ids_totens[i], ids_trancas[i]
+            conexao = Conexao(args.porta)
+            try:
+                while time.monotonic() < fim:
+                    for metodo, caminho in (("GET", f"/totem/{id_totem}/trancas"),
+                                            ("POST", f"/tranca/{id_tranca}/trancar"),
+                                            ("POST", f"/tranca/{id_tranca}/destrancar")):
+                        status, headers = await conexao.requisitar(metodo, caminho)
+                        status_totens[status] += 1
+                        if "retry-after" in headers:
+                            await asyncio.sleep(float(headers["retry-after"]))
+                            break
+            finally:
+                conexao.fechar()
+
+        async def usuario(i: int):
+            conexao = Conexao(args.porta)
+            try:
+                while time.monotonic() < fim:
+                    inicio = time.perf_counter()
+                    status, _ = await conexao.requisitar("GET", f"/bicicleta/{ids_bicicletas[i % len(ids_bicicletas)]}")
+                    latencias.append(time.perf_counter() - inicio)
+                    assert status == 200
+                    await asyncio.sleep(0.01)
+            finally:
+                conexao.fechar()
+
+        await asyncio.gather(*(totem(i) for i in range(args.totens)), *(usuario(i) for i in range(args.usuarios)))
+    return latencias, status_totens
+
+def rodar(args, ambiente: Dict[str, str]) -> Tuple[List[float], Counter]:
+    """Sobe o uvicorn com as variáveis de ambiente informadas e executa a tempestade contra ele."""
+    servidor = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.porta),
+                                 "--log-level", "warning"], env={**os.environ, **ambiente})
+    url = f"http://127.0.0.1:{args.porta}"
+    try:
+        aguardar_servidor(url)
+        return asyncio.run(tempestade(url, args))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+def main():
+    """Executa a tempestade com e sem o controle de admissão e compara a latência dos usuários."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--totens", type=int, default=500)
+    parser.add_argument("--usuarios", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=5.0)
+    parser.add_argument("--taxa-totem", type=float, default=2.0)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--porta", type=int, default=8767)
+    args = parser.parse_args()
+    cenarios = (
+        ("desligada", {"EQUIPAMENTO_TAXA_TOTEM": "0", "EQUIPAMENTO_CONCORRENCIA": "1000000"}),
+        ("ligada", {"EQUIPAMENTO_TAXA_TOTEM": str(args.taxa_totem), "EQUIPAMENTO_CONCORRENCIA": str(args.concorrencia)}),
+    )
+    for nome, ambiente in cenarios:
+        latencias, status_totens = rodar(args, {**ambiente, "EQUIPAMENTO_STORAGE": "memoria"})
+        quantis = statistics.quantiles(latencias, n=100)
+        print(f"admissão {nome}: usuários p50 {quantis[49] * 1000:.1f}ms, p99 {quantis[98] * 1000:.1f}ms, "
+              f"máx {max(latencias) * 1000:.1f}ms ({len(latencias)} requisições); "
+              f"totens {dict(sorted(status_totens.items()))}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_async.py
+"""Benchmark das rotas assíncronas contra handlers síncronos equivalentes.
+
+Os handlers síncronos reproduzem o caminho anterior (def + threadpool do Starlette).
+As requisições são feitas em processo, via ASGI, com muitas tarefas concorrentes.
+
+Uso: python -m benchmarks.bench_async --concorrencia 256 --requisicoes 20000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.main import app as app_async
+from app.models import Bicicleta, NovaBicicleta, StatusBicicleta
+from app.services import bicicleta_service, restaurar_banco
+
+app_sync = FastAPI()
+
+@app_sync.get("/bicicleta/{id_bicicleta}", response_model=Bicicleta)
+def obter_bicicleta(id_bicicleta: int):
+    """Handler síncrono equivalente ao anterior."""
+    bicicleta = bicicleta_service.get_by_id(id_bicicleta)
+    if not bicicleta:
+        raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
+    return bicicleta
+
+@app_sync.post("/bicicleta/", response_model=Bicicleta)
+def criar_bicicleta(data: NovaBicicleta):
+    """Handler síncrono equivalente ao anterior."""
+    return bicicleta_service.create(data)
+
+async def medir(nome: str, app, concorrencia: int, requisicoes: int):
+    """Dispara as requisições e imprime vazão e percentis de latência."""
+    restaurar_banco()
+    ids = [bicicleta_service.create(NovaBicicleta(marca="a", modelo="b", ano="2020", numero=i,
+                                                  status=StatusBicicleta.DISPONIVEL)).id for i in range(100)]
+    latencias = []
+    fila = asyncio.Queue()
+    for i in range(requisicoes):
+        fila.put_nowait(i)
+
+    async def trabalhador(cliente: httpx.AsyncClient):
+        while not fila.empty():
+            i = fila.get_nowait()
+            inicio = time.perf_counter()
+            if i % 10 == 0:
+                await cliente.post("/bicicleta/", json={"marca": "a", "modelo": "b", "ano": "2020",
+                                                        "numero": i, "status": "NOVA"})
+            else:
+                await cliente.get(f"/bicicleta/{ids[i % len(ids)]}")
+            latencias.append(time.perf_counter() - inicio)
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador(cliente) for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+    quantis = statistics.quantiles(latencias, n=100)
+    print(f"{nome}: {requisicoes / duracao:,.0f} req/s, p50 {quantis[49] * 1000:.2f} ms, "
+          f"p99 {quantis[98] * 1000:.2f} ms")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concorrencia", type=int, default=256)
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(medir("sync (threadpool)", app_sync, args.concorrencia, args.requisicoes))
+    asyncio.run(medir("async", app_async, args.concorrencia, args.requisicoes))
+
+if __name__ == "__main__":
+    main()
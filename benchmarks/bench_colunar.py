@@ -0,0 +1,82 @@
+# benchmarks/bench_colunar.py
+"""Benchmark de memória e vazão do ColumnarStore contra o MemoryStore (dicionário de modelos).
+
+Carrega N trancas em cada armazenamento e mede a memória retida (tracemalloc), a
+vazão de gravação, de leitura por ID e de atualização (cópia na escrita, como no serviço).
+
+Uso: python -m benchmarks.bench_colunar --entidades 1000000
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from app.columnar_store import ColumnarStore
+from app.models import StatusTranca, Tranca
+from app.storage import MemoryStore
+
+STATUS = list(StatusTranca)
+LOCAIS = [f"Estação {i}" for i in range(500)]
+
+def gerar(quantidade: int):
+    """Gera trancas com poucos valores distintos de texto, como numa frota real."""
+    for item_id in range(1, quantidade + 1):
+        yield Tranca(id=item_id, numero=item_id, localizacao=LOCAIS[item_id % len(LOCAIS)],
+                     anoDeFabricacao=str(2015 + item_id % 10), modelo=f"T{item_id % 5}",
+                     status=STATUS[item_id % len(STATUS)], bicicleta=item_id if item_id % 2 else None)
+
+def memoria(fabrica, quantidade: int) -> float:
+    """Retorna os bytes retidos por item após carregar o armazenamento."""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    store = fabrica()
+    for item in gerar(quantidade):
+        store.put(item)
+    del item
+    gc.collect()
+    retido = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    del store
+    return retido / quantidade
+
+def vazao(fabrica, quantidade: int, operacoes: int):
+    """Mede gravações, leituras e atualizações por segundo."""
+    itens = list(gerar(quantidade))
+    store = fabrica()
+    inicio = time.perf_counter()
+    for item in itens:
+        store.put(item)
+    gravacao = quantidade / (time.perf_counter() - inicio)
+    del itens, item
+    gc.collect()
+
+    ids = [random.randint(1, quantidade) for _ in range(operacoes)]
+    inicio = time.perf_counter()
+    for item_id in ids:
+        store.get(item_id)
+    leitura = operacoes / (time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    for item_id in ids:
+        item = store.get(item_id)
+        store.put(item.model_copy(update={"status": StatusTranca.OCUPADA, "versao": item.versao + 1}))
+    atualizacao = operacoes / (time.perf_counter() - inicio)
+    return gravacao, leitura, atualizacao
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entidades", type=int, default=1_000_000)
+    parser.add_argument("--operacoes", type=int, default=200_000)
+    args = parser.parse_args()
+    for nome, fabrica in (("MemoryStore", MemoryStore), ("ColumnarStore", lambda: ColumnarStore(Tranca))):
+        por_item = memoria(fabrica, args.entidades)
+        gravacao, leitura, atualizacao = vazao(fabrica, args.entidades, args.operacoes)
+        print(f"{nome}: {por_item:,.0f} bytes/item, {gravacao:,.0f} gravações/s, "
+              f"{leitura:,.0f} leituras/s, {atualizacao:,.0f} atualizações/s")
+
+if __name__ == "__main__":
+    main()
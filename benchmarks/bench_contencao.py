@@ -0,0 +1,58 @@
+# benchmarks/bench_contencao.py
+"""Benchmark de contenção em trancar/destrancar com muitos clientes concorrentes.
+
+Compara clientes disputando a mesma tranca com clientes em trancas distintas;
+com locks listrados, o segundo cenário não deve perder vazão ao aumentar os clientes.
+
+Uso: python -m benchmarks.bench_contencao --clientes 64 --operacoes 2000
+"""
+
+import argparse
+import threading
+import time
+
+from app.errors import ErroOperacao
+from app.models import NovaTranca, StatusTranca
+from app.services import destrancar, restaurar_banco, trancar, tranca_service
+
+def ciclo(id_tranca: int, operacoes: int, conflitos: list):
+    """Alterna trancar e destrancar, contando as tentativas recusadas."""
+    for _ in range(operacoes):
+        for acao in (trancar, destrancar):
+            try:
+                acao(id_tranca)
+            except ErroOperacao:
+                conflitos[0] += 1
+
+def medir(clientes: int, operacoes: int, compartilhada: bool):
+    """Executa uma rodada e imprime a vazão."""
+    restaurar_banco()
+    trancas = [tranca_service.create(NovaTranca(numero=i, localizacao="a", anoDeFabricacao="2020",
+                                                 modelo="m", status=StatusTranca.LIVRE)).id
+               for i in range(1 if compartilhada else clientes)]
+    conflitos = [[0] for _ in range(clientes)]
+    threads = [threading.Thread(target=ciclo, args=(trancas[i % len(trancas)], operacoes, conflitos[i]))
+               for i in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    total = clientes * operacoes * 2
+    cenario = "mesma tranca" if compartilhada else "trancas distintas"
+    print(f"{clientes} clientes, {cenario}: {total / duracao:,.0f} ops/s "
+          f"({sum(c[0] for c in conflitos)} recusadas por status)")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--operacoes", type=int, default=2000)
+    args = parser.parse_args()
+    for clientes in args.clientes:
+        for compartilhada in (False, True):
+            medir(clientes, args.operacoes, compartilhada)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_espacial.py
+"""Benchmark da busca dos totens mais próximos: índice em grade contra a varredura de todos os totens.
+
+Espalha N totens numa área do tamanho de uma cidade e mede o tempo por consulta dos
+k mais próximos, com e sem o filtro de disponibilidade (metade dos totens aceitos).
+
+Uso: python -m benchmarks.bench_espacial --totens 10000 --consultas 20000 --k 5
+"""
+
+import argparse
+import heapq
+import random
+import time
+
+from app.spatial import IndiceEspacial, distancia_km
+
+# Retângulo aproximado do município do Rio de Janeiro
+LATITUDES = (-23.08, -22.75)
+LONGITUDES = (-43.79, -43.10)
+
+def varredura(pontos, lat, lon, k, aceitar=None):
+    """Busca de referência: calcula a distância a todos os pontos."""
+    candidatos = ((distancia_km(lat, lon, p_lat, p_lon), i) for i, (p_lat, p_lon) in pontos.items()
+                  if aceitar is None or aceitar(i))
+    return heapq.nsmallest(k, candidatos)
+
+def medir(buscar, consultas) -> float:
+    """Retorna os microssegundos por consulta."""
+    inicio = time.perf_counter()
+    for lat, lon in consultas:
+        buscar(lat, lon)
+    return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--totens", type=int, default=10_000)
+    parser.add_argument("--consultas", type=int, default=20_000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    indice = IndiceEspacial()
+    pontos = {i: (random.uniform(*LATITUDES), random.uniform(*LONGITUDES)) for i in range(args.totens)}
+    inicio = time.perf_counter()
+    for item_id, (lat, lon) in pontos.items():
+        indice.atualizar(item_id, lat, lon)
+    print(f"Indexação: {(time.perf_counter() - inicio) / args.totens * 1e6:.2f} µs por totem")
+
+    consultas = [(random.uniform(*LATITUDES), random.uniform(*LONGITUDES)) for _ in range(args.consultas)]
+    metade = lambda item_id: item_id % 2 == 0
+    grade = medir(lambda lat, lon: indice.proximos(lat, lon, args.k), consultas)
+    grade_filtro = medir(lambda lat, lon: indice.proximos(lat, lon, args.k, metade), consultas)
+    amostra = consultas[:max(1, args.consultas // 100)]
+    linear = medir(lambda lat, lon: varredura(pontos, lat, lon, args.k), amostra)
+    print(f"Grade: {grade:.1f} µs por consulta ({grade_filtro:.1f} µs com filtro de disponibilidade)")
+    print(f"Varredura: {linear:.1f} µs por consulta ({linear / grade:.0f}x mais lenta)")
+
+if __name__ == "__main__":
+    main()
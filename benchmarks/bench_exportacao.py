@@ -0,0 +1,49 @@
+# benchmarks/bench_exportacao.py
+"""Benchmark da exportação da frota: memória de pico e vazão, contra get_all() + um documento JSON.
+
+Uso: python -m benchmarks.bench_exportacao --entidades 100000 200000 400000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import pydantic_core
+
+from app.export import exportar
+from app.models import NovaBicicleta, StatusBicicleta
+from app.services import bicicleta_service, restaurar_banco
+
+def pico(funcao) -> tuple:
+    """Executa a função e retorna (segundos, memória de pico em MB alocada durante ela)."""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+    maximo = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duracao, maximo / 2 ** 20
+
+def consumir(blocos) -> int:
+    """Consome o gerador como um cliente HTTP faria, retornando o total de bytes."""
+    return sum(len(bloco) for bloco in blocos)
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entidades", type=int, nargs="+", default=[100_000, 200_000, 400_000])
+    args = parser.parse_args()
+    for quantidade in args.entidades:
+        restaurar_banco()
+        bicicleta_service.create_many([NovaBicicleta(marca="Caloi", modelo="Elite", ano="2023", numero=i,
+                                                     status=StatusBicicleta.DISPONIVEL) for i in range(quantidade)])
+        documento = pico(lambda: len(pydantic_core.to_json(bicicleta_service.get_all())))
+        ndjson = pico(lambda: consumir(exportar("ndjson", ["bicicleta"])))
+        csv_gzip = pico(lambda: consumir(exportar("csv", ["bicicleta"], gzip=True)))
+        print(f"{quantidade:,} bicicletas: documento {documento[1]:.1f} MB em {documento[0]:.2f} s; "
+              f"NDJSON {ndjson[1]:.1f} MB em {ndjson[0]:.2f} s; CSV+gzip {csv_gzip[1]:.1f} MB em {csv_gzip[0]:.2f} s")
+
+if __name__ == "__main__":
+    main()
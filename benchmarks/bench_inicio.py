@@ -0,0 +1,79 @@
+# benchmarks/bench_inicio.py
+"""Benchmark da subida a frio: import do app, inicialização e primeiras requisições.
+
+Cada medição roda num processo novo (como uma réplica recém-criada pelo autoscaler):
+importa app.main, executa a inicialização (lifespan) e faz a primeira e a segunda
+requisição a uma rota de cada recurso. Compara a subida com e sem o aquecimento das
+rotas (EQUIPAMENTO_AQUECER) e informa as medianas; com --limite, falha (código de
+saída 1) se o tempo até a primeira resposta passar do limite.
+
+Uso: python -m benchmarks.bench_inicio --repeticoes 5 --limite 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+CAMINHOS = ("/bicicleta/", "/tranca/", "/totem/", "/bicicleta/0", "/tranca/0/historico", "/rede/exportar")
+
+async def primeiras_requisicoes(app) -> Dict[str, float]:
+    """Executa a inicialização e duas rodadas de requisições; retorna as durações em segundos."""
+    import httpx
+    from app.main import lifespan
+    tempos = {}
+    inicio = time.perf_counter()
+    async with lifespan(app):
+        tempos["inicializacao"] = time.perf_counter() - inicio
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+            for rodada in ("primeira", "segunda"):
+                inicio = time.perf_counter()
+                for caminho in CAMINHOS:
+                    await cliente.get(caminho)
+                tempos[rodada] = time.perf_counter() - inicio
+    return tempos
+
+def filho() -> None:
+    """Mede a subida neste processo e imprime os tempos em JSON (o relatório do perfil vai para a saída de erro)."""
+    inicio = time.perf_counter()
+    from app.main import app
+    tempos = {"importacao": time.perf_counter() - inicio}
+    tempos.update(asyncio.run(primeiras_requisicoes(app)))
+    tempos["ate_primeira_resposta"] = tempos["importacao"] + tempos["inicializacao"] + tempos["primeira"]
+    print(json.dumps(tempos))
+
+def medir(ambiente: Dict[str, str]) -> Dict[str, float]:
+    """Roda uma medição num processo novo com as variáveis de ambiente informadas; inclui o tempo do processo."""
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, "-m", "benchmarks.bench_inicio", "--filho"], env={**os.environ, **ambiente},
+                           check=True, capture_output=True, text=True).stdout
+    tempos = json.loads(saida.strip().splitlines()[-1])
+    tempos["processo"] = time.perf_counter() - inicio
+    return tempos
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Mede a subida com e sem aquecimento e compara as medianas."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite", type=float, help="Tempo máximo (em segundos) até a primeira resposta")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.filho:
+        filho()
+        return 0
+    excedeu = False
+    for nome, aquecer in (("sem aquecimento", "0"), ("com aquecimento", "1")):
+        medicoes = [medir({"EQUIPAMENTO_AQUECER": aquecer, "EQUIPAMENTO_STORAGE": "memoria"})
+                    for _ in range(args.repeticoes)]
+        medianas = {chave: statistics.median(m[chave] for m in medicoes) for chave in medicoes[0]}
+        print(f"{nome}: " + ", ".join(f"{chave} {valor * 1000:.1f}ms" for chave, valor in medianas.items()), flush=True)
+        excedeu |= args.limite is not None and medianas["ate_primeira_resposta"] > args.limite
+    return 1 if excedeu else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# benchmarks/bench_lote.py
+"""Benchmark do cadastro de uma estação: requisições individuais contra os endpoints em lote.
+
+Cadastra N bicicletas e N trancas e depois altera o status de todas, primeiro com uma
+requisição por dispositivo e depois com POST /lote e POST /lote/status/{acao}.
+As requisições são feitas em processo, via ASGI, no armazenamento escolhido.
+
+Uso: python -m benchmarks.bench_lote --dispositivos 10000 --storage sqlite
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import httpx
+
+from app.main import app, configurar_storage
+from app.services import fechar_armazenamento, restaurar_banco
+
+BICICLETA = {"marca": "Caloi", "modelo": "Elite", "ano": "2023", "status": "NOVA"}
+TRANCA = {"localizacao": "Estação", "anoDeFabricacao": "2023", "modelo": "T1", "status": "NOVA"}
+
+async def individual(cliente: httpx.AsyncClient, quantidade: int):
+    """Uma requisição por dispositivo e por troca de status."""
+    for i in range(quantidade):
+        bicicleta = (await cliente.post("/bicicleta/", json={**BICICLETA, "numero": i})).json()
+        tranca = (await cliente.post("/tranca/", json={**TRANCA, "numero": i})).json()
+        await cliente.post(f"/bicicleta/{bicicleta['id']}/status/DISPONIVEL")
+        await cliente.post(f"/tranca/{tranca['id']}/status/DESTRANCAR")
+
+async def em_lote(cliente: httpx.AsyncClient, quantidade: int):
+    """Uma requisição por coleção para o cadastro e outra para o status."""
+    for colecao, corpo, acao in (("bicicleta", BICICLETA, "DISPONIVEL"), ("tranca", TRANCA, "DESTRANCAR")):
+        resposta = await cliente.post(f"/{colecao}/lote", json=[{**corpo, "numero": i} for i in range(quantidade)])
+        ids = [{"id": r["id"]} for r in resposta.json()["resultados"]]
+        resposta = await cliente.post(f"/{colecao}/lote/status/{acao}", json=ids)
+        assert resposta.json()["aplicados"] == quantidade
+
+async def medir(nome: str, cenario, quantidade: int):
+    """Executa um cenário a partir do banco vazio e imprime o tempo total."""
+    restaurar_banco()
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        inicio = time.perf_counter()
+        await cenario(cliente, quantidade)
+        duracao = time.perf_counter() - inicio
+    print(f"{nome}: {duracao:.2f} s ({2 * quantidade / duracao:,.0f} dispositivos/s)")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dispositivos", type=int, default=10000)
+    parser.add_argument("--storage", default="memoria", choices=["memoria", "log", "sqlite"])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as diretorio:
+        configurar_storage(args.storage, diretorio)
+        try:
+            asyncio.run(medir("individual", individual, args.dispositivos))
+            asyncio.run(medir("em lote", em_lote, args.dispositivos))
+        finally:
+            fechar_armazenamento()
+
+if __name__ == "__main__":
+    main()
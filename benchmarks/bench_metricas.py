@@ -0,0 +1,65 @@
+# benchmarks/bench_metricas.py
+"""Benchmark do custo da instrumentação: MetricasMiddleware e o decorador cronometrado.
+
+Mede, em microssegundos por chamada, a diferença entre uma aplicação ASGI mínima com
+e sem o middleware, e entre um GenericService.get_by_id com e sem o decorador.
+
+Uso: python -m benchmarks.bench_metricas --chamadas 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.metrics import MetricasMiddleware
+from app.models import Bicicleta, NovaBicicleta, StatusBicicleta
+from app.services import GenericService
+from app.storage import MemoryStore
+
+class _Rota:
+    path = "/bicicleta/{id_bicicleta}"
+
+async def _app_minima(scope, receive, send):
+    """Aplicação ASGI que apenas grava a rota no scope e responde 200, como o roteador faria."""
+    scope["route"] = _Rota
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def _medir_asgi(app, chamadas: int) -> float:
+    """Retorna os microssegundos por requisição simulada na aplicação."""
+    async def receber():
+        return {"type": "http.request", "body": b""}
+
+    async def enviar(_mensagem):
+        pass
+
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        await app({"type": "http", "method": "GET", "path": "/bicicleta/1"}, receber, enviar)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+def _medir_servico(obter, chamadas: int) -> float:
+    """Retorna os microssegundos por chamada de obter(1)."""
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        obter(1)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chamadas", type=int, default=200_000)
+    args = parser.parse_args()
+
+    sem = asyncio.run(_medir_asgi(_app_minima, args.chamadas))
+    com = asyncio.run(_medir_asgi(MetricasMiddleware(_app_minima), args.chamadas))
+    print(f"Middleware: {sem:.2f} µs sem, {com:.2f} µs com (+{com - sem:.2f} µs por requisição)")
+
+    servico = GenericService(MemoryStore(), Bicicleta, NovaBicicleta)
+    item_id = servico.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA)).id
+    sem = _medir_servico(lambda _: GenericService.get_by_id.__wrapped__(servico, item_id), args.chamadas)
+    com = _medir_servico(lambda _: servico.get_by_id(item_id), args.chamadas)
+    print(f"Operações: {sem:.2f} µs sem, {com:.2f} µs com (+{com - sem:.2f} µs por operação)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_serializacao.py
+"""Benchmark do custo de CPU por requisição das leituras (item e listagem).
+
+Compara a aplicação atual (JSON pré-serializado por versão) com handlers de mesma
+assinatura que devolvem os modelos e deixam o FastAPI validar e serializar via
+response_model, isolando o custo da serialização.
+O tempo é medido com `time.process_time`, em processo, via ASGI.
+
+Uso: python -m benchmarks.bench_serializacao --itens 1000 --requisicoes 5000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+import httpx
+from fastapi import Depends, FastAPI, Header, HTTPException
+
+from app.main import app as app_atual
+from app.models import Bicicleta, NovaBicicleta, StatusBicicleta
+from app.routers import ParametrosListagem
+from app.services import bicicleta_service, restaurar_banco
+
+app_base = FastAPI()
+
+@app_base.get("/bicicleta/{id_bicicleta}", response_model=Bicicleta)
+async def obter_bicicleta(id_bicicleta: int, if_none_match: Optional[str] = Header(None)):
+    """Handler equivalente ao anterior, serializando a cada requisição."""
+    bicicleta = bicicleta_service.get_by_id(id_bicicleta)
+    if not bicicleta:
+        raise HTTPException(status_code=404, detail="Bicicleta não encontrada")
+    return bicicleta
+
+@app_base.get("/bicicleta/", response_model=List[Bicicleta])
+async def listar_bicicletas(status: Optional[StatusBicicleta] = None, numero: Optional[int] = None,
+                            params: ParametrosListagem = Depends()):
+    """Handler equivalente ao anterior, serializando a página inteira a cada requisição."""
+    return bicicleta_service.get_page(params.cursor, params.limite, {})[0]
+
+async def medir(nome: str, app, ids: List[int], requisicoes: int, limite: int):
+    """Mede o tempo de CPU por requisição de GETs de item e de listagem."""
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        for rota, caminho in (("item", lambda i: f"/bicicleta/{ids[i % len(ids)]}"),
+                              ("lista", lambda i: f"/bicicleta/?limite={limite}")):
+            inicio = time.process_time()
+            for i in range(requisicoes):
+                resposta = await cliente.get(caminho(i))
+                assert resposta.status_code == 200
+            cpu = time.process_time() - inicio
+            print(f"{nome} {rota}: {cpu / requisicoes * 1e6:,.0f} µs de CPU por requisição")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--itens", type=int, default=1000)
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--limite", type=int, default=100)
+    args = parser.parse_args()
+    restaurar_banco()
+    ids = [bicicleta_service.create(NovaBicicleta(marca="a", modelo="b", ano="2020", numero=i,
+                                                  status=StatusBicicleta.DISPONIVEL)).id
+           for i in range(args.itens)]
+    asyncio.run(medir("response_model", app_base, ids, args.requisicoes, args.limite))
+    asyncio.run(medir("pré-serializado", app_atual, ids, args.requisicoes, args.limite))
+
+if __name__ == "__main__":
+    main()
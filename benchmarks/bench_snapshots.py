@@ -0,0 +1,48 @@
+# benchmarks/bench_snapshots.py
+"""Benchmark da volta a uma frota conhecida: restaurar um snapshot contra recriá-la.
+
+Carrega N bicicletas e trancas (e N/10 totens), salva um snapshot e compara o tempo de
+restaurá-lo com o de limpar o banco e recriar a mesma frota pelos serviços (em lote).
+
+Uso: python -m benchmarks.bench_snapshots --entidades 100000
+"""
+
+import argparse
+import time
+
+from app.models import NovaBicicleta, NovaTranca, NovoTotem, StatusBicicleta, StatusTranca
+from app.services import bicicleta_service, restaurar_banco, totem_service, tranca_service
+from app.snapshots import restaurar_snapshot, salvar_snapshot
+
+def criar_frota(quantidade: int) -> None:
+    """Cria a frota de teste pelos serviços, em lotes."""
+    totem_service.create_many([NovoTotem(localizacao="Estação", descricao=f"Totem {i}", latitude=-22.9,
+                                         longitude=-43.2) for i in range(quantidade // 10)])
+    tranca_service.create_many([NovaTranca(numero=i, localizacao="Estação", anoDeFabricacao="2023", modelo="T1",
+                                           status=StatusTranca.LIVRE) for i in range(quantidade)])
+    bicicleta_service.create_many([NovaBicicleta(marca="Caloi", modelo="Elite", ano="2023", numero=i,
+                                                 status=StatusBicicleta.DISPONIVEL) for i in range(quantidade)])
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entidades", type=int, default=100_000)
+    args = parser.parse_args()
+
+    restaurar_banco()
+    inicio = time.perf_counter()
+    criar_frota(args.entidades)
+    recriar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    salvar_snapshot("bench")
+    salvar = time.perf_counter() - inicio
+    restaurar_banco()
+    inicio = time.perf_counter()
+    restaurar_snapshot("bench")
+    restaurar = time.perf_counter() - inicio
+    print(f"Recriar a frota: {recriar * 1000:,.1f} ms; salvar snapshot: {salvar * 1000:,.1f} ms; "
+          f"restaurar snapshot: {restaurar * 1000:,.1f} ms ({recriar / restaurar:,.0f}x mais rápido)")
+
+if __name__ == "__main__":
+    main()
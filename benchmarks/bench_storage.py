@@ -0,0 +1,62 @@
+# benchmarks/bench_storage.py
+"""Benchmark do LogStore: vazão de escrita e tempo de reinício.
+
+Uso: python -m benchmarks.bench_storage --registros 1000000 --threads 8
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+
+from app.models import Bicicleta, StatusBicicleta
+from app.storage import LogStore
+
+def escrever(store: LogStore, inicio: int, fim: int):
+    """Grava as bicicletas com IDs no intervalo [inicio, fim)."""
+    for item_id in range(inicio, fim):
+        store.put(Bicicleta(id=item_id, marca="Caloi", modelo="10", ano="2020",
+                            numero=item_id, status=StatusBicicleta.DISPONIVEL))
+
+def medir(registros: int, threads: int, aguardar_fsync: bool, diretorio: str):
+    """Mede escrita concorrente, reinício pela cauda do log e reinício após compactação."""
+    store = LogStore(diretorio, "bicicletas", Bicicleta, registros_por_snapshot=registros * 2,
+                     aguardar_fsync=aguardar_fsync)
+    fatia = registros // threads
+    trabalhadores = [threading.Thread(target=escrever, args=(store, i * fatia + 1, (i + 1) * fatia + 1))
+                     for i in range(threads)]
+    inicio = time.perf_counter()
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    store.close()
+    escrita = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    store = LogStore(diretorio, "bicicletas", Bicicleta, aguardar_fsync=aguardar_fsync)
+    reinicio_log = time.perf_counter() - inicio
+    store.compactar()
+    store.close()
+
+    inicio = time.perf_counter()
+    LogStore(diretorio, "bicicletas", Bicicleta).close()
+    reinicio_snapshot = time.perf_counter() - inicio
+
+    total = fatia * threads
+    print(f"aguardar_fsync={aguardar_fsync}: {total} escritas em {escrita:.2f}s "
+          f"({total / escrita:,.0f}/s); reinício pelo log {reinicio_log:.2f}s; "
+          f"reinício pelo snapshot {reinicio_snapshot:.2f}s")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--registros", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    for aguardar_fsync in (False, True):
+        with tempfile.TemporaryDirectory() as diretorio:
+            medir(args.registros, args.threads, aguardar_fsync, diretorio)
+
+if __name__ == "__main__":
+    main()
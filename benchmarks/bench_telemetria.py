@@ -0,0 +1,73 @@
+# benchmarks/bench_telemetria.py
+"""Benchmark da ingestão de telemetria das trancas: vazão do endpoint em lote e do processamento.
+
+Cadastra N trancas e envia lotes de heartbeats (`[idTranca, trancada, idBicicleta, falhas]`)
+a POST /tranca/telemetria pelo app em processo (via ASGI, sem rede), com cerca de 1% das
+leituras mudando o estado da tranca. Informa as leituras aceitas por segundo no endpoint
+e, ponta a ponta, até a thread de fundo terminar de coalescer e aplicar todas.
+
+Uso: python -m benchmarks.bench_telemetria --trancas 10000 --leituras 1000000 --lote 1000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from app.main import app
+from app.models import NovaTranca, StatusTranca
+from app.services import restaurar_banco, tranca_service
+from app.telemetry import telemetria
+
+def gerar_lotes(ids, leituras: int, lote: int):
+    """Gera os corpos JSON dos lotes; ~1% das leituras troca o estado da tranca."""
+    estados = {item_id: 0 for item_id in ids}
+    corpos = []
+    for _ in range(leituras // lote):
+        itens = []
+        for item_id in random.choices(ids, k=lote):
+            if random.random() < 0.01:
+                estados[item_id] ^= 1
+            itens.append([item_id, estados[item_id], None, 0])
+        corpos.append(json.dumps(itens, separators=(",", ":")).encode())
+    return corpos
+
+async def enviar(corpos) -> float:
+    """Envia os lotes em sequência; retorna a duração em segundos."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+        inicio = time.perf_counter()
+        for corpo in corpos:
+            resposta = await cliente.post("/tranca/telemetria", content=corpo)
+            while resposta.status_code == 503:  # buffer cheio: espera a thread de fundo alcançar
+                await asyncio.sleep(0.01)
+                resposta = await cliente.post("/tranca/telemetria", content=corpo)
+            resposta.raise_for_status()
+        return time.perf_counter() - inicio
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trancas", type=int, default=10_000)
+    parser.add_argument("--leituras", type=int, default=1_000_000)
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args()
+    random.seed(0)
+    restaurar_banco()
+    ids = [t.id for t in tranca_service.create_many(
+        [NovaTranca(numero=i, localizacao="", anoDeFabricacao="2023", modelo="T", status=StatusTranca.LIVRE)
+         for i in range(args.trancas)])]
+    corpos = gerar_lotes(ids, args.leituras, args.lote)
+    total = len(corpos) * args.lote
+
+    duracao = asyncio.run(enviar(corpos))
+    inicio = time.perf_counter()
+    telemetria.parar()
+    pendentes = time.perf_counter() - inicio
+    print(f"endpoint: {total / duracao:,.0f} leituras/s ({total:,} em lotes de {args.lote}); "
+          f"ponta a ponta com o processamento: {total / (duracao + pendentes):,.0f} leituras/s")
+
+if __name__ == "__main__":
+    main()
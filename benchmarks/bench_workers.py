@@ -0,0 +1,79 @@
+# benchmarks/bench_workers.py
+"""Benchmark de escalabilidade do modo compartilhado com 1 a 8 workers uvicorn.
+
+Sobe o app com EQUIPAMENTO_STORAGE=sqlite, dispara POST /bicicleta/ e GET /bicicleta/{id}
+em paralelo durante alguns segundos e verifica que nenhum ID foi repetido entre workers.
+
+Uso: python -m benchmarks.bench_workers --workers 1 2 4 8 --clientes 32 --duracao 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+CORPO = {"marca": "Caloi", "modelo": "Elite", "ano": "2023", "numero": 1, "status": "NOVA"}
+
+def aguardar_servidor(url: str, limite: float = 30.0):
+    """Espera o servidor responder na rota raiz."""
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("servidor não subiu a tempo")
+
+def cliente(url: str, fim: float, ids: list, contagem: list):
+    """Alterna criação e leitura de bicicletas até o fim do intervalo."""
+    with httpx.Client(base_url=url, timeout=10.0) as http:
+        while time.monotonic() < fim:
+            item_id = http.post("/bicicleta/", json=CORPO).json()["id"]
+            http.get(f"/bicicleta/{item_id}").raise_for_status()
+            ids.append(item_id)
+            contagem[0] += 2
+
+def medir(workers: int, clientes: int, duracao: float, porta: int):
+    """Executa uma rodada com o número de workers informado."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        ambiente = dict(os.environ, EQUIPAMENTO_STORAGE="sqlite", EQUIPAMENTO_DADOS=diretorio)
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta),
+             "--workers", str(workers), "--log-level", "warning"], env=ambiente)
+        url = f"http://127.0.0.1:{porta}"
+        try:
+            aguardar_servidor(url)
+            ids, contagens = [], [[0] for _ in range(clientes)]
+            fim = time.monotonic() + duracao
+            threads = [threading.Thread(target=cliente, args=(url, fim, ids, contagens[i]))
+                       for i in range(clientes)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            servidor.terminate()
+            servidor.wait()
+    total = sum(c[0] for c in contagens)
+    duplicados = len(ids) - len(set(ids))
+    print(f"{workers} worker(s): {total / duracao:,.0f} req/s, {len(ids)} bicicletas, {duplicados} IDs duplicados")
+
+def main():
+    """Executa o benchmark com os parâmetros da linha de comando."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+    for workers in args.workers:
+        medir(workers, args.clientes, args.duracao, args.porta)
+
+if __name__ == "__main__":
+    main()
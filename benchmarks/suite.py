@@ -0,0 +1,228 @@
+# benchmarks/suite.py
+"""Suíte de benchmarks da API: CRUD, listagens por tamanho de frota, contenção e restauração.
+
+Roda contra o app em processo (via ASGI, sem rede) ou contra um uvicorn local,
+iniciado pela própria suíte. Para cada cenário informa vazão, percentis de latência
+e memória residente; os resultados podem ser salvos como baseline em JSON e
+comparados com uma baseline anterior, falhando (código de saída 1) se alguma
+métrica piorar mais que o limite configurado.
+
+Uso:
+    python -m benchmarks --tamanhos 1000 10000 100000 1000000 --salvar baseline.json
+    python -m benchmarks --modo uvicorn --comparar baseline.json --limite-regressao 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_workers import aguardar_servidor
+
+Resultado = Dict[str, float]
+
+# Métricas em que um valor maior é melhor; nas demais (latência, duração, memória), menor é melhor
+METRICAS_MAIOR_MELHOR = {"vazao"}
+TAMANHO_LOTE_CARGA = 10_000
+BICICLETA = {"marca": "Caloi", "modelo": "Elite", "ano": "2023", "status": "DISPONIVEL"}
+TRANCA = {"localizacao": "Estação", "anoDeFabricacao": "2023", "modelo": "T1", "status": "LIVRE"}
+
+def memoria_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Retorna a memória residente do processo em MB (None fora do Linux)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", encoding="ascii") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+async def carga(fazer: Callable[[int], Awaitable[httpx.Response]], total: int, concorrencia: int) -> Resultado:
+    """Executa `fazer(i)` para i em [0, total) com `concorrencia` tarefas; mede vazão e latências."""
+    latencias: List[float] = []
+    erros = 0
+    proximo = iter(range(total))
+
+    async def trabalhador():
+        nonlocal erros
+        for i in proximo:
+            inicio = time.perf_counter()
+            resposta = await fazer(i)
+            latencias.append(time.perf_counter() - inicio)
+            erros += resposta.status_code >= 500
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    quantis = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+    return {"vazao": total / duracao, "p50_ms": quantis[49] * 1000, "p95_ms": quantis[94] * 1000,
+            "p99_ms": quantis[98] * 1000, "erros": erros}
+
+async def carregar_frota(cliente: httpx.AsyncClient, colecao: str, corpo: dict, quantidade: int) -> List[int]:
+    """Cadastra `quantidade` itens pelos endpoints em lote e retorna seus IDs."""
+    ids: List[int] = []
+    for inicio in range(0, quantidade, TAMANHO_LOTE_CARGA):
+        lote = [{**corpo, "numero": i} for i in range(inicio, min(inicio + TAMANHO_LOTE_CARGA, quantidade))]
+        resposta = await cliente.post(f"/{colecao}/lote", json=lote)
+        resposta.raise_for_status()
+        ids.extend(r["id"] for r in resposta.json()["resultados"])
+    return ids
+
+async def cenario_crud(cliente: httpx.AsyncClient, args) -> Dict[str, Resultado]:
+    """Cria, lê, atualiza e remove bicicletas, uma requisição por operação."""
+    await cliente.get("/restaurarBanco")
+    ids: List[int] = []
+
+    async def criar(i: int):
+        resposta = await cliente.post("/bicicleta/", json={**BICICLETA, "numero": i})
+        ids.append(resposta.json()["id"])
+        return resposta
+
+    resultados = {"crud.criar": await carga(criar, args.requisicoes, args.concorrencia)}
+    resultados["crud.obter"] = await carga(lambda i: cliente.get(f"/bicicleta/{ids[i % len(ids)]}"),
+                                           args.requisicoes, args.concorrencia)
+    resultados["crud.atualizar"] = await carga(
+        lambda i: cliente.put(f"/bicicleta/{ids[i % len(ids)]}", json={"numero": i}), args.requisicoes, args.concorrencia)
+    resultados["crud.remover"] = await carga(lambda i: cliente.delete(f"/bicicleta/{ids[i]}"),
+                                             len(ids), args.concorrencia)
+    return resultados
+
+async def cenario_listagem(cliente: httpx.AsyncClient, args, tamanho: int) -> Dict[str, Resultado]:
+    """Lista páginas de uma frota de `tamanho` bicicletas, com cursores aleatórios e filtro por status."""
+    await cliente.get("/restaurarBanco")
+    inicio = time.perf_counter()
+    ids = await carregar_frota(cliente, "bicicleta", BICICLETA, tamanho)
+    prefixo = f"listagem.{tamanho}"
+    resultados = {f"{prefixo}.carga": {"vazao": tamanho / (time.perf_counter() - inicio)}}
+    cursores = [random.choice(ids) for _ in range(args.requisicoes)]
+    resultados[f"{prefixo}.pagina"] = await carga(
+        lambda i: cliente.get(f"/bicicleta/?cursor={cursores[i]}&limite=100"), args.requisicoes, args.concorrencia)
+    resultados[f"{prefixo}.filtro"] = await carga(
+        lambda i: cliente.get(f"/bicicleta/?status=DISPONIVEL&cursor={cursores[i]}&limite=100"),
+        args.requisicoes, args.concorrencia)
+    return resultados
+
+async def cenario_contencao(cliente: httpx.AsyncClient, args) -> Dict[str, Resultado]:
+    """Tranca e destranca poucas trancas a partir de muitas tarefas concorrentes."""
+    await cliente.get("/restaurarBanco")
+    trancas = await carregar_frota(cliente, "tranca", TRANCA, 8)
+    bicicletas = await carregar_frota(cliente, "bicicleta", BICICLETA, 8)
+
+    async def alternar(i: int):
+        acao = "trancar" if i % 2 == 0 else "destrancar"
+        return await cliente.post(f"/tranca/{trancas[i % len(trancas)]}/{acao}",
+                                  json={"bicicleta": bicicletas[i % len(bicicletas)]})
+
+    return {"contencao.trancar_destrancar": await carga(alternar, args.requisicoes, args.concorrencia)}
+
+async def cenario_restaurar(cliente: httpx.AsyncClient, args, tamanho: int) -> Dict[str, Resultado]:
+    """Mede o tempo de GET /restaurarBanco com uma frota de `tamanho` bicicletas e trancas."""
+    duracoes = []
+    for _ in range(3):
+        await carregar_frota(cliente, "bicicleta", BICICLETA, tamanho)
+        await carregar_frota(cliente, "tranca", TRANCA, tamanho)
+        inicio = time.perf_counter()
+        (await cliente.get("/restaurarBanco")).raise_for_status()
+        duracoes.append(time.perf_counter() - inicio)
+    return {f"restaurar.{tamanho}": {"duracao_ms": statistics.median(duracoes) * 1000}}
+
+async def executar_suite(cliente: httpx.AsyncClient, args, memoria: Callable[[], Optional[float]]) -> Dict[str, Resultado]:
+    """Executa os cenários selecionados, anotando a memória residente após cada um."""
+    etapas: List[Callable[[], Awaitable[Dict[str, Resultado]]]] = []
+    if "crud" in args.cenarios:
+        etapas.append(lambda: cenario_crud(cliente, args))
+    if "listagem" in args.cenarios:
+        etapas.extend(lambda t=t: cenario_listagem(cliente, args, t) for t in args.tamanhos)
+    if "contencao" in args.cenarios:
+        etapas.append(lambda: cenario_contencao(cliente, args))
+    if "restaurar" in args.cenarios:
+        etapas.extend(lambda t=t: cenario_restaurar(cliente, args, t) for t in args.tamanhos)
+
+    resultados: Dict[str, Resultado] = {}
+    for etapa in etapas:
+        parciais = await etapa()
+        mb = memoria()
+        for nome, resultado in parciais.items():
+            if mb is not None:
+                resultado["memoria_mb"] = mb
+            print(f"{nome}: " + ", ".join(f"{chave} {valor:,.2f}" for chave, valor in resultado.items()), flush=True)
+        resultados.update(parciais)
+    await cliente.get("/restaurarBanco")
+    return resultados
+
+async def em_processo(args) -> Dict[str, Resultado]:
+    """Executa a suíte contra o app importado neste processo."""
+    from app.main import app
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        return await executar_suite(cliente, args, memoria_mb)
+
+def com_uvicorn(args) -> Dict[str, Resultado]:
+    """Sobe um uvicorn local com o app e executa a suíte contra ele por HTTP."""
+    servidor = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.porta),
+                                 "--log-level", "warning"])
+    url = f"http://127.0.0.1:{args.porta}"
+    try:
+        aguardar_servidor(url)
+
+        async def rodar():
+            limites = httpx.Limits(max_connections=args.concorrencia)
+            async with httpx.AsyncClient(base_url=url, timeout=None, limits=limites) as cliente:
+                return await executar_suite(cliente, args, lambda: memoria_mb(servidor.pid))
+        return asyncio.run(rodar())
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+def comparar(atual: Dict[str, Resultado], baseline: Dict[str, Resultado], limite: float) -> List[str]:
+    """Retorna as métricas que pioraram mais que `limite` (fração) em relação à baseline."""
+    regressoes = []
+    for nome, metricas in atual.items():
+        for chave, valor in metricas.items():
+            anterior = baseline.get(nome, {}).get(chave)
+            if chave == "erros" or not anterior:
+                continue
+            variacao = (anterior - valor) / anterior if chave in METRICAS_MAIOR_MELHOR else (valor - anterior) / anterior
+            if variacao > limite:
+                regressoes.append(f"{nome}.{chave}: {anterior:,.2f} -> {valor:,.2f} ({variacao:+.0%} pior)")
+    return regressoes
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Executa a suíte com os parâmetros da linha de comando; retorna 1 se houver regressão."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", choices=["processo", "uvicorn"], default="processo")
+    parser.add_argument("--cenarios", nargs="+", default=["crud", "listagem", "contencao", "restaurar"],
+                        choices=["crud", "listagem", "contencao", "restaurar"])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Requisições por medição")
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--salvar", help="Grava os resultados neste arquivo JSON (baseline)")
+    parser.add_argument("--comparar", help="Compara os resultados com esta baseline JSON")
+    parser.add_argument("--limite-regressao", type=float, default=0.25,
+                        help="Piora máxima tolerada, como fração (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    random.seed(0)
+
+    resultados = asyncio.run(em_processo(args)) if args.modo == "processo" else com_uvicorn(args)
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": {"python": platform.python_version(), "plataforma": platform.platform(),
+                                    "modo": args.modo, "cpus": os.cpu_count()},
+                       "resultados": resultados}, arquivo, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo)["resultados"], args.limite_regressao)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        if regressoes:
+            return 1
+        print("Sem regressões acima do limite.")
+    return 0
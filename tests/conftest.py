@@ -0,0 +1,17 @@
+"""Configuração compartilhada dos testes.
+
+Com EQUIPAMENTO_STORAGE=sqlite (ou log), toda a suíte roda contra esse armazenamento.
+"""
+
+import os
+import pytest
+from app.main import configurar_storage
+from app.services import fechar_armazenamento
+
+@pytest.fixture(scope="session", autouse=True)
+def armazenamento(tmp_path_factory):
+    """Configura o armazenamento escolhido por variável de ambiente para a sessão de testes."""
+    tipo = os.getenv("EQUIPAMENTO_STORAGE", "memoria")
+    configurar_storage(tipo, str(tmp_path_factory.mktemp("dados")))
+    yield tipo
+    fechar_armazenamento()
@@ -0,0 +1,86 @@
+"""Testes do controle de admissão (limites de taxa, filas por prioridade e respostas 429/503)."""
+
+import asyncio
+import anyio
+import httpx
+from fastapi import FastAPI
+from app.admission import CLASSES_ROTA, AdmissaoMiddleware, ControleConcorrencia, LimiteTaxa, Sobrecarga
+
+def test_limite_taxa_admite_rajada_e_informa_espera():
+    """Testa se o balde admite a rajada e depois informa quanto falta para a próxima ficha."""
+    limite = LimiteTaxa(taxa=1.0, rajada=2)
+    assert limite.consumir("totem") == 0
+    assert limite.consumir("totem") == 0
+    assert 0 < limite.consumir("totem") <= 1
+    assert limite.consumir("outro") == 0
+
+def test_comandos_passam_na_frente_das_leituras():
+    """Testa se, ao liberar uma vaga, a fila de maior prioridade é atendida primeiro."""
+    async def disputar():
+        controle = ControleConcorrencia(limite_total=1, espera_maxima=5)
+        ordem = []
+
+        async def pedir(classe):
+            await controle.entrar(CLASSES_ROTA[classe])
+            ordem.append(classe)
+            controle.sair(CLASSES_ROTA[classe])
+
+        await controle.entrar(CLASSES_ROTA["leitura"])
+        tarefas = [asyncio.create_task(pedir(classe)) for classe in ("dispositivo", "leitura", "comando")]
+        await asyncio.sleep(0.01)
+        assert controle.aguardando == {"dispositivo": 1, "leitura": 1, "comando": 1}
+        controle.sair(CLASSES_ROTA["leitura"])
+        await asyncio.gather(*tarefas)
+        assert ordem == ["comando", "leitura", "dispositivo"]
+        assert controle.total == 0
+
+    anyio.run(disputar)
+
+def test_espera_esgotada_recusa_com_503():
+    """Testa se quem espera mais que o limite é recusado e sai da fila."""
+    async def esperar():
+        controle = ControleConcorrencia(limite_total=1, espera_maxima=0.01)
+        await controle.entrar(CLASSES_ROTA["escrita"])
+        try:
+            await controle.entrar(CLASSES_ROTA["escrita"])
+        except Sobrecarga as recusa:
+            assert recusa.status_code == 503
+        else:
+            raise AssertionError("deveria recusar")
+        assert controle.aguardando["escrita"] == 0
+
+    anyio.run(esperar)
+
+def test_middleware_recusa_excesso_com_retry_after():
+    """Testa as respostas 429 (taxa do totem) e 503 (fila cheia) do middleware."""
+    interno = FastAPI()
+    liberar = asyncio.Event()
+
+    @interno.get("/totem/{id_totem}/trancas")
+    async def trancas(id_totem: int):
+        return []
+
+    @interno.get("/bicicleta/")
+    async def lenta():
+        await liberar.wait()
+        return []
+
+    async def requisitar():
+        app = AdmissaoMiddleware(interno, taxa_totem=1.0, concorrencia=1, espera_maxima=5)
+        app.concorrencia.limites["leitura"] = 1
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+            respostas = [await cliente.get("/totem/1/trancas") for _ in range(3)]
+            assert [r.status_code for r in respostas] == [200, 200, 429]
+            assert int(respostas[2].headers["Retry-After"]) >= 1
+            assert (await cliente.get("/totem/2/trancas")).status_code == 200
+
+            fila = CLASSES_ROTA["leitura"].fila
+            lentas = [asyncio.create_task(cliente.get("/bicicleta/")) for _ in range(fila + 1)]
+            await asyncio.sleep(0.05)
+            recusada = await cliente.get("/bicicleta/")
+            assert recusada.status_code == 503
+            assert recusada.headers["Retry-After"] == "1"
+            liberar.set()
+            assert {r.status_code for r in await asyncio.gather(*lentas)} == {200}
+
+    anyio.run(requisitar)
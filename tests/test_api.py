@@ -2,10 +2,12 @@
 """Módulo de testes de integração para os endpoints da API."""
 
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
+from app.errors import ErroOperacao
 from app.main import app
-from app.services import restaurar_banco, bicicleta_service, tranca_service
-from app.models import StatusBicicleta, NovaBicicleta, NovaTranca, StatusTranca, AcaoTranca
+from app.services import restaurar_banco, bicicleta_service, tranca_service, totem_service, trancar
+from app.models import StatusBicicleta, NovaBicicleta, NovaTranca, StatusTranca, AcaoTranca, NovoTotem, Totem
 
 client = TestClient(app)
 
@@ -112,3 +114,188 @@ def test_trancar_e_destrancar():
     assert tranca_livre is not None
     assert tranca_livre.status == StatusTranca.LIVRE
     assert tranca_livre.bicicleta is None
+
+def test_listar_trancas_e_bicicletas_do_totem():
+    """Testa os endpoints de trancas e bicicletas de um totem."""
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="a",modelo="b",ano="c",numero=1,status=StatusBicicleta.DISPONIVEL))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="a", anoDeFabricacao="a", modelo="a", status=StatusTranca.LIVRE))
+    totem = totem_service.create(NovoTotem(localizacao="Ponto X", descricao="Desc Y"))
+    totem_service.update(totem.id, Totem(id=totem.id, localizacao="Ponto X", descricao="Desc Y", trancas=[tranca.id]))
+    client.post(f"/tranca/{tranca.id}/trancar", json={"bicicleta": bicicleta.id})
+
+    response_trancas = client.get(f"/totem/{totem.id}/trancas")
+    assert response_trancas.status_code == 200
+    assert [t["id"] for t in response_trancas.json()] == [tranca.id]
+    assert client.get(f"/totem/{totem.id}/trancas", params={"status": "LIVRE"}).json() == []
+
+    response_bicicletas = client.get(f"/totem/{totem.id}/bicicletas")
+    assert [b["id"] for b in response_bicicletas.json()] == [bicicleta.id]
+    assert client.get("/totem/999/trancas").status_code == 404
+
+def test_listar_bicicletas_paginado_filtrado_e_projetado():
+    """Testa cursor, filtros por índice e projeção de campos na listagem."""
+    ids = [bicicleta_service.create(NovaBicicleta(marca="a", modelo="b", ano="c", numero=n,
+                                                  status=StatusBicicleta.DISPONIVEL if n % 2 else StatusBicicleta.NOVA)).id
+           for n in range(5)]
+
+    pagina = client.get("/bicicleta/", params={"limite": 2})
+    assert [b["id"] for b in pagina.json()] == ids[:2]
+    cursor = pagina.headers["X-Proximo-Cursor"]
+    resto = client.get("/bicicleta/", params={"limite": 10, "cursor": cursor})
+    assert [b["id"] for b in resto.json()] == ids[2:]
+    assert "X-Proximo-Cursor" not in resto.headers
+
+    disponiveis = client.get("/bicicleta/", params={"status": "DISPONIVEL", "fields": "id,numero"})
+    assert disponiveis.json() == [{"id": ids[1], "numero": 1}, {"id": ids[3], "numero": 3}]
+    assert client.get("/bicicleta/", params={"fields": "inexistente"}).status_code == 422
+
+def test_listar_trancas_ndjson():
+    """Testa a listagem em streaming NDJSON."""
+    for n in range(3):
+        tranca_service.create(NovaTranca(numero=n, localizacao="a", anoDeFabricacao="a", modelo="a", status=StatusTranca.LIVRE))
+    response = client.get("/tranca/", params={"formato": "ndjson", "limite": 1, "numero": 2})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    linhas = response.text.splitlines()
+    assert len(linhas) == 1 and '"numero":2' in linhas[0]
+
+def test_if_match_em_put_e_status():
+    """Testa ETag e atualização condicional com If-Match."""
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="a",modelo="b",ano="c",numero=1,status=StatusBicicleta.NOVA))
+    etag = client.get(f"/bicicleta/{bicicleta.id}").headers["ETag"]
+
+    response_put = client.put(f"/bicicleta/{bicicleta.id}", json={"marca": "Caloi"}, headers={"If-Match": etag})
+    assert response_put.status_code == 200
+    assert response_put.headers["ETag"] != etag
+
+    response_obsoleto = client.post(f"/bicicleta/{bicicleta.id}/status/EM_USO", headers={"If-Match": etag})
+    assert response_obsoleto.status_code == 412
+    assert response_obsoleto.headers["ETag"] == response_put.headers["ETag"]
+
+def test_trancar_concorrente_apenas_um_vence():
+    """Testa se, com várias threads trancando a mesma tranca, apenas uma consegue."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="a", anoDeFabricacao="a", modelo="a", status=StatusTranca.LIVRE))
+
+    def tentar(_):
+        try:
+            trancar(tranca.id)
+            return True
+        except ErroOperacao:
+            return False
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        resultados = list(executor.map(tentar, range(64)))
+    assert resultados.count(True) == 1
+    assert tranca_service.get_by_id(tranca.id).versao == 2
+
+def test_get_condicional_detalhe_e_listagem():
+    """Testa respostas 304 com If-None-Match e a invalidação do cache após escrita."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="a", anoDeFabricacao="a", modelo="a", status=StatusTranca.LIVRE))
+    primeira = client.get(f"/tranca/{tranca.id}")
+    etag = primeira.headers["ETag"]
+    assert client.get(f"/tranca/{tranca.id}", headers={"If-None-Match": etag}).status_code == 304
+
+    lista = client.get("/tranca/")
+    etag_lista = lista.headers["ETag"]
+    assert client.get("/tranca/", headers={"If-None-Match": etag_lista}).status_code == 304
+
+    client.put(f"/tranca/{tranca.id}", json={"modelo": "novo"})
+    atualizada = client.get(f"/tranca/{tranca.id}", headers={"If-None-Match": etag})
+    assert atualizada.status_code == 200
+    assert atualizada.json()["modelo"] == "novo"
+    nova_lista = client.get("/tranca/", headers={"If-None-Match": etag_lista})
+    assert nova_lista.status_code == 200
+    assert nova_lista.json()[0]["modelo"] == "novo"
+
+def test_lotes_de_criacao_e_status():
+    """Testa a criação e a troca de status em lote, atômicas ou com relatório por item."""
+    nova = {"marca": "Caloi", "modelo": "Elite", "ano": "2023", "status": "NOVA"}
+    response = client.post("/bicicleta/lote", json=[{**nova, "numero": i} for i in range(3)])
+    assert response.status_code == 200
+    ids = [r["id"] for r in response.json()["resultados"]]
+    assert len(ids) == 3 and len(bicicleta_service.get_all()) == 3
+
+    # Lote atômico com um item inválido: nada é criado
+    response = client.post("/bicicleta/lote", json=[{**nova, "numero": 10}, {"marca": "X"}])
+    assert response.status_code == 422
+    assert [r["status"] for r in response.json()["resultados"]] == [409, 422]
+    assert len(bicicleta_service.get_all()) == 3
+
+    # NDJSON item a item: o inválido é reportado e os demais são criados
+    corpo = '{"marca":"A","modelo":"B","ano":"2020","numero":20,"status":"NOVA"}\n{"numero":"x"}\n'
+    response = client.post("/bicicleta/lote?atomico=false", content=corpo,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 207
+    assert response.json()["aplicados"] == 1 and len(bicicleta_service.get_all()) == 4
+
+    # Status em lote com uma versão desatualizada e um ID inexistente
+    lote = [{"id": ids[0]}, {"id": ids[1], "versao": 1}, {"id": ids[2], "versao": 7}, {"id": 999}]
+    response = client.post("/bicicleta/lote/status/DISPONIVEL", json=lote)
+    assert response.status_code == 422
+    assert bicicleta_service.get_by_id(ids[0]).status == StatusBicicleta.NOVA
+
+    response = client.post("/bicicleta/lote/status/DISPONIVEL?atomico=false", json=lote)
+    assert response.status_code == 207
+    assert [r["status"] for r in response.json()["resultados"]] == [200, 200, 412, 404]
+    assert [b.status for b in bicicleta_service.find("status", StatusBicicleta.DISPONIVEL)] == [StatusBicicleta.DISPONIVEL] * 2
+
+    response = client.put("/tranca/lote", json=[{"id": 999, "modelo": "M2"}])
+    assert response.status_code == 422
+
+def test_lote_atomico_com_id_repetido():
+    """Testa se um lote atômico que altera o mesmo item duas vezes aplica as duas alterações."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2022", modelo="m", status=StatusTranca.NOVA))
+    response = client.put("/tranca/lote", json=[{"id": tranca.id, "modelo": "x"}, {"id": tranca.id, "status": "LIVRE"}])
+    assert response.status_code == 200
+    atualizada = tranca_service.get_by_id(tranca.id)
+    assert (atualizada.versao, atualizada.modelo, atualizada.status) == (3, "x", StatusTranca.LIVRE)
+
+def test_resumo_da_rede_e_do_totem():
+    """Testa as contagens por status servidas pelos endpoints de resumo."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.LIVRE))
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.DISPONIVEL))
+    totem = totem_service.create(NovoTotem(localizacao="Origem", descricao="Desc"))
+    totem_service.update(totem.id, {"trancas": [tranca.id]})
+    client.post(f"/tranca/{tranca.id}/trancar", json={"bicicleta": bicicleta.id})
+
+    resumo = client.get("/rede/resumo").json()
+    assert resumo["trancas"]["OCUPADA"] == 1 and resumo["trancas"]["LIVRE"] == 0
+    assert resumo["totens"][str(totem.id)]["bicicletas"]["DISPONIVEL"] == 1
+    assert "totens" not in client.get("/rede/resumo?totens=false").json()
+    assert client.get(f"/totem/{totem.id}/resumo").json()["trancas"]["OCUPADA"] == 1
+    assert client.get("/totem/999/resumo").status_code == 404
+
+def test_metrics_expoe_rotas_operacoes_e_colecoes():
+    """Testa se /metrics traz o histograma por rota, as operações dos serviços e os medidores."""
+    item_id = client.post("/bicicleta/", json={"marca": "A", "modelo": "B", "ano": "2020", "numero": 1, "status": "NOVA"}).json()["id"]
+    client.get(f"/bicicleta/{item_id}")
+    client.get("/bicicleta/999999")
+    client.put(f"/bicicleta/{item_id}", json={"modelo": "C"})
+
+    texto = client.get("/metrics").text
+    assert 'equipamento_http_requisicoes_total{metodo="GET",rota="/bicicleta/{id_bicicleta}",status="404"}' in texto
+    assert 'equipamento_http_duracao_segundos_bucket{metodo="POST",rota="/bicicleta/",le="+Inf"}' in texto
+    assert 'equipamento_operacao_duracao_segundos_count{colecao="Bicicleta",operacao="create"}' in texto
+    assert 'equipamento_lock_espera_segundos_count{colecao="Bicicleta"}' in texto
+    assert 'equipamento_colecao_itens{colecao="Bicicleta"} 1' in texto
+    assert 'equipamento_status_itens{colecao="bicicletas",status="NOVA"} 1' in texto
+
+def test_integrar_bicicleta_com_idempotency_key():
+    """Testa se repetir a integração com a mesma Idempotency-Key devolve o resultado original."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T", status=StatusTranca.LIVRE))
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA))
+    corpo = {"idTranca": tranca.id, "idBicicleta": bicicleta.id, "idFuncionario": 7}
+
+    primeira = client.post("/bicicleta/integrarNaRede", json=corpo, headers={"Idempotency-Key": "k1"})
+    assert primeira.status_code == 200
+    assert primeira.json()["tranca"]["bicicleta"] == bicicleta.id
+    repetida = client.post("/bicicleta/integrarNaRede", json=corpo, headers={"Idempotency-Key": "k1"})
+    assert repetida.status_code == 200
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.json() == primeira.json()
+    assert tranca_service.get_by_id(tranca.id).versao == 2
+
+    outra = client.post("/bicicleta/integrarNaRede", json={**corpo, "idFuncionario": 8}, headers={"Idempotency-Key": "k1"})
+    assert outra.status_code == 422
+    sem_chave = client.post("/bicicleta/integrarNaRede", json=corpo)
+    assert sem_chave.status_code == 422
+    assert sem_chave.json()["detail"].startswith("Bicicleta com status DISPONIVEL")
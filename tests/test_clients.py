@@ -0,0 +1,109 @@
+"""Testes dos clientes dos outros microsserviços, contra um serviço ASGI local de mentira."""
+
+import anyio
+import httpx
+import pytest
+from fastapi import FastAPI, Response
+from app import clients
+from app.errors import ServicoIndisponivel
+from app.main import app
+from app.models import NovaBicicleta, NovaTranca, StatusBicicleta, StatusTranca
+from app.services import bicicleta_service, restaurar_banco, tranca_service
+
+FUNCIONARIOS = {1: {"id": 1, "nome": "Ana", "email": "ana@example.com"}}
+
+def servico_falso() -> FastAPI:
+    """Cria um serviço de aluguel/externo que conta as chamadas e pode falhar sob demanda."""
+    falso = FastAPI()
+    falso.state.chamadas = {"funcionario": 0, "email": 0}
+    falso.state.falhas = 0
+    falso.state.emails = []
+
+    @falso.get("/funcionario/{id_funcionario}")
+    async def obter_funcionario(id_funcionario: int):
+        falso.state.chamadas["funcionario"] += 1
+        await anyio.sleep(0.02)
+        if falso.state.falhas:
+            falso.state.falhas -= 1
+            return Response(status_code=503)
+        if id_funcionario not in FUNCIONARIOS:
+            return Response(status_code=404)
+        return FUNCIONARIOS[id_funcionario]
+
+    @falso.post("/enviarEmail")
+    async def enviar_email(corpo: dict):
+        falso.state.chamadas["email"] += 1
+        falso.state.emails.append(corpo)
+        return corpo
+
+    return falso
+
+@pytest.fixture
+def falso():
+    """Aponta os clientes para o serviço falso e os desconfigura no fim."""
+    servico = servico_falso()
+    clients.configurar_clientes("http://aluguel", "http://externo", transport=httpx.ASGITransport(app=servico))
+    clients.aluguel.espera_base = clients.aluguel.espera_maxima = 0.001
+    yield servico
+    clients.configurar_clientes()
+
+async def _guardar(resultados, consulta):
+    resultados.append(await consulta)
+
+def test_consultas_unificadas_e_em_cache(falso):
+    """Testa se consultas simultâneas viram uma chamada e as seguintes saem do cache."""
+    async def consultar():
+        resultados = []
+        async with anyio.create_task_group() as grupo:
+            for _ in range(20):
+                grupo.start_soon(lambda: _guardar(resultados, clients.obter_funcionario(1)))
+        assert resultados == [FUNCIONARIOS[1]] * 20
+        assert await clients.obter_funcionario(1) == FUNCIONARIOS[1]
+        assert await clients.obter_funcionario(99) is None
+        assert await clients.obter_funcionario(99) is None
+
+    anyio.run(consultar)
+    assert falso.state.chamadas["funcionario"] == 2
+
+def test_repeticoes_e_disjuntor(falso):
+    """Testa se falhas transitórias são repetidas e se falhas seguidas abrem o circuito."""
+    async def consultar():
+        falso.state.falhas = 2
+        assert await clients.obter_funcionario(1) == FUNCIONARIOS[1]
+        assert falso.state.chamadas["funcionario"] == 3
+        assert clients.aluguel.disjuntor.estado == "fechado"
+
+        falso.state.falhas = 100
+        clients.cache_funcionarios.limpar()
+        for _ in range(2):
+            with pytest.raises(ServicoIndisponivel):
+                await clients.obter_funcionario(1)
+        assert clients.aluguel.disjuntor.estado == "aberto"
+        chamadas = falso.state.chamadas["funcionario"]
+        with pytest.raises(ServicoIndisponivel):
+            await clients.obter_funcionario(1)
+        assert falso.state.chamadas["funcionario"] == chamadas
+
+    anyio.run(consultar)
+
+def test_integrar_valida_funcionario_e_envia_email(falso):
+    """Testa se a integração na rede recusa funcionários inexistentes e avisa os existentes por email."""
+    restaurar_banco()
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T", status=StatusTranca.LIVRE))
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA))
+    corpo = {"idTranca": tranca.id, "idBicicleta": bicicleta.id}
+
+    async def integrar():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+            inexistente = await cliente.post("/bicicleta/integrarNaRede", json={**corpo, "idFuncionario": 99})
+            assert inexistente.status_code == 422
+            assert inexistente.json()["detail"] == "Funcionário não encontrado"
+            assert bicicleta_service.get_by_id(bicicleta.id).status == StatusBicicleta.NOVA
+
+            resposta = await cliente.post("/bicicleta/integrarNaRede", json={**corpo, "idFuncionario": 1})
+            assert resposta.status_code == 200
+            await clients.aguardar_notificacoes()
+
+    anyio.run(integrar)
+    assert [email["email"] for email in falso.state.emails] == ["ana@example.com"]
+    assert falso.state.emails[0]["assunto"] == "Bicicleta integrada na rede"
@@ -0,0 +1,71 @@
+"""Módulo de testes do feed de alterações."""
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+from app.events import FeedAlteracoes
+from app.main import app
+from app.models import NovaTranca, StatusTranca
+from app.services import feed, restaurar_banco, tranca_service, trancar
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_test_db():
+    """Fixture para limpar o banco de dados antes de cada teste."""
+    restaurar_banco()
+    yield
+
+def _nova_tranca() -> NovaTranca:
+    """Cria os dados de uma tranca livre de teste."""
+    return NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.LIVRE)
+
+def test_buffer_circular_descarta_e_sinaliza_perdas():
+    """Testa a leitura a partir de um cursor e a detecção de eventos já descartados."""
+    buffer = FeedAlteracoes(capacidade=3)
+    for item_id in range(1, 6):
+        buffer.publicar("tranca", item_id, None)
+
+    eventos, perdidos = buffer.ler(0)
+    assert perdidos and [e.seq for e in eventos] == [3, 4, 5]
+    eventos, perdidos = buffer.ler(3)
+    assert not perdidos and [e.seq for e in eventos] == [4, 5]
+    assert buffer.ler(5) == ([], False)
+    assert buffer.ler(99) == ([], True)
+
+def test_assinatura_websocket_retoma_e_filtra():
+    """Testa se a assinatura com `since` entrega as alterações perdidas, respeitando o filtro."""
+    inicio = feed.seq
+    tranca = tranca_service.create(_nova_tranca())
+    trancar(tranca.id)
+
+    with client.websocket_connect(f"/rede/eventos/ws?since={inicio}&tipo=tranca&status=OCUPADA") as websocket:
+        evento = websocket.receive_json()
+    assert evento["id"] == tranca.id and evento["operacao"] == "gravado"
+    assert evento["item"]["status"] == "OCUPADA" and evento["seq"] == inicio + 2
+
+def test_assinatura_sse_entrega_eventos_com_id():
+    """Testa o formato SSE, lendo dois eventos e desconectando em seguida."""
+    inicio = feed.seq
+    tranca_service.create(_nova_tranca())
+    tranca_service.create(_nova_tranca())
+    recebido = b""
+    desconectar = anyio.Event()
+
+    async def receive():
+        await desconectar.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(mensagem):
+        nonlocal recebido
+        if mensagem["type"] == "http.response.body":
+            recebido += mensagem.get("body", b"")
+            if recebido.count(b"\n\n") >= 2:
+                desconectar.set()
+
+    escopo = {"type": "http", "method": "GET", "path": "/rede/eventos", "raw_path": b"/rede/eventos",
+              "query_string": f"since={inicio}".encode(), "headers": [], "http_version": "1.1",
+              "scheme": "http", "server": ("teste", 80), "client": ("teste", 1), "root_path": ""}
+    anyio.run(app, escopo, receive, send)
+    assert recebido.startswith(f"id: {inicio + 1}\nevent: gravado\ndata: ".encode())
+    assert f"id: {inicio + 2}\n".encode() in recebido
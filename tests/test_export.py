@@ -0,0 +1,101 @@
+# tests/test_export.py
+"""Módulo de testes da exportação da frota em NDJSON e CSV."""
+
+import csv
+import gc
+import gzip
+import io
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app import export
+from app.concurrency import relogio
+from app.export import exportar
+from app.main import app
+from app.models import NovaBicicleta, NovaTranca, NovoTotem, StatusBicicleta, StatusTranca
+from app.services import restaurar_banco, bicicleta_service, tranca_service, totem_service, integrar_tranca
+from app.snapshots import carregar_fixtures
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_test_db():
+    """Fixture para limpar o banco de dados antes de cada teste."""
+    restaurar_banco()
+    yield
+
+def _frota():
+    """Cria um totem com uma tranca integrada e duas bicicletas."""
+    totem = totem_service.create(NovoTotem(localizacao="A", descricao="A", latitude=-22.9, longitude=-43.1))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+    integrar_tranca(tranca.id, totem.id)
+    bicicleta_service.create_many([NovaBicicleta(marca="A", modelo="B", ano="2020", numero=i, status=StatusBicicleta.NOVA)
+                                   for i in range(2)])
+
+def test_exportacao_ndjson_pode_ser_carregada_como_fixture(tmp_path):
+    """Testa se o NDJSON exportado recria a mesma frota ao ser carregado como fixture."""
+    _frota()
+    antes = {tipo: [s.model_dump() for s in servico.get_all()]
+             for tipo, servico in (("bicicleta", bicicleta_service), ("tranca", tranca_service), ("totem", totem_service))}
+    resposta = client.get("/rede/exportar")
+    assert resposta.headers["content-type"] == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert [linha["tipo"] for linha in linhas] == ["bicicleta", "bicicleta", "tranca", "totem"]
+
+    arquivo = tmp_path / "frota.ndjson"
+    arquivo.write_bytes(resposta.content)
+    restaurar_banco()
+    carregar_fixtures(str(arquivo))
+    assert {tipo: [s.model_dump() for s in servico.get_all()]
+            for tipo, servico in (("bicicleta", bicicleta_service), ("tranca", tranca_service), ("totem", totem_service))} == antes
+
+def test_exportacao_csv_com_gzip_e_filtro_de_tipo(tmp_path):
+    """Testa o CSV compactado com a coluna de tipo, listas separadas por ";" e a volta como fixture."""
+    _frota()
+    resposta = client.get("/rede/exportar", params={"formato": "csv", "tipo": "tranca,totem", "gzip": "true"})
+    assert resposta.headers["content-type"] == "application/gzip"
+    texto = gzip.decompress(resposta.content).decode("utf-8")
+    registros = list(csv.DictReader(io.StringIO(texto)))
+    assert [r["tipo"] for r in registros] == ["tranca", "totem"]
+    assert registros[1]["trancas"] == registros[0]["id"] and registros[0]["bicicleta"] == ""
+
+    arquivo = tmp_path / "frota.csv"
+    arquivo.write_text(texto, encoding="utf-8")
+    restaurar_banco()
+    assert carregar_fixtures(str(arquivo)) == {"bicicleta": 0, "tranca": 1, "totem": 1}
+    assert client.get("/rede/exportar", params={"tipo": "patinete"}).status_code == 422
+
+def test_exportacao_ve_o_estado_do_inicio():
+    """Testa se as escritas feitas durante a exportação não aparecem nela."""
+    _frota()
+    ids = [b.id for b in bicicleta_service.get_all()]
+    blocos = exportar("ndjson", ["bicicleta"])
+    bicicleta_service.update(ids[0], {"status": StatusBicicleta.DISPONIVEL})
+    bicicleta_service.delete(ids[1])
+    bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=9, status=StatusBicicleta.NOVA))
+
+    linhas = [json.loads(linha) for linha in b"".join(blocos).splitlines()]
+    assert [(l["id"], l["status"]) for l in linhas] == [(ids[0], "NOVA"), (ids[1], "NOVA")]
+
+def test_exportacao_em_paginas_nao_trava_as_escritas(monkeypatch):
+    """Testa se, entre uma página e outra da exportação, as escritas seguem sem aparecer nela."""
+    monkeypatch.setattr(export, "TAMANHO_PAGINA", 2)
+    monkeypatch.setattr(export, "TAMANHO_BLOCO", 1)
+    ids = [b.id for b in bicicleta_service.create_many(
+        [NovaBicicleta(marca="A", modelo="B", ano="2020", numero=i, status=StatusBicicleta.NOVA) for i in range(5)])]
+    blocos = exportar("ndjson", ["bicicleta"])
+    linhas = [json.loads(next(blocos))]
+    # Escritas em outra thread, com a exportação em andamento: terminam sem esperar por ela
+    escrita = threading.Thread(target=lambda: (bicicleta_service.update(ids[4], {"status": StatusBicicleta.DISPONIVEL}),
+                                               bicicleta_service.delete(ids[2])))
+    escrita.start()
+    escrita.join(timeout=5)
+    assert not escrita.is_alive()
+    linhas += [json.loads(bloco) for bloco in blocos]
+    assert [(l["id"], l["status"]) for l in linhas] == [(item_id, "NOVA") for item_id in ids]
+    assert not relogio._leituras
+
+    exportar("csv", ["bicicleta"])  # descartada sem ser consumida
+    gc.collect()
+    assert not relogio._leituras
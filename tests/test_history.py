@@ -0,0 +1,72 @@
+"""Testes do histórico de transições de status."""
+
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.history import HistoricoTransicoes
+from app.main import app
+from app.models import NovaBicicleta, NovaTranca, StatusBicicleta, StatusTranca, Tranca
+from app.services import bicicleta_service, restaurar_banco, tranca_service
+
+client = TestClient(app)
+
+def _tranca(item_id: int, status: StatusTranca, bicicleta=None) -> Tranca:
+    return Tranca(id=item_id, numero=item_id, localizacao="", anoDeFabricacao="2020", modelo="T",
+                  status=status, bicicleta=bicicleta)
+
+def test_historico_registra_mudancas_consulta_por_intervalo_e_expurga():
+    """Testa o registro só das mudanças, a consulta por intervalo e o descarte dos blocos antigos."""
+    agora = [1000.0]
+    historico = HistoricoTransicoes(StatusTranca, relacionado="bicicleta", retencao=100, tamanho_bloco=4,
+                                    relogio=lambda: agora[0])
+    for instante, status, bicicleta in ((1000, StatusTranca.NOVA, None), (1010, StatusTranca.NOVA, None),
+                                        (1020, StatusTranca.LIVRE, None), (1030, StatusTranca.OCUPADA, 7),
+                                        (1040, StatusTranca.LIVRE, None)):
+        agora[0] = instante
+        historico.item_alterado(1, _tranca(1, status, bicicleta))
+        historico.item_alterado(2, _tranca(2, StatusTranca.LIVRE))
+    historico.item_alterado(1, None)  # remoções não geram eventos
+
+    transicoes = historico.consultar(1)
+    assert [(t.instante, t.de, t.para, t.relacionado) for t in transicoes] == [
+        (1000, None, StatusTranca.NOVA, None), (1020, StatusTranca.NOVA, StatusTranca.LIVRE, None),
+        (1030, StatusTranca.LIVRE, StatusTranca.OCUPADA, 7), (1040, StatusTranca.OCUPADA, StatusTranca.LIVRE, None)]
+    assert [t.instante for t in historico.consultar(1, desde=1015, ate=1030)] == [1020, 1030]
+    assert len(historico.consultar(2)) == 1
+    assert len(historico) == 5
+
+    # Enche mais um bloco bem depois da retenção: o primeiro bloco (4 eventos) é descartado
+    agora[0] = 2000
+    for status in (StatusTranca.OCUPADA, StatusTranca.LIVRE, StatusTranca.OCUPADA, StatusTranca.LIVRE):
+        historico.item_alterado(3, _tranca(3, status))
+    agora[0] = 2001
+    historico.item_alterado(1, _tranca(1, StatusTranca.OCUPADA, 8))
+    assert not historico.possui(2)
+    assert [t.para for t in historico.consultar(1)] == [StatusTranca.LIVRE, StatusTranca.OCUPADA]
+    assert len(historico) == 6
+
+def test_historico_api():
+    """Testa os endpoints de histórico da tranca e da bicicleta."""
+    restaurar_banco()
+    inicio = datetime.now(timezone.utc)
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T",
+                                              status=StatusTranca.LIVRE))
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1,
+                                                       status=StatusBicicleta.DISPONIVEL))
+    assert client.post(f"/tranca/{tranca.id}/trancar", json={"bicicleta": bicicleta.id}).status_code == 200
+    assert client.post(f"/tranca/{tranca.id}/destrancar", json={"bicicleta": bicicleta.id}).status_code == 200
+    client.post(f"/bicicleta/{bicicleta.id}/status/EM_REPARO")
+
+    response = client.get(f"/tranca/{tranca.id}/historico")
+    assert response.status_code == 200
+    assert [(t["de"], t["para"], t["bicicleta"]) for t in response.json()] == [
+        (None, "LIVRE", None), ("LIVRE", "OCUPADA", bicicleta.id), ("OCUPADA", "LIVRE", None)]
+    futuro = client.get(f"/tranca/{tranca.id}/historico", params={"from": "2999-01-01T00:00:00Z"})
+    assert futuro.json() == []
+    recente = client.get(f"/tranca/{tranca.id}/historico", params={"from": inicio.isoformat(), "limite": 1})
+    assert len(recente.json()) == 1
+
+    response = client.get(f"/bicicleta/{bicicleta.id}/historico")
+    assert [t["para"] for t in response.json()] == ["DISPONIVEL", "EM_REPARO"]
+    assert client.get("/bicicleta/999999/historico").status_code == 404
+    assert client.get(f"/tranca/{tranca.id}/historico",
+                      params={"from": "2030-01-01T00:00:00Z", "to": "2020-01-01T00:00:00Z"}).status_code == 422
@@ -0,0 +1,30 @@
+"""Módulo de testes dos alocadores de IDs."""
+
+from concurrent.futures import ThreadPoolExecutor
+from app.ids import AlocadorIds, AlocadorIdsCompartilhado
+
+def test_alocador_unico_entre_threads():
+    """Testa se threads concorrentes nunca recebem o mesmo ID."""
+    alocador = AlocadorIds()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        gerados = list(executor.map(lambda _: alocador.proximo(), range(5000)))
+    assert len(set(gerados)) == 5000
+
+def test_alocador_compartilhado_reserva_blocos(tmp_path):
+    """Testa se dois alocadores sobre o mesmo arquivo (como dois workers) não colidem."""
+    caminho = str(tmp_path / "ids.contador")
+    worker_a = AlocadorIdsCompartilhado(caminho, tamanho_bloco=10)
+    worker_b = AlocadorIdsCompartilhado(caminho, tamanho_bloco=10)
+
+    ids_a = [worker_a.proximo() for _ in range(15)]
+    ids_b = [worker_b.proximo() for _ in range(15)]
+    assert not set(ids_a) & set(ids_b)
+    assert ids_a[:10] == list(range(2, 12))
+    assert worker_a.valor_atual() == 41
+
+    # O bloco já reservado pelo worker A continua sendo dele
+    worker_b.reservar_ate(100)
+    assert worker_a.proximo() == ids_a[-1] + 1
+    assert worker_b.proximo() == 101
+    worker_a.fechar()
+    worker_b.fechar()
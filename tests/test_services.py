@@ -1,12 +1,23 @@
 # tests/test_services.py
 """Módulo de testes de unidade para a camada de serviço."""
 
+import random
+import sys
+import threading
+import time
 import pytest
-from app.services import bicicleta_service, totem_service, tranca_service, restaurar_banco
+from app.concurrency import leitura_consistente
+from app.errors import ErroOperacao
+from app.services import (
+    bicicleta_service, totem_service, tranca_service, restaurar_banco,
+    trancas_do_totem, bicicletas_do_totem, bicicleta_na_tranca, tranca_da_bicicleta, totem_da_tranca,
+    trancar, destrancar, agregados, conferir_agregados, resumo_rede,
+    integrar_bicicleta, retirar_bicicleta, integrar_tranca, retirar_tranca
+)
 from app.models import (
     NovaBicicleta, StatusBicicleta, BicicletaUpdate, 
-    NovoTotem, TotemUpdate,
-    NovaTranca, TrancaUpdate, StatusTranca
+    NovoTotem, TotemUpdate, Totem,
+    NovaTranca, TrancaUpdate, StatusTranca, StatusAcaoReparador
 )
 
 @pytest.fixture(autouse=True)
@@ -81,4 +92,233 @@ def test_full_crud_tranca():
     # Delete
     resultado_delete = tranca_service.delete(tranca_criada.id)
     assert resultado_delete is True
-    assert tranca_service.get_by_id(tranca_criada.id) is None
\ No newline at end of file
+    assert tranca_service.get_by_id(tranca_criada.id) is None
+
+def test_indices_acompanham_update_e_delete():
+    """Testa se os índices de status e bicicleta são mantidos em create/update/delete."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.LIVRE))
+    assert tranca_service.find_ids("status", StatusTranca.LIVRE) == [tranca.id]
+
+    tranca_service.update(tranca.id, {"status": StatusTranca.OCUPADA, "bicicleta": 42})
+    assert tranca_service.find_ids("status", StatusTranca.LIVRE) == []
+    assert tranca_service.find_ids("status", StatusTranca.OCUPADA) == [tranca.id]
+    assert tranca_da_bicicleta(42).id == tranca.id
+
+    tranca_service.delete(tranca.id)
+    assert tranca_service.find_ids("status", StatusTranca.OCUPADA) == []
+    assert tranca_da_bicicleta(42) is None
+
+def test_relacionamentos_totem_tranca():
+    """Testa as consultas de trancas de um totem e de totem de uma tranca."""
+    livre = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.LIVRE))
+    ocupada = tranca_service.create(NovaTranca(numero=2, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.OCUPADA))
+    totem = totem_service.create(NovoTotem(localizacao="Origem", descricao="Desc"))
+    totem_service.update(totem.id, Totem(id=totem.id, localizacao="Origem", descricao="Desc", trancas=[livre.id, ocupada.id]))
+
+    assert [t.id for t in trancas_do_totem(totem.id)] == [livre.id, ocupada.id]
+    assert [t.id for t in trancas_do_totem(totem.id, StatusTranca.LIVRE)] == [livre.id]
+    assert totem_da_tranca(ocupada.id).id == totem.id
+    assert trancas_do_totem(999) is None
+
+def test_json_pre_serializado_acompanha_atualizacoes():
+    """Testa se o JSON em cache de um item é refeito quando ele muda."""
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA))
+    assert bicicleta_service.get_json(bicicleta) == bicicleta.model_dump_json().encode()
+
+    atualizada = bicicleta_service.update(bicicleta.id, BicicletaUpdate(status=StatusBicicleta.DISPONIVEL))
+    assert bicicleta_service.get_json(atualizada) == atualizada.model_dump_json().encode()
+
+def test_agregados_acompanham_operacoes():
+    """Testa se os contadores por status continuam iguais a uma recontagem do zero após várias operações."""
+    random.seed(7)
+    bicicletas = [bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=i, status=StatusBicicleta.DISPONIVEL)).id
+                  for i in range(6)]
+    trancas = [tranca_service.create(NovaTranca(numero=i, localizacao="A", anoDeFabricacao="2022", modelo="M1", status=StatusTranca.LIVRE)).id
+               for i in range(8)]
+    totens = [totem_service.create(NovoTotem(localizacao=f"T{i}", descricao="Desc")).id for i in range(2)]
+    for _ in range(300):
+        operacao = random.choice(["trancar", "destrancar", "bicicleta", "totem", "remover", "recriar"])
+        id_tranca = random.choice(trancas)
+        try:
+            if operacao == "trancar":
+                trancar(id_tranca, random.choice(bicicletas))
+            elif operacao == "destrancar":
+                tranca = tranca_service.get_by_id(id_tranca)
+                destrancar(id_tranca, tranca.bicicleta if tranca else None)
+            elif operacao == "bicicleta":
+                bicicleta_service.update(random.choice(bicicletas), BicicletaUpdate(status=random.choice(list(StatusBicicleta))))
+            elif operacao == "totem":
+                totem_service.update(random.choice(totens), {"trancas": random.sample(trancas, 3)})
+            elif operacao == "remover":
+                random.choice([tranca_service, bicicleta_service]).delete(random.choice(trancas + bicicletas))
+            else:
+                bicicletas.append(bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=0, status=StatusBicicleta.NOVA)).id)
+        except ErroOperacao:
+            pass
+        assert conferir_agregados() == {}
+
+    resumo = resumo_rede()
+    assert sum(resumo["trancas"].values()) == len(tranca_service.get_all())
+    assert sum(resumo["bicicletas"].values()) == len(bicicleta_service.get_all())
+    restaurar_banco()
+    assert agregados.contagens == {}
+
+def test_integrar_e_retirar_da_rede():
+    """Testa o ciclo de integração e retirada de tranca e bicicleta, com as transições inválidas."""
+    totem = totem_service.create(NovoTotem(localizacao="Centro", descricao="Praça"))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA))
+
+    resultado = integrar_tranca(tranca.id, totem.id)
+    assert resultado["tranca"].status == StatusTranca.LIVRE
+    assert totem_service.get_by_id(totem.id).trancas == [tranca.id]
+    with pytest.raises(ErroOperacao) as erro:
+        integrar_tranca(tranca.id, totem.id)
+    assert erro.value.status_code == 422
+
+    resultado = integrar_bicicleta(bicicleta.id, tranca.id)
+    assert resultado["bicicleta"].status == StatusBicicleta.DISPONIVEL
+    assert tranca_service.get_by_id(tranca.id).bicicleta == bicicleta.id
+    with pytest.raises(ErroOperacao):
+        retirar_tranca(tranca.id, totem.id, StatusAcaoReparador.EM_REPARO)
+    with pytest.raises(ErroOperacao):
+        retirar_bicicleta(bicicleta.id, tranca.id, StatusAcaoReparador.EM_REPARO)
+
+    bicicleta_service.update(bicicleta.id, {"status": StatusBicicleta.REPARO_SOLICITADO})
+    resultado = retirar_bicicleta(bicicleta.id, tranca.id, StatusAcaoReparador.EM_REPARO)
+    assert resultado["bicicleta"].status == StatusBicicleta.EM_REPARO
+    assert resultado["tranca"].bicicleta is None
+    resultado = retirar_tranca(tranca.id, totem.id, StatusAcaoReparador.APOSENTADA)
+    assert resultado["tranca"].status == StatusTranca.APOSENTADA
+    assert totem_service.get_by_id(totem.id).trancas == []
+    assert conferir_agregados() == {}
+
+def test_transacao_desfaz_gravacoes_se_uma_falhar(monkeypatch):
+    """Testa se uma falha ao gravar o totem desfaz a gravação da tranca já feita."""
+    totem = totem_service.create(NovoTotem(localizacao="Centro", descricao="Praça"))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+
+    def falhar(_itens, _anteriores):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(totem_service.database, "put_versionado", falhar)
+    with pytest.raises(OSError):
+        integrar_tranca(tranca.id, totem.id)
+    monkeypatch.undo()
+
+    assert tranca_service.get_by_id(tranca.id) == tranca
+    assert totem_service.get_by_id(totem.id).trancas == []
+    assert conferir_agregados() == {}
+
+def test_leitura_consistente_ve_o_instante_em_que_comecou():
+    """Testa se, dentro da leitura consistente, criações, alterações, remoções e transações posteriores não aparecem."""
+    totem = totem_service.create(NovoTotem(localizacao="Centro", descricao="Praça"))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+    integrar_tranca(tranca.id, totem.id)
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1, status=StatusBicicleta.NOVA))
+    removida = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=2, status=StatusBicicleta.NOVA))
+
+    with leitura_consistente():
+        integrar_bicicleta(bicicleta.id, tranca.id)
+        bicicleta_service.delete(removida.id)
+        criada = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=3, status=StatusBicicleta.NOVA))
+        assert bicicleta_na_tranca(tranca.id) == (tranca_service.get_by_id(tranca.id), None)
+        assert bicicletas_do_totem(totem.id) == []
+        assert tranca_da_bicicleta(bicicleta.id) is None
+        assert {b.id for b in bicicleta_service.get_all()} == {bicicleta.id, removida.id}
+        pagina, _ = bicicleta_service.get_page(filtros={"status": StatusBicicleta.NOVA})
+        assert [b.id for b in pagina] == [bicicleta.id, removida.id]
+        assert bicicleta_service.get_page(filtros={"status": StatusBicicleta.DISPONIVEL}) == ([], None)
+        assert bicicleta_service.get_by_id(criada.id) is None
+
+    assert bicicleta_na_tranca(tranca.id)[1].status == StatusBicicleta.DISPONIVEL
+    assert [b.id for b in bicicleta_service.get_page(filtros={"status": StatusBicicleta.NOVA})[0]] == [criada.id]
+
+def test_escrita_dentro_da_leitura_consistente_parte_da_versao_atual():
+    """Testa se uma escrita feita dentro da leitura consistente não desfaz uma alteração concorrente."""
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="a", anoDeFabricacao="2020", modelo="m", status=StatusTranca.NOVA))
+    with leitura_consistente():
+        outra = threading.Thread(target=tranca_service.update, args=(tranca.id, {"modelo": "novo"}))
+        outra.start()
+        outra.join()
+        atualizada = tranca_service.update(tranca.id, {"localizacao": "b"})
+        assert tranca_service.get_by_id(tranca.id).modelo == "m"
+    assert (atualizada.versao, atualizada.modelo, atualizada.localizacao) == (3, "novo", "b")
+    assert tranca_service.get_by_id(tranca.id) == atualizada
+
+def test_leituras_consistentes_sob_escritas_concorrentes():
+    """Teste de estresse: transações entre bicicletas e trancas concorrendo com listagens e consultas relacionais.
+
+    Em qualquer instante, uma tranca tem bicicleta se e somente se a bicicleta dela está
+    DISPONIVEL ou REPARO_SOLICITADO; uma leitura rasgada (metade antes, metade depois de
+    uma transação) quebraria essa relação.
+    """
+    pares = 16
+    totem = totem_service.create(NovoTotem(localizacao="Centro", descricao="Praça"))
+    trancas = tranca_service.create_many([NovaTranca(numero=i, localizacao="Centro", anoDeFabricacao="2020", modelo="T",
+                                                     status=StatusTranca.NOVA) for i in range(pares)])
+    bicicletas = bicicleta_service.create_many([NovaBicicleta(marca="A", modelo="B", ano="2020", numero=i,
+                                                              status=StatusBicicleta.EM_REPARO) for i in range(pares)])
+    for tranca in trancas:
+        integrar_tranca(tranca.id, totem.id)
+    dona = {tranca.id: bicicleta.id for tranca, bicicleta in zip(trancas, bicicletas)}
+    presas = {StatusBicicleta.DISPONIVEL, StatusBicicleta.REPARO_SOLICITADO}
+    fim = time.monotonic() + 1.0
+    erros = []
+
+    def capturando(alvo):
+        def executar(*args):
+            try:
+                alvo(*args)
+            except Exception as erro:  # a falha aparece na asserção, não só no log da thread
+                erros.append(erro)
+        return executar
+
+    @capturando
+    def escritor(indices):
+        while time.monotonic() < fim:
+            for i in indices:
+                id_tranca, id_bicicleta = trancas[i].id, bicicletas[i].id
+                integrar_bicicleta(id_bicicleta, id_tranca)
+                bicicleta_service.update(id_bicicleta, {"status": StatusBicicleta.REPARO_SOLICITADO})
+                retirar_bicicleta(id_bicicleta, id_tranca, StatusAcaoReparador.EM_REPARO)
+
+    def conferir(lista_trancas, por_id):
+        for tranca in lista_trancas:
+            presa = por_id[dona[tranca.id]].status in presas
+            if (tranca.bicicleta is not None) != presa:
+                erros.append((tranca, por_id[dona[tranca.id]]))
+
+    @capturando
+    def leitor():
+        while time.monotonic() < fim:
+            # Consulta relacional
+            presas_no_totem = {b.id for b in bicicletas_do_totem(totem.id)}
+            if not all(bicicleta_service.get_by_id(b) is not None for b in presas_no_totem):
+                erros.append(presas_no_totem)
+            for tranca in trancas[:4]:
+                tranca_lida, bicicleta = bicicleta_na_tranca(tranca.id)
+                if (bicicleta is not None) != (tranca_lida.bicicleta is not None) \
+                        or (bicicleta is not None and bicicleta.status not in presas):
+                    erros.append((tranca_lida, bicicleta))
+            # Listagens das duas coleções num mesmo instante
+            with leitura_consistente():
+                lista_trancas = tranca_service.get_page(limite=pares)[0]
+                por_id = {b.id: b for b in bicicleta_service.get_all()}
+                disponiveis = bicicleta_service.get_page(limite=pares, filtros={"status": StatusBicicleta.DISPONIVEL})[0]
+            conferir(lista_trancas, por_id)
+            if any(b.status != StatusBicicleta.DISPONIVEL for b in disponiveis):
+                erros.append(disponiveis)
+
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # trocas de thread frequentes, para intercalar leituras e escritas
+    try:
+        threads = [threading.Thread(target=escritor, args=(range(i, pares, 4),)) for i in range(4)]
+        threads += [threading.Thread(target=leitor) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(intervalo)
+    assert erros == []
+    assert conferir_agregados() == {}
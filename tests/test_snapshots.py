@@ -0,0 +1,93 @@
+# tests/test_snapshots.py
+"""Módulo de testes dos snapshots nomeados e da carga de fixtures."""
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import NovaBicicleta, NovaTranca, NovoTotem, StatusBicicleta, StatusTranca
+from app.services import (
+    restaurar_banco, bicicleta_service, tranca_service, totem_service,
+    integrar_tranca, conferir_agregados, totens_proximos
+)
+from app.snapshots import carregar_fixtures, remover_snapshot, restaurar_snapshot, salvar_snapshot
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_test_db():
+    """Fixture para limpar o banco de dados antes de cada teste."""
+    restaurar_banco()
+    yield
+
+def _bicicleta(numero: int) -> NovaBicicleta:
+    """Cria os dados de uma bicicleta disponível de teste."""
+    return NovaBicicleta(marca="A", modelo="B", ano="2020", numero=numero, status=StatusBicicleta.DISPONIVEL)
+
+def test_restaurar_snapshot_volta_itens_indices_e_ids():
+    """Testa se o snapshot restaura itens, índices, agregados, índice espacial e a sequência de IDs."""
+    totem = totem_service.create(NovoTotem(localizacao="A", descricao="A", latitude=-22.9, longitude=-43.1))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="A", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+    integrar_tranca(tranca.id, totem.id)
+    bicicletas = bicicleta_service.create_many([_bicicleta(i) for i in range(5)])
+    salvar_snapshot("base")
+    # Após restaurar, a sequência de IDs recomeça do mesmo ponto
+    restaurar_snapshot("base")
+    proximo_id = bicicleta_service.create(_bicicleta(99)).id
+
+    bicicleta_service.update(bicicletas[0].id, {"status": StatusBicicleta.EM_USO})
+    bicicleta_service.delete(bicicletas[1].id)
+    totem_service.delete(totem.id)
+    tranca_service.update(tranca.id, {"status": StatusTranca.OCUPADA})
+
+    assert restaurar_snapshot("base") is not None
+    assert [b.id for b in bicicleta_service.get_all()] == [b.id for b in bicicletas]
+    assert bicicleta_service.find_ids("status", StatusBicicleta.DISPONIVEL) == [b.id for b in bicicletas]
+    assert tranca_service.get_by_id(tranca.id).status == StatusTranca.LIVRE
+    assert [p.totem.id for p in totens_proximos(-22.9, -43.1)] == [totem.id]
+    assert conferir_agregados() == {}
+    assert bicicleta_service.create(_bicicleta(99)).id == proximo_id
+
+    # O snapshot continua intacto após ser restaurado e alterado
+    assert restaurar_snapshot("base") is not None
+    assert len(bicicleta_service.get_all()) == 5
+    assert restaurar_snapshot("inexistente") is None
+    assert remover_snapshot("base")
+
+def test_carregar_fixtures_ndjson_e_csv(tmp_path):
+    """Testa a carga de fixtures com IDs explícitos e gerados, em NDJSON e CSV."""
+    ndjson = tmp_path / "frota.ndjson"
+    ndjson.write_text("\n".join(json.dumps(registro) for registro in [
+        {"tipo": "tranca", "id": 500, "numero": 1, "localizacao": "A", "anoDeFabricacao": "2020", "modelo": "T", "status": "LIVRE"},
+        {"tipo": "bicicleta", "marca": "A", "modelo": "B", "ano": "2020", "numero": 7, "status": "NOVA"},
+    ]) + "\n", encoding="utf-8")
+    csv = tmp_path / "totens.csv"
+    csv.write_text("tipo,id,localizacao,descricao,latitude,longitude,trancas\n"
+                   "totem,600,Centro,Praça,-22.9,-43.1,500\n"
+                   "totem,,Sul,Sem coordenadas,,,\n", encoding="utf-8")
+
+    assert carregar_fixtures(str(ndjson)) == {"bicicleta": 1, "tranca": 1, "totem": 0}
+    assert carregar_fixtures(str(csv)) == {"bicicleta": 0, "tranca": 0, "totem": 2}
+    assert totem_service.get_by_id(600).trancas == [500]
+    assert totem_service.find_ids("trancas", 500) == [600]
+    assert min(t.id for t in totem_service.get_all()) == 600
+    assert conferir_agregados() == {}
+
+    invalido = tmp_path / "invalido.ndjson"
+    invalido.write_text('{"tipo": "bicicleta", "marca": "A"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="linha 1"):
+        carregar_fixtures(str(invalido))
+
+def test_snapshots_api():
+    """Testa salvar, listar, restaurar (também via restaurarBanco) e remover snapshots pela API."""
+    client.post("/bicicleta/", json={"marca": "A", "modelo": "B", "ano": "2020", "numero": 1, "status": "NOVA"})
+    salvo = client.put("/snapshots/carga").json()
+    assert salvo["itens"] == {"bicicleta": 1, "tranca": 0, "totem": 0}
+
+    client.post("/bicicleta/", json={"marca": "A", "modelo": "B", "ano": "2020", "numero": 2, "status": "NOVA"})
+    assert client.get("/restaurarBanco", params={"snapshot": "carga"}).status_code == 200
+    assert len(client.get("/bicicleta/").json()) == 1
+    assert [s["nome"] for s in client.get("/snapshots/").json()] == ["carga"]
+    assert client.post("/snapshots/carga/restaurar").status_code == 200
+    assert client.delete("/snapshots/carga").status_code == 200
+    assert client.get("/restaurarBanco", params={"snapshot": "carga"}).status_code == 404
@@ -0,0 +1,65 @@
+# tests/test_spatial.py
+"""Módulo de testes do índice espacial e da busca de totens próximos."""
+
+import random
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.spatial import IndiceEspacial, distancia_km
+from app.services import restaurar_banco, totem_service, integrar_tranca, tranca_service
+from app.models import NovoTotem, NovaTranca, StatusTranca, TotemUpdate
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_test_db():
+    """Fixture para limpar o banco de dados antes de cada teste."""
+    restaurar_banco()
+    yield
+
+def test_proximos_igual_a_busca_exaustiva():
+    """Compara os k mais próximos do índice com o cálculo sobre todos os pontos, inclusive perto de ±180°."""
+    gerador = random.Random(7)
+    indice = IndiceEspacial(passo=0.05)
+    pontos = {}
+    for item_id in range(2000):
+        lon = gerador.uniform(179, 180) if item_id % 10 == 0 else gerador.uniform(-43.8, -43.1)
+        pontos[item_id] = (gerador.uniform(-23.1, -22.7), lon)
+        indice.atualizar(item_id, *pontos[item_id])
+    for item_id in range(0, 2000, 3):  # move ou remove parte dos pontos
+        if item_id % 2:
+            indice.remover(item_id)
+            del pontos[item_id]
+        else:
+            pontos[item_id] = (gerador.uniform(-23.1, -22.7), gerador.uniform(-43.8, -43.1))
+            indice.atualizar(item_id, *pontos[item_id])
+
+    for _ in range(50):
+        lat, lon = gerador.uniform(-23.2, -22.6), gerador.choice([gerador.uniform(-43.9, -43.0), -179.9])
+        pares = indice.proximos(lat, lon, 7, aceitar=lambda item_id: item_id % 4 != 1, raio_km=40)
+        esperado = sorted((distancia_km(lat, lon, *p), i) for i, p in pontos.items() if i % 4 != 1)
+        assert pares == [par for par in esperado if par[0] <= 40][:7]
+
+def test_totens_proximos_api():
+    """Testa a busca por proximidade com filtro de disponibilidade e o acompanhamento das alterações."""
+    perto = totem_service.create(NovoTotem(localizacao="A", descricao="A", latitude=-22.90, longitude=-43.17))
+    longe = totem_service.create(NovoTotem(localizacao="B", descricao="B", latitude=-22.95, longitude=-43.20))
+    totem_service.create(NovoTotem(localizacao="C", descricao="Sem coordenadas"))
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="B", anoDeFabricacao="2020", modelo="T", status=StatusTranca.NOVA))
+    integrar_tranca(tranca.id, longe.id)
+
+    resposta = client.get("/totem/proximos", params={"latitude": -22.9, "longitude": -43.17})
+    assert resposta.status_code == 200
+    assert [r["totem"]["id"] for r in resposta.json()] == [perto.id, longe.id]
+    assert resposta.json()[0]["distanciaKm"] == 0
+
+    livres = client.get("/totem/proximos", params={"latitude": -22.9, "longitude": -43.17, "disponivel": "TRANCA"}).json()
+    assert [(r["totem"]["id"], r["trancasLivres"]) for r in livres] == [(longe.id, 1)]
+
+    totem_service.update(perto.id, TotemUpdate(latitude=10.0, longitude=10.0))
+    raio = client.get("/totem/proximos", params={"latitude": -22.9, "longitude": -43.17, "raio_km": 50}).json()
+    assert [r["totem"]["id"] for r in raio] == [longe.id]
+    assert client.post("/totem/", json={"localizacao": "D", "descricao": "D", "latitude": 1.0}).status_code == 422
+    assert client.put(f"/totem/{perto.id}", json={"latitude": 1.0}).status_code == 422
+    assert client.put("/totem/lote", json=[{"id": perto.id, "longitude": 1.0}]).status_code == 422
+    assert totem_service.get_by_id(perto.id).latitude == 10.0
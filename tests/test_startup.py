@@ -0,0 +1,60 @@
+"""Testes do perfil de inicialização, do aquecimento das rotas, do OpenAPI pré-gerado e do tempo de subida."""
+
+import json
+import os
+import subprocess
+import sys
+import anyio
+from fastapi import FastAPI
+from app.startup import PerfilInicio, aquecer, carregar_openapi, salvar_openapi
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Limite folgado para a subida a frio (import + inicialização + primeira rodada de requisições)
+LIMITE_SUBIDA = 10.0
+
+def test_perfil_desconta_imports_aninhados():
+    """Testa se o tempo próprio de um módulo não inclui o dos módulos que ele importa."""
+    perfil = PerfilInicio()
+    perfil.iniciar_import("app.externo")
+    perfil.iniciar_import("pacote.interno")
+    with perfil.etapa("espera"):
+        anyio.run(anyio.sleep, 0.01)
+    perfil.terminar_import()
+    perfil.terminar_import()
+    proprio, total = perfil.imports["app.externo"]
+    assert proprio < 0.01 <= total
+    assert set(perfil.por_grupo()) == {"app.externo", "pacote"}
+    assert "espera" in perfil.relatorio()
+
+def test_aquecer_nao_executa_as_rotas():
+    """Testa se o aquecimento percorre todos os caminhos sem chamar as rotas."""
+    app = FastAPI()
+    chamadas = []
+
+    @app.post("/item/{id_item}/acao")
+    async def acao(id_item: int):
+        chamadas.append(id_item)
+
+    caminhos = [rota.path for rota in app.routes]
+    assert anyio.run(aquecer, app, caminhos) == len(caminhos)
+    assert not chamadas
+
+def test_openapi_pre_gerado(tmp_path):
+    """Testa se o esquema salvo é usado pelo app da mesma versão e ignorado pelo de outra."""
+    caminho = str(tmp_path / "openapi.json")
+    salvar_openapi(FastAPI(title="Equipamentos", version="1.0.0"), caminho)
+    mesma, outra = FastAPI(version="1.0.0"), FastAPI(version="2.0.0")
+    assert carregar_openapi(mesma, caminho)
+    assert mesma.openapi()["info"]["title"] == "Equipamentos"
+    assert not carregar_openapi(outra, caminho)
+    assert not carregar_openapi(mesma, str(tmp_path / "inexistente.json"))
+
+def test_tempo_de_subida(tmp_path):
+    """Mede a subida a frio num processo novo, com aquecimento e perfil, e verifica o limite."""
+    ambiente = {**os.environ, "EQUIPAMENTO_AQUECER": "1", "EQUIPAMENTO_PERFIL_INICIO": "1",
+                "EQUIPAMENTO_DADOS": str(tmp_path)}
+    processo = subprocess.run([sys.executable, "-m", "benchmarks.bench_inicio", "--filho"], cwd=RAIZ, env=ambiente,
+                              capture_output=True, text=True, timeout=120, check=True)
+    tempos = json.loads(processo.stdout.strip().splitlines()[-1])
+    assert tempos["ate_primeira_resposta"] < LIMITE_SUBIDA
+    assert "app.routers" in processo.stderr and "aquecimento" in processo.stderr
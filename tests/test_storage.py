@@ -0,0 +1,119 @@
+"""Módulo de testes do armazenamento durável (log + snapshot)."""
+
+import sqlite3
+import pytest
+from app.columnar_store import ColumnarStore
+from app.errors import ConflitoVersao, ErroOperacao
+from app.sqlite_store import SQLiteStore
+from app.storage import LogStore
+from app.models import Bicicleta, StatusBicicleta, Tranca, StatusTranca
+
+def _bicicleta(item_id: int, status: StatusBicicleta = StatusBicicleta.NOVA) -> Bicicleta:
+    """Cria uma bicicleta de teste com o ID informado."""
+    return Bicicleta(id=item_id, marca="Caloi", modelo="10", ano="2020", numero=item_id, status=status)
+
+def test_log_store_reaplica_log_apos_reinicio(tmp_path):
+    """Testa se gravações, atualizações e remoções sobrevivem a um reinício."""
+    store = LogStore(str(tmp_path), "bicicletas", Bicicleta)
+    store.put(_bicicleta(1))
+    store.put(_bicicleta(2))
+    store.put(_bicicleta(1, StatusBicicleta.DISPONIVEL))
+    store.delete(2)
+    store.close()
+
+    reaberto = LogStore(str(tmp_path), "bicicletas", Bicicleta)
+    assert len(reaberto) == 1
+    assert reaberto.get(1).status == StatusBicicleta.DISPONIVEL
+    reaberto.close()
+
+def test_log_store_compacta_em_snapshot(tmp_path):
+    """Testa se a compactação gera snapshot, descarta segmentos e preserva a cauda do log."""
+    store = LogStore(str(tmp_path), "bicicletas", Bicicleta)
+    for item_id in range(1, 6):
+        store.put(_bicicleta(item_id))
+    store.compactar()
+    store.put(_bicicleta(6))
+    store.close()
+
+    assert (tmp_path / "bicicletas.snapshot").exists()
+    assert len(list(tmp_path.glob("bicicletas.*.wal"))) == 1
+
+    reaberto = LogStore(str(tmp_path), "bicicletas", Bicicleta)
+    assert sorted(item.id for item in reaberto.values()) == [1, 2, 3, 4, 5, 6]
+    reaberto.close()
+
+def test_sqlite_store_ve_alteracoes_de_outra_conexao(tmp_path):
+    """Testa se um segundo store sobre o mesmo banco enxerga as gravações do primeiro."""
+    caminho = str(tmp_path / "equipamento.db")
+    escritor = SQLiteStore(caminho, "bicicletas", Bicicleta)
+    leitor = SQLiteStore(caminho, "bicicletas", Bicicleta)
+
+    escritor.put(_bicicleta(1))
+    escritor.put(_bicicleta(2))
+    assert sorted(leitor.sincronizar()) == [1, 2]
+    assert leitor.get(2).numero == 2
+
+    escritor.delete(1)
+    assert leitor.sincronizar() == [1]
+    assert leitor.get(1) is None
+
+    escritor.clear()
+    assert leitor.sincronizar() is None
+    assert len(leitor) == 0
+    escritor.close()
+    leitor.close()
+
+def test_sqlite_store_gravacao_versionada_entre_conexoes(tmp_path):
+    """Testa se dois stores sobre o mesmo banco não sobrescrevem a escrita um do outro."""
+    caminho = str(tmp_path / "equipamento.db")
+    primeiro = SQLiteStore(caminho, "bicicletas", Bicicleta)
+    segundo = SQLiteStore(caminho, "bicicletas", Bicicleta)
+    primeiro.put_many([_bicicleta(1), _bicicleta(2)])
+    segundo.sincronizar()
+
+    # Os dois partem da versão 1; só a primeira gravação vale
+    primeiro.put_versionado([_bicicleta(1, StatusBicicleta.DISPONIVEL).model_copy(update={"versao": 2})], [1])
+    with pytest.raises(ConflitoVersao) as conflito:
+        segundo.put_versionado([_bicicleta(2).model_copy(update={"versao": 2}),
+                                _bicicleta(1, StatusBicicleta.EM_REPARO).model_copy(update={"versao": 2})], [1, 1])
+    assert conflito.value.versao_atual == 2
+    assert segundo.sincronizar() == [1]
+    assert segundo.get(1).status == StatusBicicleta.DISPONIVEL and segundo.get(2).versao == 1
+
+    primeiro.delete(2)
+    with pytest.raises(ErroOperacao):
+        segundo.put_versionado([_bicicleta(2).model_copy(update={"versao": 2})], [1])
+    primeiro.close()
+    segundo.close()
+
+def test_columnar_store_grava_le_e_reaproveita_linhas():
+    """Testa se o armazenamento colunar preserva os campos (inclusive None) e reaproveita linhas removidas."""
+    store = ColumnarStore(Tranca)
+    for item_id in (1, 2):
+        store.put(Tranca(id=item_id, numero=item_id, localizacao="Centro", anoDeFabricacao="2020",
+                         modelo="T1", status=StatusTranca.LIVRE))
+    store.put(store.get(2).model_copy(update={"status": StatusTranca.OCUPADA, "bicicleta": 7, "versao": 2}))
+    assert store.delete(1)
+    store.put(Tranca(id=3, numero=3, localizacao="Praia", anoDeFabricacao="2021", modelo="T2", status=StatusTranca.NOVA))
+
+    assert len(store) == 2 and 1 not in store
+    assert len(store._colunas[0].valores) == 2
+    assert store.get(2) == Tranca(id=2, numero=2, localizacao="Centro", anoDeFabricacao="2020", modelo="T1",
+                                  status=StatusTranca.OCUPADA, bicicleta=7, versao=2)
+    assert store.get(3).bicicleta is None and store.get(3).localizacao == "Praia"
+    assert sorted(item.id for item in store.values()) == [2, 3]
+
+def test_sqlite_store_sobrevive_ao_lock_de_outro_processo(tmp_path):
+    """Testa se, com o lock de escrita preso por outra conexão, a gravação falha e o store segue gravando depois."""
+    caminho = str(tmp_path / "equipamento.db")
+    store = SQLiteStore(caminho, "bicicletas", Bicicleta, espera_lock=0.1)
+    outro = sqlite3.connect(caminho, isolation_level=None)
+    outro.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        store.put(_bicicleta(1))
+    outro.execute("ROLLBACK")
+    outro.close()
+
+    store.put(_bicicleta(2))
+    assert 1 not in store and store.get(2).numero == 2
+    store.close()
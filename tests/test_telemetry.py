@@ -0,0 +1,76 @@
+"""Testes da ingestão em lote da telemetria das trancas."""
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import NovaBicicleta, NovaTranca, StatusBicicleta, StatusTranca
+from app.services import bicicleta_service, restaurar_banco, tranca_service
+from app.telemetry import BufferLeituras, ErroLeitura, ProcessadorTelemetria, ler_lote, telemetria
+
+client = TestClient(app)
+
+def _tranca(status: StatusTranca, bicicleta=None):
+    tranca = tranca_service.create(NovaTranca(numero=1, localizacao="Centro", anoDeFabricacao="2020", modelo="T",
+                                              status=status))
+    if bicicleta is not None:
+        tranca = tranca_service.update(tranca.id, {"bicicleta": bicicleta})
+    return tranca
+
+def test_buffer_circular_da_volta_e_recusa_lote_que_nao_cabe():
+    """Testa a ordem das leituras ao dar a volta no buffer e a recusa de lotes maiores que o espaço livre."""
+    buffer = BufferLeituras(capacidade=4)
+    assert buffer.colocar(*ler_lote([[1, 0, None, 0], [2, 1, 5, 0], [3, 0, None, 1]]))
+    assert list(buffer.retirar()[0]) == [1, 2, 3]
+    assert buffer.colocar(*ler_lote([[4, 0, None, 0], [5, 1, 7, 2], [6, 0, None, 0]]))
+    assert not buffer.colocar(*ler_lote([[7, 0, None, 0], [8, 0, None, 0]]))
+    ids, trancadas, bicicletas, falhas = buffer.retirar()
+    assert (list(ids), list(trancadas), list(falhas)) == ([4, 5, 6], [0, 1, 0], [0, 2, 0])
+    assert bicicletas[1] == 7
+    with pytest.raises(ErroLeitura):
+        ler_lote([[1, 2, None, 0]])
+    with pytest.raises(ErroLeitura):
+        ler_lote([[1, 0, None]])
+
+def test_processamento_coalesce_aplica_mudancas_e_sinaliza_divergencias():
+    """Testa se só a última leitura de cada tranca é aplicada e se as divergências de bicicleta são sinalizadas."""
+    restaurar_banco()
+    bicicleta = bicicleta_service.create(NovaBicicleta(marca="A", modelo="B", ano="2020", numero=1,
+                                                       status=StatusBicicleta.DISPONIVEL))
+    livre = _tranca(StatusTranca.LIVRE)
+    ocupada = _tranca(StatusTranca.OCUPADA, bicicleta.id)
+    em_reparo = _tranca(StatusTranca.EM_REPARO)
+    processador = ProcessadorTelemetria(capacidade=100)
+    processador.receber([[livre.id, 1, None, 0], [livre.id, 0, None, 0], [livre.id, 1, None, 0],
+                         [ocupada.id, 1, bicicleta.id, 0], [em_reparo.id, 0, None, 4], [999999, 1, None, 0]])
+    assert processador.processar_pendentes() == 1
+
+    assert tranca_service.get_by_id(livre.id).status == StatusTranca.OCUPADA
+    assert tranca_service.get_by_id(livre.id).versao == livre.versao + 1
+    assert tranca_service.get_by_id(ocupada.id).versao == ocupada.versao
+    assert tranca_service.get_by_id(em_reparo.id).status == StatusTranca.EM_REPARO
+    assert processador.falhas == {em_reparo.id: 4}
+    assert processador.listar_divergencias() == []
+
+    processador.receber([[ocupada.id, 1, bicicleta.id + 1, 0]])
+    processador.processar_pendentes()
+    [divergencia] = processador.listar_divergencias()
+    assert (divergencia.id_tranca, divergencia.bicicleta_lida, divergencia.bicicleta_registrada) == \
+        (ocupada.id, bicicleta.id + 1, bicicleta.id)
+    processador.receber([[ocupada.id, 1, bicicleta.id, 0]])
+    processador.processar_pendentes()
+    assert processador.listar_divergencias() == []
+
+def test_telemetria_api():
+    """Testa o endpoint de ingestão e a listagem das divergências."""
+    restaurar_banco()
+    telemetria.limpar()
+    tranca = _tranca(StatusTranca.LIVRE)
+    response = client.post("/tranca/telemetria", json=[[tranca.id, 1, 42, 0]] * 3)
+    assert response.status_code == 202
+    assert response.json() == {"aceitas": 3}
+    telemetria.processar_pendentes()
+    assert tranca_service.get_by_id(tranca.id).status == StatusTranca.OCUPADA
+    divergencias = client.get("/tranca/telemetria/divergencias").json()
+    assert [(d["idTranca"], d["bicicletaLida"], d["bicicletaRegistrada"]) for d in divergencias] == [(tranca.id, 42, None)]
+    assert client.post("/tranca/telemetria", json=[[tranca.id, "sim", None, 0]]).status_code == 422
+    assert client.post("/tranca/telemetria", content=b"{").status_code == 422